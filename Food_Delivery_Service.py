@@ -0,0 +1,540 @@
+import inspect
+import json
+import math
+import secrets
+import sys
+import threading
+import traceback
+from urllib.parse import parse_qs, urlsplit
+
+from User_Registration import UserRegistration
+from User_Storage import JournaledUserStore, SQLiteUserStore, UsersFileWriter
+from Order_Placement import Cart, OrderPlacement, UserProfile, RestaurantMenu, PaymentMethod
+# Restaurant_Browsing, Payment_Processing and asyncio are imported where they are first needed,
+# so that importing this module (and the UI on top of it) stays fast
+
+# Utility functions for user data storage
+USERS_FILE = "users.json"
+USERS_DB = "users.db"
+USER_STORE = "sqlite"  # Backend of load_users(), one of USER_STORES
+
+MENU_ITEMS = ["Burger", "Pizza", "Salad"]
+ITEM_PRICE = 10.0  # Static price for simplicity
+DEFAULT_ADDRESS = "123 Main St"
+DEFAULT_COORDINATES = (60.1699, 24.9384)  # Where DEFAULT_ADDRESS is
+DEFAULT_PAGE_SIZE = 50
+NEARBY_RADIUS_KM = 5.0  # How far away a restaurant may be to deliver to the user
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+MAX_BODY_BYTES = 1 << 20  # Larger requests are rejected with 413
+
+# (HTTP method, path) -> FoodDeliveryService method. GET parameters come from the query string,
+# POST parameters from a JSON object body, and the session token from "Authorization: Bearer".
+ROUTES = {
+    ("POST", "/register"): "register",
+    ("POST", "/login"): "login",
+    ("POST", "/logout"): "logout",
+    ("GET", "/restaurants"): "search_restaurants",
+    ("GET", "/restaurants/page"): "page",
+    ("GET", "/restaurants/nearby"): "nearby",
+    ("GET", "/menu"): "menu",
+    ("GET", "/cart"): "view_cart",
+    ("POST", "/cart/items"): "add_to_cart",
+    ("POST", "/cart/remove"): "remove_from_cart",
+    ("GET", "/checkout"): "checkout",
+    ("POST", "/orders"): "confirm_order",
+    ("GET", "/stats"): "stats",
+}
+# Routes that may wait on something slow, like the payment gateway, password hashing or a search
+# planning and sorting many restaurants; they run on a thread so that the event loop keeps serving
+# other clients meanwhile
+BLOCKING_ROUTES = {"register", "login", "confirm_order", "search_restaurants", "page", "nearby"}
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+                500: "Internal Server Error"}
+
+def _text(value):
+    """Accept a string parameter as it is."""
+    if not isinstance(value, str):
+        raise ValueError("must be a string")
+    return value
+
+def _number(value):
+    """Parse a finite number; NaN would match every rating."""
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError("must be a number")
+    number = float(value)  # Raises ValueError for text that is not a number
+    if not math.isfinite(number):
+        raise ValueError("must be a finite number")
+    return number
+
+def _whole_number(value):
+    """Parse a whole number, also from "3" or 3.0, but not from 3.5."""
+    number = _number(value)
+    if not number.is_integer():
+        raise ValueError("must be a whole number")
+    return int(number)
+
+def _object(value):
+    """Accept a JSON object parameter as it is."""
+    if not isinstance(value, dict):
+        raise ValueError("must be a JSON object")
+    return value
+
+# Parameter name -> parser for the parameters of ROUTES handlers. Query string values are always
+# strings, but JSON bodies can carry any type; a value the parser refuses is answered with 400.
+PARAM_PARSERS = {
+    "email": _text, "password": _text, "confirm_password": _text, "token": _text, "cursor": _text,
+    "cuisine": _text, "location": _text, "item": _text, "payment_method": _text,
+    "rating": _number, "radius_km": _number, "limit": _whole_number, "quantity": _whole_number,
+    "payment_details": _object,
+}
+
+# Backend name -> function opening the user store. Both stores save every change by themselves.
+USER_STORES = {
+    "journal": lambda: JournaledUserStore(USERS_FILE),
+    "sqlite": lambda: SQLiteUserStore(USERS_DB, migrate_from=USERS_FILE),  # Imports users.json once
+}
+
+def load_users(backend=None):
+    """
+    Open the store of registered users, see User_Storage.
+
+    Args:
+        backend (str, optional): One of USER_STORES; USER_STORE by default.
+
+    Returns:
+        MutableMapping: The users, email -> {"password": ..., "confirmed": ...}.
+    """
+    return USER_STORES[backend or USER_STORE]()
+
+_users_writers = {}  # Path -> UsersFileWriter, shared by all the threads saving to it
+_users_writers_lock = threading.Lock()
+
+def save_users(users):
+    """
+    Write users as a complete users.json snapshot. The stores of load_users() do not need this.
+
+    Concurrent calls share one atomic, file-locked write, see UsersFileWriter; each returns once
+    its users are on disk.
+    """
+    with _users_writers_lock:
+        writer = _users_writers.get(USERS_FILE)
+        if writer is None:
+            writer = _users_writers[USERS_FILE] = UsersFileWriter(USERS_FILE)
+    writer.save(users)
+
+def load_registration():
+    """Create the registration system with the existing users loaded into it."""
+    registration = UserRegistration()
+    registration.users = load_users()
+    return registration
+
+def load_catalog():
+    """Build the restaurant database and the browsing and search layers on top of it."""
+    from Restaurant_Browsing import RestaurantDatabase, RestaurantBrowsing, RestaurantSearch
+    database = RestaurantDatabase()
+    browsing = RestaurantBrowsing(database)
+    return database, browsing, RestaurantSearch(browsing)  # Caches popular searches
+
+def _resolve(value):
+    """Return value, or its result if it is still being loaded (a Future)."""
+    return value.result() if hasattr(value, "result") else value
+
+def _not_logged_in():
+    return {"success": False, "error": "Not logged in"}
+
+
+class Session:
+    """
+    The state of one logged-in user.
+
+    Attributes:
+        email (str): The user's email address.
+        user_profile (UserProfile): The user's profile, including delivery address.
+        cart (Cart): The user's shopping cart.
+        order_placement (OrderPlacement): The order being placed from the cart.
+    """
+    def __init__(self, email, restaurant_menu):
+        self.email = email
+        self.user_profile = UserProfile(delivery_address=DEFAULT_ADDRESS, latitude=DEFAULT_COORDINATES[0],
+                                        longitude=DEFAULT_COORDINATES[1])
+        self.cart = Cart()
+        self.order_placement = OrderPlacement(self.cart, self.user_profile, restaurant_menu)
+
+
+class GatewayPayment:
+    """
+    Adapts PaymentProcessing to the PaymentMethod interface used by OrderPlacement.confirm_order.
+
+    Attributes:
+        message (str): The payment gateway's answer to the last payment, None before the first one.
+    """
+    def __init__(self, payment_method, payment_details):
+        from Payment_Processing import PaymentProcessing
+        self.processing = PaymentProcessing()
+        self.payment_method = payment_method
+        self.payment_details = payment_details
+        self.message = None
+
+    def process_payment(self, amount):
+        self.message = self.processing.process_payment({"total_amount": amount}, self.payment_method, self.payment_details)
+        return self.message.startswith("Payment successful")
+
+
+class FoodDeliveryService:
+    """
+    The business logic of the app behind one headless facade: registration, login sessions,
+    restaurant search, carts, checkout and payment.
+
+    Nothing here touches Tk, so the same service backs the desktop UI, the HTTP/JSON server
+    (serve) and load tests. Like the classes it wraps, every operation returns a dict with a
+    "success" flag. Operations on a cart take the session token returned by login.
+
+    Attributes:
+        restaurant_menu (RestaurantMenu): The menu shared by all sessions.
+        save_users (callable): Called with the users after a registration to persist them, or None.
+        sessions (dict): Maps session tokens to Session objects.
+        lock (threading.RLock): Serializes changes to users and sessions.
+    """
+    def __init__(self, registration=None, catalog=None, restaurant_menu=None, save_users=None):
+        """
+        Args:
+            registration (UserRegistration, optional): The user registry, or a Future of one that
+                is still loading. Defaults to an empty registry.
+            catalog (tuple, optional): (database, browsing, search) as returned by load_catalog, or a
+                Future of it. Defaults to the sample catalog, built on first use.
+            restaurant_menu (RestaurantMenu, optional): Defaults to MENU_ITEMS.
+            save_users (callable, optional): Persists the users after each registration.
+        """
+        self._registration = registration if registration is not None else UserRegistration()
+        self._catalog = catalog
+        self.restaurant_menu = restaurant_menu or RestaurantMenu(available_items=list(MENU_ITEMS))
+        self.save_users = save_users
+        self.sessions = {}
+        self.lock = threading.RLock()
+        self._credentials_executor = None
+
+    @property
+    def registration(self):
+        return _resolve(self._registration)
+
+    @property
+    def catalog(self):
+        with self.lock:
+            if self._catalog is None:
+                self._catalog = load_catalog()
+        return _resolve(self._catalog)
+
+    @property
+    def database(self):
+        return self.catalog[0]
+
+    @property
+    def browsing(self):
+        return self.catalog[1]
+
+    @property
+    def search(self):
+        return self.catalog[2]
+
+    # Users and sessions
+
+    def register(self, email, password, confirm_password):
+        """
+        Register a new user, see UserRegistration.register, and persist the users on success.
+        """
+        result = self.registration.register(email, password, confirm_password)  # Hashes without holding self.lock
+        if result["success"] and self.save_users is not None:
+            with self.lock:
+                self.save_users(self.registration.users)
+        return result
+
+    def login(self, email, password):
+        """
+        Check the user's password and start a session.
+
+        Returns:
+            dict: {"success": True, "token": session token} or {"success": False, "error": ...}.
+        """
+        result = self.registration.login(email, password)
+        if not result["success"]:
+            return result
+        return {"success": True, "token": self.open_session(email)}
+
+    def submit_register(self, email, password, confirm_password):
+        """
+        Like register, but returns at once. Password hashing is slow, so the UI uses this instead.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the result of register.
+        """
+        return self.credentials_executor.submit(self.register, email, password, confirm_password)
+
+    def submit_login(self, email, password):
+        """
+        Like login, but returns at once. Password hashing is slow, so the UI uses this instead.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the result of login.
+        """
+        return self.credentials_executor.submit(self.login, email, password)
+
+    @property
+    def credentials_executor(self):
+        """Threads that wait for the password hasher's processes, started on first use."""
+        with self.lock:
+            if self._credentials_executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._credentials_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="credentials")
+        return self._credentials_executor
+
+    def open_session(self, email):
+        """Start a session with an empty cart for an already authenticated user and return its token."""
+        token = secrets.token_urlsafe(16)
+        with self.lock:
+            self.sessions[token] = Session(email, self.restaurant_menu)
+        return token
+
+    def session(self, token):
+        """Return the Session for token, or None if it is not logged in."""
+        return self.sessions.get(token)
+
+    def logout(self, token):
+        with self.lock:
+            if self.sessions.pop(token, None) is None:
+                return _not_logged_in()
+        return {"success": True}
+
+    # Restaurants
+
+    def search_restaurants(self, cuisine=None, location=None, rating=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        Return the first page of restaurants matching the filters.
+
+        Returns:
+            dict: {"success": True, "restaurants": [...], "cursor": token for page() or None}.
+        """
+        try:
+            cursor = self.search.make_cursor(cuisine=cuisine, location=location, rating=rating)
+        except ValueError:
+            return {"success": False, "error": "Invalid rating"}
+        return self.page(cursor, limit)
+
+    def page(self, cursor, limit=DEFAULT_PAGE_SIZE):
+        """Return the page of restaurants after cursor, in the same form as search_restaurants."""
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            limit = 0
+        if limit <= 0:
+            return {"success": False, "error": "Limit must be a positive whole number"}
+        try:
+            restaurants, next_cursor = self.search.page(cursor, limit)
+        except ValueError as error:
+            return {"success": False, "error": str(error)}
+        return {"success": True, "restaurants": restaurants, "cursor": next_cursor}
+
+    def nearby(self, token, radius_km=NEARBY_RADIUS_KM, cuisine=None):
+        """Return restaurants delivering within radius_km of the user's address, nearest first."""
+        session = self.session(token)
+        if session is None:
+            return _not_logged_in()
+        profile = session.user_profile
+        if not profile.has_coordinates():
+            return {"success": False, "error": "Your delivery address has no location"}
+        try:
+            radius_km = float(radius_km)
+        except (TypeError, ValueError):
+            radius_km = 0.0
+        if not (radius_km > 0 and math.isfinite(radius_km)):
+            return {"success": False, "error": "Radius must be a positive number"}
+        restaurants = self.browsing.search_nearby(profile.latitude, profile.longitude, radius_km,
+                                                  cuisine_type=cuisine if cuisine else None, delivery_only=True)
+        return {"success": True, "restaurants": restaurants}
+
+    def menu(self):
+        return {"success": True, "items": [{"name": name, "price": ITEM_PRICE} for name in self.restaurant_menu.available_items]}
+
+    # Cart and orders
+
+    def add_to_cart(self, token, item, quantity=1):
+        session = self.session(token)
+        if session is None:
+            return _not_logged_in()
+        if not self.restaurant_menu.is_item_available(item):
+            return {"success": False, "error": f"{item} is not available"}
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            quantity = 0
+        if quantity <= 0:
+            return {"success": False, "error": "Quantity must be a positive whole number"}
+        return {"success": True, "message": session.cart.add_item(item, ITEM_PRICE, quantity)}
+
+    def remove_from_cart(self, token, item):
+        session = self.session(token)
+        if session is None:
+            return _not_logged_in()
+        return {"success": True, "message": session.cart.remove_item(item)}
+
+    def view_cart(self, token):
+        session = self.session(token)
+        if session is None:
+            return _not_logged_in()
+        return {"success": True, "items": session.cart.view_cart(), "total_info": session.cart.calculate_total()}
+
+    def checkout(self, token):
+        """Validate the order and return what proceed_to_checkout shows for review."""
+        session = self.session(token)
+        if session is None:
+            return _not_logged_in()
+        validation = session.order_placement.validate_order()
+        if not validation["success"]:
+            return validation
+        return {"success": True, **session.order_placement.proceed_to_checkout()}
+
+    def confirm_order(self, token, payment_method="credit_card", payment_details=None):
+        """
+        Confirm the user's order. With payment_details the payment goes through PaymentProcessing,
+        otherwise through the simple PaymentMethod like in the desktop UI.
+        """
+        session = self.session(token)
+        if session is None:
+            return _not_logged_in()
+        payment = PaymentMethod() if payment_details is None else GatewayPayment(payment_method, payment_details)
+        return session.order_placement.confirm_order(payment)
+
+    # Monitoring
+
+    def stats(self):
+        """
+        Report the statistics for sizing the caches and filters behind the service.
+
+        Returns:
+            dict: {"success": True, "email_filter": UserRegistration.filter_info(),
+                   "search_cache": RestaurantSearch.cache_info()}.
+        """
+        return {"success": True, "email_filter": self.registration.filter_info(),
+                "search_cache": self.search.cache_info()}
+
+    # HTTP/JSON interface
+
+    def handle_request(self, method, target, headers, body=b""):
+        """
+        Dispatch one HTTP request to the matching service method, see ROUTES.
+
+        Args:
+            method (str): The HTTP method, e.g. "GET".
+            target (str): The request path with its query string.
+            headers (dict): Request headers with lower-case names.
+            body (bytes, optional): The request body, a JSON object for POST requests.
+
+        Returns:
+            tuple: (HTTP status code, JSON-serializable result). A handler that raises gives status 500.
+        """
+        url = urlsplit(target)
+        name = ROUTES.get((method, url.path))
+        if name is None:
+            return 404, {"success": False, "error": "Not found"}
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                return 400, {"success": False, "error": "Request body is not valid JSON"}
+            if not isinstance(data, dict):
+                return 400, {"success": False, "error": "Request body must be a JSON object"}
+            params.update(data)
+        handler = getattr(self, name)
+        signature = inspect.signature(handler)
+        authorization = headers.get("authorization", "")
+        if authorization.startswith("Bearer ") and "token" in signature.parameters:
+            params["token"] = authorization[len("Bearer "):]
+        try:
+            signature.bind(**params)
+        except TypeError as error:
+            return 400, {"success": False, "error": f"Invalid parameters: {error}"}
+        for key, value in params.items():
+            if value is None and signature.parameters[key].default is None:
+                continue  # JSON null for an optional parameter means "not given"
+            try:
+                params[key] = PARAM_PARSERS[key](value)
+            except ValueError as error:
+                return 400, {"success": False, "error": f"Invalid parameter {key}: {error}"}
+        try:
+            return 200, handler(**params)
+        except Exception:
+            traceback.print_exc()  # The details are for the server log, not the client
+            return 500, {"success": False, "error": "Internal server error"}
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """
+        Start the HTTP/JSON server on host:port and return the asyncio server. Requests are
+        answered on the event loop; connections are kept alive for HTTP/1.1 clients.
+        """
+        import asyncio
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    async def _handle_connection(self, reader, writer):
+        import asyncio
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, {"success": False, "error": "Malformed request line"}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                try:
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    length = -1
+                if not 0 <= length <= MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {"success": False, "error": "Request body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                if ROUTES.get((method, urlsplit(target).path)) in BLOCKING_ROUTES:
+                    status, result = await asyncio.get_running_loop().run_in_executor(
+                        None, self.handle_request, method, target, headers, body)
+                else:
+                    status, result = self.handle_request(method, target, headers, body)
+                await self._respond(writer, status, result, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # The client went away mid-request
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, result, keep_alive):
+        payload = json.dumps(result).encode("utf-8")
+        writer.write(f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                     f"Content-Type: application/json\r\n"
+                     f"Content-Length: {len(payload)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + payload)
+        await writer.drain()
+
+
+async def run_server(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Serve the users in users.json and the sample catalog until interrupted."""
+    service = FoodDeliveryService(registration=load_registration())
+    server = await service.serve(host, port)
+    print(f"Serving on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    import asyncio
+    asyncio.run(run_server(port=int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT))
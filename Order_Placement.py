@@ -1,3 +1,5 @@
+import threading
+
 # CartItem Class
 
 class CartItem:
@@ -140,6 +142,8 @@ class OrderPlacement:
         cart (Cart): The shopping cart containing the items for the order.
         user_profile (UserProfile): The user's profile, including delivery address.
         restaurant_menu (RestaurantMenu): The menu containing available restaurant items.
+        confirm_lock (threading.Lock): Held while a confirmation of this order is in flight.
+        confirmation (dict): The result of the successful confirmation, None until the order is paid.
     """
     def __init__(self, cart, user_profile, restaurant_menu):
         """
@@ -153,6 +157,8 @@ class OrderPlacement:
         self.cart = cart
         self.user_profile = user_profile
         self.restaurant_menu = restaurant_menu
+        self.confirm_lock = threading.Lock()
+        self.confirmation = None
 
     def validate_order(self):
         """
@@ -184,30 +190,46 @@ class OrderPlacement:
             "delivery_address": self.user_profile.delivery_address,
         }
 
-    def confirm_order(self, payment_method):
+    def confirm_order(self, payment_method, cancel_event=None):
         """
         Confirms the order by validating it and processing the payment.
         
+        Only one confirmation of the order can be in flight at a time, so that a slow payment can
+        never be started twice; a concurrent call is refused without charging anything. Once the
+        order has been paid, later calls, e.g. a client retrying after a timeout, return the same
+        confirmation without charging it again.
+        
         Args:
             payment_method (PaymentMethod): The method of payment to be used.
+            cancel_event (threading.Event, optional): If set before the payment starts, the order
+                is cancelled without charging it. A payment that already started is not interrupted.
         
         Returns:
             dict: A dictionary indicating whether the order was confirmed and an order ID if successful.
         """
-        if not self.validate_order()["success"]:
-            return {"success": False, "message": "Order validation failed"}
+        if not self.confirm_lock.acquire(blocking=False):
+            return {"success": False, "message": "Order confirmation already in progress"}
+        try:
+            if self.confirmation is not None:
+                return {**self.confirmation, "message": "Order already confirmed"}
+            if not self.validate_order()["success"]:
+                return {"success": False, "message": "Order validation failed"}
+            if cancel_event is not None and cancel_event.is_set():
+                return {"success": False, "message": "Order cancelled"}
 
-        # Process payment using the given payment method.
-        payment_success = payment_method.process_payment(self.cart.calculate_total()["total"])
-
-        if payment_success:
-            return {
+            # Process payment using the given payment method.
+            if not payment_method.process_payment(self.cart.calculate_total()["total"]):
+                return {"success": False, "message": "Payment failed"}
+            # Recorded before the lock is released, so that no later call can charge the order again
+            self.confirmation = {
                 "success": True,
                 "message": "Order confirmed",
                 "order_id": "ORD123456",  # Simulate an order ID.
                 "estimated_delivery": "45 minutes"
             }
-        return {"success": False, "message": "Payment failed"}
+            return dict(self.confirmation)
+        finally:
+            self.confirm_lock.release()
 
 
 # PaymentMethod Class
@@ -237,15 +259,30 @@ class UserProfile:
     
     Attributes:
         delivery_address (str): The user's delivery address.
+        latitude (float): Latitude of the delivery address in degrees, or None if unknown.
+        longitude (float): Longitude of the delivery address in degrees, or None if unknown.
     """
-    def __init__(self, delivery_address):
+    def __init__(self, delivery_address, latitude=None, longitude=None):
         """
         Initializes a UserProfile object with a delivery address.
         
         Args:
             delivery_address (str): The user's delivery address.
+            latitude (float, optional): Latitude of the delivery address in degrees.
+            longitude (float, optional): Longitude of the delivery address in degrees.
         """
         self.delivery_address = delivery_address
+        self.latitude = latitude
+        self.longitude = longitude
+
+    def has_coordinates(self):
+        """
+        Checks whether the delivery address has been located.
+        
+        Returns:
+            bool: True if both latitude and longitude are known.
+        """
+        return self.latitude is not None and self.longitude is not None
 
 
 # RestaurantMenu Class (for simulating available menu items)
@@ -0,0 +1,176 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import Future
+from itertools import repeat
+
+ALGORITHMS = ("scrypt", "pbkdf2_sha256")
+DEFAULT_ALGORITHM = "scrypt" if hasattr(hashlib, "scrypt") else "pbkdf2_sha256"  # scrypt needs OpenSSL 1.1+
+SCRYPT_N = 2 ** 14  # CPU/memory cost; the memory used is 128 * SCRYPT_R * SCRYPT_N bytes (16 MiB)
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = 600_000
+SALT_BYTES = 16
+MAX_WORKERS = min(4, os.cpu_count() or 1)  # Hashing processes; more requests wait in the queue
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _derive(password, algorithm, params, salt):
+    """The key of password for one of ALGORITHMS. Runs in a worker process, so it must stay a
+    module-level function."""
+    if algorithm == "scrypt":
+        n, r, p = params
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=256 * r * n, dklen=32)
+    (iterations,) = params
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+
+
+def _hash(password, algorithm, params, salt):
+    key = _derive(password, algorithm, params, salt)
+    return "$".join([algorithm, *map(str, params), _b64encode(salt), _b64encode(key)])
+
+
+def _verify(password, stored):
+    algorithm, *fields = stored.split("$")
+    *params, salt, key = fields
+    derived = _derive(password, algorithm, tuple(map(int, params)), base64.b64decode(salt))
+    return hmac.compare_digest(derived, base64.b64decode(key))
+
+
+def _done(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords with a slow key derivation function (scrypt, or PBKDF2 where
+    scrypt is not available), so that a leaked user store does not give away the passwords.
+
+    A hash is stored as "algorithm$cost parameters$salt$key", e.g. "scrypt$16384$8$1$...$...", so
+    hashes made with older cost settings keep verifying after the costs are raised.
+
+    Hashing is deliberately CPU heavy, so it runs in a pool of at most max_workers processes: the
+    caller's thread (the Tk main loop, or the server's event loop) is not blocked by it when it
+    uses submit_hash/submit_verify or the async variants, and several logins can hash in parallel
+    despite the GIL. With max_workers=0 everything is computed in the calling thread instead.
+
+    Attributes:
+        algorithm (str): One of ALGORITHMS, used for new hashes.
+        params (tuple): The cost parameters for new hashes: (n, r, p) for scrypt, (iterations,)
+            for PBKDF2.
+        max_workers (int): Size of the process pool.
+    """
+
+    def __init__(self, algorithm=DEFAULT_ALGORITHM, scrypt_n=SCRYPT_N, scrypt_r=SCRYPT_R, scrypt_p=SCRYPT_P,
+                 pbkdf2_iterations=PBKDF2_ITERATIONS, max_workers=MAX_WORKERS):
+        """
+        Raises:
+            ValueError: If algorithm is not one of ALGORITHMS.
+        """
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown password hashing algorithm: {algorithm}")
+        self.algorithm = algorithm
+        self.params = (scrypt_n, scrypt_r, scrypt_p) if algorithm == "scrypt" else (pbkdf2_iterations,)
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def executor(self):
+        """The process pool, started on first use."""
+        with self._executor_lock:
+            if self._executor is None:
+                from concurrent.futures import ProcessPoolExecutor
+                from multiprocessing import get_context
+                # Spawned rather than forked: the UI and the server run threads, which fork does not copy safely
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=get_context("spawn"))
+            return self._executor
+
+    def is_hashed(self, stored):
+        """Whether stored is a hash made by this class rather than a plaintext password."""
+        return stored.split("$", 1)[0] in ALGORITHMS and stored.count("$") >= 3
+
+    def needs_rehash(self, stored):
+        """Whether stored is plaintext or was hashed with other settings than the current ones."""
+        return not self.is_hashed(stored) or not stored.startswith(self._prefix())
+
+    def submit_hash(self, password):
+        """
+        Hash password in the process pool.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the hash to store.
+        """
+        salt = os.urandom(SALT_BYTES)
+        if self.max_workers == 0:
+            return _done(_hash(password, self.algorithm, self.params, salt))
+        return self.executor.submit(_hash, password, self.algorithm, self.params, salt)
+
+    def submit_verify(self, password, stored):
+        """
+        Check password against a stored hash in the process pool. A stored value that is not a
+        hash is a password saved in plaintext before hashing was added; it is compared directly.
+
+        Returns:
+            concurrent.futures.Future: Resolves to True if the password matches.
+        """
+        if not self.is_hashed(stored):
+            return _done(hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8")))
+        if self.max_workers == 0:
+            return _done(_verify(password, stored))
+        return self.executor.submit(_verify, password, stored)
+
+    def hash_many(self, passwords):
+        """
+        Hash many passwords in parallel, e.g. for a bulk import. They are sent to the worker
+        processes in batches, so that the pool is not flooded with one tiny task per password.
+
+        Returns:
+            list: The hashes, in the order of passwords.
+        """
+        passwords = list(passwords)
+        salts = [os.urandom(SALT_BYTES) for _ in passwords]
+        if self.max_workers == 0 or not passwords:
+            return [_hash(password, self.algorithm, self.params, salt) for password, salt in zip(passwords, salts)]
+        chunksize = max(1, len(passwords) // (4 * self.max_workers))
+        return list(self.executor.map(_hash, passwords, repeat(self.algorithm), repeat(self.params), salts,
+                                      chunksize=chunksize))
+
+    def hash(self, password):
+        """Hash password, blocking until it is done. See submit_hash."""
+        return self.submit_hash(password).result()
+
+    def verify(self, password, stored):
+        """Check password against stored, blocking until it is done. See submit_verify."""
+        return self.submit_verify(password, stored).result()
+
+    async def hash_async(self, password):
+        """Hash password without blocking the running event loop."""
+        import asyncio
+        return await asyncio.wrap_future(self.submit_hash(password))
+
+    async def verify_async(self, password, stored):
+        """Check password against stored without blocking the running event loop."""
+        import asyncio
+        return await asyncio.wrap_future(self.submit_verify(password, stored))
+
+    def shutdown(self, wait=True):
+        """Stop the worker processes. They are started again if more hashing is submitted."""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _prefix(self):
+        return "$".join([self.algorithm, *map(str, self.params)]) + "$"
+
+
+# Shared by the registries that are not given a hasher of their own, so they share one process pool
+DEFAULT_HASHER = PasswordHasher()
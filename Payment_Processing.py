@@ -1,6 +1,3 @@
-import unittest
-from unittest import mock  # Import the mock module to simulate payment gateway responses.
-
 # PaymentProcessing Class
 class PaymentProcessing:
     """
@@ -1,11 +1,207 @@
+import base64
+import csv
+import heapq
+import json
+import math
+import mmap
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from contextlib import nullcontext
+from itertools import chain, islice
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed by ColumnarRestaurantDatabase
+    np = None
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180  # Length of one degree of latitude
+
+
+def haversine_km(latitude1, longitude1, latitude2, longitude2):
+    """
+    Calculate the great-circle distance between two points.
+    
+    Args:
+        latitude1 (float): Latitude of the first point in degrees.
+        longitude1 (float): Longitude of the first point in degrees.
+        latitude2 (float): Latitude of the second point in degrees.
+        longitude2 (float): Longitude of the second point in degrees.
+    
+    Returns:
+        float: The distance in kilometres.
+    """
+    phi1 = math.radians(latitude1)
+    phi2 = math.radians(latitude2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(longitude2 - longitude1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def _trigrams(text):
+    """
+    Split a string into its distinct three-character substrings.
+    
+    Args:
+        text (str): The (lower-cased) text to split.
+    
+    Returns:
+        set: The trigrams of the text; empty for texts shorter than three characters.
+    """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _is_number(value):
+    """Whether value is an int or a float; bools are not counted as numbers."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _parse_rating(rating):
+    """
+    Convert a rating filter to a float, or None when there is no filter.
+    
+    Raises:
+        ValueError: If the rating is not a finite number; NaN would match every restaurant.
+    """
+    if not rating:
+        return None
+    rating = float(rating)
+    if not math.isfinite(rating):
+        raise ValueError(f"Invalid rating: {rating}")
+    return rating
+
+
+# Values accepted for the "delivery" column of text feeds
+_TRUE_VALUES = {"true", "1", "yes", "y"}
+_FALSE_VALUES = {"false", "0", "no", "n", ""}
+
+
+def _coerce_restaurant(raw):
+    """
+    Validate one feed row and convert it to a restaurant dictionary.
+    
+    CSV rows contain only strings, so numbers and booleans are parsed here; JSONL rows may already
+    have the right types. Repeated strings (cuisine, location, price range) are interned so that a
+    large catalog keeps a single copy of each.
+    
+    Args:
+        raw (dict): The row as read from the feed.
+    
+    Returns:
+        dict: The restaurant.
+    
+    Raises:
+        ValueError: If a required field is missing or a value is invalid.
+    """
+    restaurant = {}
+    for field in RestaurantDatabase.REQUIRED_FIELDS:
+        value = raw.get(field)
+        if value is None or value == "":
+            raise ValueError(f"missing required field '{field}'")
+
+    restaurant["name"] = str(raw["name"])
+    restaurant["cuisine"] = sys.intern(str(raw["cuisine"]))
+    restaurant["location"] = sys.intern(str(raw["location"]))
+    restaurant["phonenumber"] = str(raw.get("phonenumber") or "")
+
+    rating = float(raw["rating"])
+    if not 0.0 <= rating <= 5.0:
+        raise ValueError(f"rating {rating} is not between 0 and 5")
+    restaurant["rating"] = rating
+
+    restaurant["price_range"] = sys.intern(str(raw.get("price_range") or ""))
+
+    delivery = raw.get("delivery", False)
+    if isinstance(delivery, str):
+        if delivery.strip().lower() in _TRUE_VALUES:
+            delivery = True
+        elif delivery.strip().lower() in _FALSE_VALUES:
+            delivery = False
+        else:
+            raise ValueError(f"invalid delivery value '{delivery}'")
+    restaurant["delivery"] = bool(delivery)
+
+    latitude = raw.get("latitude")
+    longitude = raw.get("longitude")
+    if latitude not in (None, "") and longitude not in (None, ""):
+        restaurant["latitude"] = float(latitude)
+        restaurant["longitude"] = float(longitude)
+        if not (-90.0 <= restaurant["latitude"] <= 90.0 and -180.0 <= restaurant["longitude"] <= 180.0):
+            raise ValueError("coordinates out of range")
+    return restaurant
+
+
+def _read_lines(path, use_mmap, binary=False):
+    """
+    Yield the decoded lines of a text file one at a time, optionally through a memory map.
+    With binary=True the lines are yielded undecoded, so that the caller can reject a bad one alone.
+    """
+    if use_mmap and os.path.getsize(path) > 0:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for line in iter(mapped.readline, b""):
+                yield line if binary else line.decode("utf-8")
+    elif binary:
+        with open(path, "rb") as f:
+            yield from f
+    else:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            yield from f
+
+
+def _read_feed(path, file_format, use_mmap):
+    """
+    Yield (line number, raw row) pairs from a CSV or JSONL feed without reading the whole file.
+    
+    Rows that cannot be parsed at all are yielded as (line number, ValueError). In a JSONL feed this
+    includes lines that are not valid UTF-8; in a CSV feed, whose rows may span lines, those raise
+    UnicodeDecodeError.
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(_read_lines(path, use_mmap))
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(_read_lines(path, use_mmap, binary=True), start=1):
+            if not line.strip():
+                continue
+            try:
+                line = line.decode("utf-8")
+            except UnicodeDecodeError as e:
+                yield line_number, ValueError(f"invalid UTF-8: {e}")
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, ValueError(f"invalid JSON: {e}")
+                continue
+            if not isinstance(row, dict):
+                yield line_number, ValueError("row is not a JSON object")
+                continue
+            yield line_number, row
+
+
 class RestaurantBrowsing:
     """
     A class for browsing restaurants in a database based on various criteria like cuisine type, location, and rating.
     
     Attributes:
         database (RestaurantDatabase): An instance of RestaurantDatabase that holds restaurant data.
+        planner (QueryPlanner): Plans multi-filter searches from index statistics, or None when the
+                                database keeps no indexes.
+    
+    Searches hold the database's lock while they read its indexes, so that they see a consistent view
+    while other threads add, update or remove restaurants.
     """
 
+    # Matches iter_filters fetches per lock acquisition, so that writers are never held up for long
+    ITER_BATCH_SIZE = 256
+
     def __init__(self, database):
         """
         Initialize RestaurantBrowsing with a reference to a restaurant database.
@@ -14,6 +210,7 @@ class RestaurantBrowsing:
             database (RestaurantDatabase): The database object containing restaurant information.
         """
         self.database = database
+        self.planner = QueryPlanner(database) if hasattr(database, "matching_buckets") else None
 
     def search_by_cuisine(self, cuisine_type):
         """
@@ -25,6 +222,8 @@ class RestaurantBrowsing:
         Returns:
             list: A list of restaurants that match the given cuisine type.
         """
+        if hasattr(self.database, "find_exact"):
+            return self.database.find_exact("cuisine", cuisine_type)  # Hash index lookup, O(matches)
         return [restaurant for restaurant in self.database.get_restaurants() 
                 if restaurant['cuisine'].lower() == cuisine_type.lower()]
 
@@ -38,9 +237,28 @@ class RestaurantBrowsing:
         Returns:
             list: A list of restaurants that are located in the specified area.
         """
+        if hasattr(self.database, "find_exact"):
+            return self.database.find_exact("location", location)  # Hash index lookup, O(matches)
         return [restaurant for restaurant in self.database.get_restaurants() 
                 if restaurant['location'].lower() == location.lower()]
 
+    def search_by_name(self, name):
+        """
+        Search for restaurants whose name contains the given text, ignoring case.
+        
+        Args:
+            name (str): Part of the restaurant name (e.g., "pizza").
+        
+        Returns:
+            list: A list of restaurants whose name contains the text.
+        """
+        if hasattr(self.database, "matching_buckets"):
+            with self._read_lock():
+                buckets = self.database.matching_buckets("name", name.lower())  # Trigram index lookup
+                return [self.database.records[restaurant_id] for restaurant_id in heapq.merge(*buckets)]
+        return [restaurant for restaurant in self.database.get_restaurants() 
+                if name.lower() in restaurant['name'].lower()]
+
     def search_by_rating(self, min_rating):
         """
         Search for restaurants based on their minimum rating.
@@ -51,6 +269,8 @@ class RestaurantBrowsing:
         Returns:
             list: A list of restaurants that have a rating greater than or equal to the specified rating.
         """
+        if hasattr(self.database, "find_min_rating"):
+            return self.database.find_min_rating(min_rating)  # Bisect on the rating index
         return [restaurant for restaurant in self.database.get_restaurants() 
                 if restaurant['rating'] >= min_rating]
 
@@ -66,88 +286,1555 @@ class RestaurantBrowsing:
         Returns:
             list: A list of restaurants that match all specified filters.
         """
-        results = self.database.get_restaurants()  # Start with all restaurants
+        if hasattr(self.database, "filter_restaurants"):
+            # Columnar databases evaluate all filters as vectorized masks
+            return self.database.filter_restaurants(cuisine_type=cuisine_type, location=location, min_rating=min_rating)
 
-        if cuisine_type:
-            results = [restaurant for restaurant in results 
-                       if cuisine_type.lower() in restaurant['cuisine'].lower()]
+        if self.planner is not None:
+            with self._read_lock():
+                plan = self.planner.plan(cuisine_type=cuisine_type, location=location, min_rating=min_rating)
+                return self.planner.execute(plan)
 
-        if location:
-            results = [restaurant for restaurant in results 
-                       if location.lower() in restaurant['location'].lower()]
+        # No indexes available: check every filter in a single pass over all restaurants
+        return [restaurant for restaurant in self.database.get_restaurants()
+                if self._matches_filters(restaurant, cuisine_type, location, min_rating)]
 
-        if min_rating:
-            results = [restaurant for restaurant in results 
-                       if restaurant['rating'] >= min_rating]
+    def explain_filters(self, cuisine_type=None, location=None, min_rating=None):
+        """
+        Describe how search_by_filters would run the given filters, for debugging.
+        
+        Args:
+            cuisine_type (str, optional): The type of cuisine to filter by.
+            location (str, optional): The location to filter by.
+            min_rating (float, optional): The minimum acceptable rating to filter by.
+        
+        Returns:
+            str: A one-line description of the chosen plan.
+        """
+        if self.planner is None:
+            return "full scan (database has no indexes)"
+        with self._read_lock():
+            return self.planner.plan(cuisine_type=cuisine_type, location=location, min_rating=min_rating).explain()
+
+    def top_k_by_rating(self, k, cuisine_type=None, location=None, min_rating=None):
+        """
+        Get the k best rated restaurants that match the given filters.
+        
+        The filters behave exactly like in search_by_filters. When the database keeps a rating index the
+        restaurants are visited from the best rating downwards and the search stops after k matches,
+        so the full result set is never sorted.
+        
+        Args:
+            k (int): The maximum number of restaurants to return.
+            cuisine_type (str, optional): The type of cuisine to filter by.
+            location (str, optional): The location to filter by.
+            min_rating (float, optional): The minimum acceptable rating to filter by.
+        
+        Returns:
+            list: Up to k restaurants ordered by rating, best first. Ties keep database order.
+        """
+        if k <= 0:
+            return []
 
-        return results
+        if hasattr(self.database, "iter_by_rating_desc"):
+            results = []
+            with self._read_lock():
+                for restaurant in self.database.iter_by_rating_desc():
+                    if min_rating and restaurant['rating'] < min_rating:
+                        break  # Every remaining restaurant is rated lower
+                    if self._matches_filters(restaurant, cuisine_type, location, None):
+                        results.append(restaurant)
+                        if len(results) == k:
+                            break
+            return results
 
+        matches = (restaurant for restaurant in self.database.get_restaurants()
+                   if self._matches_filters(restaurant, cuisine_type, location, min_rating))
+        return heapq.nlargest(k, matches, key=lambda restaurant: restaurant['rating'])
 
-class RestaurantDatabase:
+    def search_nearby(self, latitude, longitude, radius_km, cuisine_type=None, location=None, min_rating=None,
+                      delivery_only=False):
+        """
+        Search for restaurants within a radius of a point, combined with the search_by_filters filters.
+        
+        Args:
+            latitude (float): Latitude of the point (e.g., the user's delivery address) in degrees.
+            longitude (float): Longitude of the point in degrees.
+            radius_km (float): The search radius in kilometres.
+            cuisine_type (str, optional): The type of cuisine to filter by.
+            location (str, optional): The location to filter by.
+            min_rating (float, optional): The minimum acceptable rating to filter by.
+            delivery_only (bool, optional): Only return restaurants that deliver. Defaults to False.
+        
+        Returns:
+            list: Matching restaurants with coordinates, nearest first.
+        """
+        matches = self._spatial_filter(cuisine_type, location, min_rating, delivery_only)
+        if hasattr(self.database, "spatial_index"):
+            restaurants = self.database.records
+            with self._read_lock():
+                found = [(distance, restaurant_id)
+                         for distance, restaurant_id in self.database.spatial_index.within(latitude, longitude, radius_km)
+                         if matches(restaurants[restaurant_id])]
+                found.sort()
+                return [restaurants[restaurant_id] for _, restaurant_id in found]
+
+        found = [(distance, position, restaurant) for distance, position, restaurant in self._scan_distances(latitude, longitude)
+                 if distance <= radius_km and matches(restaurant)]
+        found.sort(key=lambda match: match[:2])
+        return [restaurant for _, _, restaurant in found]
+
+    def nearest(self, latitude, longitude, k, cuisine_type=None, location=None, min_rating=None, delivery_only=False):
+        """
+        Find the k restaurants nearest to a point that match the search_by_filters filters.
+        
+        Args:
+            latitude (float): Latitude of the point in degrees.
+            longitude (float): Longitude of the point in degrees.
+            k (int): The maximum number of restaurants to return.
+            cuisine_type (str, optional): The type of cuisine to filter by.
+            location (str, optional): The location to filter by.
+            min_rating (float, optional): The minimum acceptable rating to filter by.
+            delivery_only (bool, optional): Only return restaurants that deliver. Defaults to False.
+        
+        Returns:
+            list: Up to k restaurants with coordinates, nearest first.
+        """
+        if k <= 0:
+            return []
+        matches = self._spatial_filter(cuisine_type, location, min_rating, delivery_only)
+        if hasattr(self.database, "spatial_index"):
+            restaurants = self.database.records
+            with self._read_lock():
+                found = self.database.spatial_index.nearest(latitude, longitude, k,
+                                                            lambda restaurant_id: matches(restaurants[restaurant_id]))
+                return [restaurants[restaurant_id] for _, restaurant_id in found]
+
+        found = heapq.nsmallest(k, ((distance, position, restaurant)
+                                    for distance, position, restaurant in self._scan_distances(latitude, longitude)
+                                    if matches(restaurant)), key=lambda match: match[:2])
+        return [restaurant for _, _, restaurant in found]
+
+    def _spatial_filter(self, cuisine_type, location, min_rating, delivery_only):
+        """
+        Build the per-restaurant check used by the geospatial searches.
+        """
+        def matches(restaurant):
+            if delivery_only and not restaurant.get('delivery'):
+                return False
+            return self._matches_filters(restaurant, cuisine_type, location, min_rating)
+        return matches
+
+    def _scan_distances(self, latitude, longitude):
+        """
+        Yield (distance, position, restaurant) for every restaurant with coordinates, for databases without
+        a spatial index.
+        """
+        for position, restaurant in enumerate(self.database.get_restaurants()):
+            if restaurant.get('latitude') is None or restaurant.get('longitude') is None:
+                continue
+            yield haversine_km(latitude, longitude, restaurant['latitude'], restaurant['longitude']), position, restaurant
+
+    def iter_filters(self, cuisine_type=None, location=None, min_rating=None):
+        """
+        Lazily yield the restaurants matching the search_by_filters filters, in database order.
+        
+        Matches are fetched ITER_BATCH_SIZE at a time under the database's lock and yielded without it,
+        so the caller may take its time. Like page(), it continues after the last restaurant yielded.
+        
+        Args:
+            cuisine_type (str, optional): The type of cuisine to filter by.
+            location (str, optional): The location to filter by.
+            min_rating (float, optional): The minimum acceptable rating to filter by.
+        
+        Yields:
+            dict: The matching restaurants, one at a time.
+        """
+        after = -1
+        while True:
+            with self._read_lock():
+                batch = list(islice(self._iter_matches(cuisine_type, location, min_rating, after), self.ITER_BATCH_SIZE))
+            for _, restaurant in batch:
+                yield restaurant
+            if len(batch) < self.ITER_BATCH_SIZE:
+                return
+            after = batch[-1][0]
+
+    def make_cursor(self, cuisine_type=None, location=None, min_rating=None):
+        """
+        Create a cursor pointing at the start of a filtered result set, to be passed to page().
+        
+        Args:
+            cuisine_type (str, optional): The type of cuisine to filter by.
+            location (str, optional): The location to filter by.
+            min_rating (float, optional): The minimum acceptable rating to filter by.
+        
+        Returns:
+            str: An opaque continuation token.
+        """
+        return self._encode_cursor(cuisine_type, location, min_rating, -1)
+
+    def page(self, cursor, limit=50):
+        """
+        Fetch the next page of a result set.
+        
+        Pages are in database order and each continuation token remembers the last restaurant
+        returned, so paging stays stable and never repeats or skips rows that were already there.
+        
+        Args:
+            cursor (str): A token from make_cursor() or from a previous page() call.
+            limit (int, optional): The maximum number of restaurants to return. Defaults to 50.
+        
+        Returns:
+            tuple: (list of restaurants, next cursor). The next cursor is None when there are no more results.
+        
+        Raises:
+            ValueError: If the cursor is not a valid token or limit is less than 1.
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        cuisine_type, location, min_rating, after = self._decode_cursor(cursor)
+        with self._read_lock():
+            matches = list(islice(self._iter_matches(cuisine_type, location, min_rating, after), limit + 1))
+        if len(matches) <= limit:
+            return [restaurant for _, restaurant in matches], None
+        matches.pop()  # Only fetched to know whether another page exists
+        next_cursor = self._encode_cursor(cuisine_type, location, min_rating, matches[-1][0])
+        return [restaurant for _, restaurant in matches], next_cursor
+
+    def _read_lock(self):
+        """
+        The database's lock, to hold while reading its indexes; a no-op for databases without one.
+        """
+        lock = getattr(self.database, "lock", None)
+        return lock if lock is not None else nullcontext()
+
+    def _iter_matches(self, cuisine_type, location, min_rating, after=-1):
+        """
+        Yield (restaurant id, restaurant) pairs matching the filters, using the planner when available.
+        
+        Restaurant ids are positions in get_restaurants() for databases without indexes.
+        """
+        if self.planner is not None:
+            plan = self.planner.plan(cuisine_type=cuisine_type, location=location, min_rating=min_rating)
+            yield from self.planner.iter_matches(plan, after)
+            return
+        restaurants = self.database.get_restaurants()
+        for restaurant_id in range(after + 1, len(restaurants)):
+            if self._matches_filters(restaurants[restaurant_id], cuisine_type, location, min_rating):
+                yield restaurant_id, restaurants[restaurant_id]
+
+    def _encode_cursor(self, cuisine_type, location, min_rating, after):
+        """
+        Pack filters and position into an opaque URL-safe token.
+        """
+        state = json.dumps([cuisine_type, location, min_rating, after], separators=(",", ":"))
+        return base64.urlsafe_b64encode(state.encode("utf-8")).decode("ascii")
+
+    def _decode_cursor(self, cursor):
+        """
+        Unpack a token created by _encode_cursor.
+        
+        Raises:
+            ValueError: If the cursor is not a valid token.
+        """
+        try:
+            cuisine_type, location, min_rating, after = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        except (ValueError, TypeError, AttributeError):
+            raise ValueError("Invalid cursor")
+        if not isinstance(after, int) or isinstance(after, bool):
+            raise ValueError("Invalid cursor")
+        if not all(value is None or isinstance(value, str) for value in (cuisine_type, location)):
+            raise ValueError("Invalid cursor")
+        if min_rating is not None and not (_is_number(min_rating) and math.isfinite(min_rating)):
+            raise ValueError("Invalid cursor")
+        return cuisine_type, location, min_rating, after
+
+    def _matches_filters(self, restaurant, cuisine_type, location, min_rating):
+        """
+        Check a single restaurant against the filters used by search_by_filters.
+        
+        Returns:
+            bool: True if the restaurant matches every given filter.
+        """
+        if cuisine_type and cuisine_type.lower() not in restaurant['cuisine'].lower():
+            return False
+        if location and location.lower() not in restaurant['location'].lower():
+            return False
+        if min_rating and restaurant['rating'] < min_rating:
+            return False
+        return True
+
+
+class GridIndex:
     """
-    A simulated in-memory database that stores restaurant information.
+    A uniform latitude/longitude grid for radius and nearest-neighbour queries.
+    
+    Points are bucketed into square cells of `cell_size` degrees. A radius query only visits the
+    cells overlapping the circle's bounding box, and a nearest-neighbour query visits rings of cells
+    around the query point until no unvisited cell can hold a closer point. Longitudes are not
+    wrapped at the antimeridian.
     
     Attributes:
-        restaurants (list): A list of dictionaries, where each dictionary represents a restaurant with
-                            fields like name, cuisine, location, rating, price range, and delivery status.
+        cell_size (float): The cell edge length in degrees.
+        cells (dict): Maps (row, column) to a list of (latitude, longitude, item id) tuples.
     """
 
-    def __init__(self):
+    def __init__(self, cell_size=0.05):
         """
-        Initialize the RestaurantDatabase with a predefined set of restaurant data.
+        Initialize an empty GridIndex.
+        
+        Args:
+            cell_size (float, optional): The cell edge length in degrees. Defaults to 0.05 (about 5.5 km of latitude).
         """
-        self.restaurants = [
-            {"name": "Italian Bistro", "cuisine": "Italian", "location": "Downtown","phonenumber": "+535 836 7284", "rating": 4.5, 
-             "price_range": "$$", "delivery": True},
-            {"name": "Sushi House", "cuisine": "Japanese", "location": "Midtown","phonenumber": "+535 739 9483", "rating": 4.8, 
-             "price_range": "$$$", "delivery": False},
-            {"name": "Burger King", "cuisine": "Fast Food", "location": "Uptown","phonenumber": "+535 824 9274", "rating": 4.0, 
-             "price_range": "$", "delivery": True},
-            {"name": "Taco Town", "cuisine": "Mexican", "location": "Downtown","phonenumber": "+535 123 4325", "rating": 4.2, 
-             "price_range": "$", "delivery": True},
-            {"name": "Pizza Palace", "cuisine": "Italian", "location": "Uptown","phonenumber": "+535 223 5535", "rating": 3.9, 
-             "price_range": "$$", "delivery": True}
-        ]
+        self.cell_size = cell_size
+        self.cells = {}
+        self._bounds = None  # (min row, max row, min column, max column) of all cells ever used
 
-    def get_restaurants(self):
+    def _cell(self, latitude, longitude):
+        return math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size)
+
+    def add(self, item_id, latitude, longitude):
         """
-        Retrieve the list of restaurants in the database.
+        Add a point to the index.
+        
+        Args:
+            item_id (int): The id returned by queries for this point.
+            latitude (float): Latitude in degrees.
+            longitude (float): Longitude in degrees.
+        """
+        row, column = self._cell(latitude, longitude)
+        self.cells.setdefault((row, column), []).append((latitude, longitude, item_id))
+        if self._bounds is None:
+            self._bounds = (row, row, column, column)
+        else:
+            min_row, max_row, min_column, max_column = self._bounds
+            self._bounds = (min(min_row, row), max(max_row, row), min(min_column, column), max(max_column, column))
+
+    def remove(self, item_id, latitude, longitude):
+        """
+        Remove a point that was added with the same id and coordinates.
+        
+        Args:
+            item_id (int): The id of the point.
+            latitude (float): Latitude the point was added with.
+            longitude (float): Longitude the point was added with.
+        
+        Raises:
+            ValueError: If the point is not in the index.
+        """
+        cell = self._cell(latitude, longitude)
+        points = self.cells.get(cell, [])
+        points.remove((latitude, longitude, item_id))
+        if not points:
+            del self.cells[cell]
+
+    def within(self, latitude, longitude, radius_km):
+        """
+        Find the points within a radius.
+        
+        Args:
+            latitude (float): Latitude of the centre in degrees.
+            longitude (float): Longitude of the centre in degrees.
+            radius_km (float): The radius in kilometres.
         
         Returns:
-            list: A list of dictionaries, where each dictionary contains restaurant information.
+            list: Unsorted (distance in km, item id) pairs.
         """
-        return self.restaurants
+        delta_latitude = radius_km / KM_PER_DEGREE
+        # Use the latitude nearest a pole within the circle, where a degree of longitude is shortest
+        widest_latitude = min(89.9, abs(latitude) + delta_latitude)
+        delta_longitude = min(180.0, delta_latitude / math.cos(math.radians(widest_latitude)))
 
+        min_row, min_column = self._cell(latitude - delta_latitude, longitude - delta_longitude)
+        max_row, max_column = self._cell(latitude + delta_latitude, longitude + delta_longitude)
+        if (max_row - min_row + 1) * (max_column - min_column + 1) > len(self.cells):
+            # Huge radius: walking the occupied cells is cheaper than walking the bounding box
+            cells = [points for (row, column), points in self.cells.items()
+                     if min_row <= row <= max_row and min_column <= column <= max_column]
+        else:
+            cells = [self.cells[(row, column)]
+                     for row in range(min_row, max_row + 1)
+                     for column in range(min_column, max_column + 1)
+                     if (row, column) in self.cells]
 
-class RestaurantSearch:
+        found = []
+        for points in cells:
+            for point_latitude, point_longitude, item_id in points:
+                if abs(point_latitude - latitude) > delta_latitude or abs(point_longitude - longitude) > delta_longitude:
+                    continue  # Outside the bounding box, cannot be within the radius
+                distance = haversine_km(latitude, longitude, point_latitude, point_longitude)
+                if distance <= radius_km:
+                    found.append((distance, item_id))
+        return found
+
+    def nearest(self, latitude, longitude, k, predicate=None):
+        """
+        Find the k nearest points, optionally only among those accepted by a predicate.
+        
+        Args:
+            latitude (float): Latitude of the query point in degrees.
+            longitude (float): Longitude of the query point in degrees.
+            k (int): The maximum number of points to return.
+            predicate (callable, optional): Called with an item id; points for which it returns False are skipped.
+        
+        Returns:
+            list: Up to k (distance in km, item id) pairs, nearest first.
+        """
+        if k <= 0 or self._bounds is None:
+            return []
+        center_row, center_column = self._cell(latitude, longitude)
+        min_row, max_row, min_column, max_column = self._bounds
+        last_ring = max(center_row - min_row, max_row - center_row, center_column - min_column, max_column - center_column)
+
+        best = []  # Max-heap of the k nearest matches so far, as (-distance, -item id)
+        ring = 0
+        while ring <= last_ring:
+            if 8 * ring > len(self.cells):
+                # Rings are now mostly empty; finish with one pass over the remaining cells
+                cells = [points for (row, column), points in self.cells.items()
+                         if max(abs(row - center_row), abs(column - center_column)) >= ring]
+                ring = last_ring
+            else:
+                cells = [self.cells[cell] for cell in self._ring_cells(center_row, center_column, ring) if cell in self.cells]
+
+            for points in cells:
+                for point_latitude, point_longitude, item_id in points:
+                    distance = haversine_km(latitude, longitude, point_latitude, point_longitude)
+                    if len(best) == k and distance >= -best[0][0]:
+                        continue
+                    if predicate is not None and not predicate(item_id):
+                        continue
+                    if len(best) == k:
+                        heapq.heapreplace(best, (-distance, -item_id))
+                    else:
+                        heapq.heappush(best, (-distance, -item_id))
+
+            # Every unvisited point lies at least `ring` whole cells away from the query point's cell
+            if len(best) == k and self._ring_distance_km(latitude, ring) >= -best[0][0]:
+                break
+            ring += 1
+
+        return sorted((-distance, -item_id) for distance, item_id in best)
+
+    def _ring_cells(self, center_row, center_column, ring):
+        """
+        Yield the cells at Chebyshev distance `ring` from the centre cell.
+        """
+        if ring == 0:
+            yield center_row, center_column
+            return
+        for column in range(center_column - ring, center_column + ring + 1):
+            yield center_row - ring, column
+            yield center_row + ring, column
+        for row in range(center_row - ring + 1, center_row + ring):
+            yield row, center_column - ring
+            yield row, center_column + ring
+
+    def _ring_distance_km(self, latitude, ring):
+        """
+        A lower bound for the distance from a point to any cell outside the first `ring` rings.
+        
+        The 0.999 factor covers great circles being slightly shorter than the parallel between two
+        points at the same latitude.
+        """
+        widest_latitude = min(89.9, abs(latitude) + (ring + 2) * self.cell_size)
+        return 0.999 * ring * self.cell_size * KM_PER_DEGREE * math.cos(math.radians(widest_latitude))
+
+
+class SortedBlockList:
     """
-    A class that interfaces with RestaurantBrowsing to perform restaurant searches based on user input.
+    A sorted sequence stored as a list of blocks, so that inserts and removals only shift one block.
     
-    Attributes:
-        browsing (RestaurantBrowsing): An instance of RestaurantBrowsing used to perform searches.
+    Locating a value is a bisect over the block maxima followed by a bisect inside one block, and
+    each block holds at most 2 * BLOCK_SIZE values, so add() and remove() cost O(log n) plus a
+    bounded block shift instead of shifting the whole sequence.
     """
 
-    def __init__(self, browsing):
+    BLOCK_SIZE = 512
+
+    def __init__(self, values=()):
         """
-        Initialize the RestaurantSearch with a reference to a RestaurantBrowsing instance.
+        Initialize the list from values that are already sorted.
         
         Args:
-            browsing (RestaurantBrowsing): An instance of the RestaurantBrowsing class.
+            values (iterable, optional): Sorted values.
         """
-        self.browsing = browsing
+        values = list(values)
+        self._blocks = [values[i:i + self.BLOCK_SIZE] for i in range(0, len(values), self.BLOCK_SIZE)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._len = len(values)
 
-    def search_restaurants(self, cuisine=None, location=None, rating=None):
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return chain.from_iterable(self._blocks)
+
+    def __reversed__(self):
+        return chain.from_iterable(map(reversed, reversed(self._blocks)))
+
+    def add(self, value):
         """
-        Search for restaurants using multiple optional filters: cuisine, location, and rating.
+        Insert a value, keeping the sequence sorted.
+        """
+        if not self._blocks:
+            self._blocks.append([value])
+            self._maxes.append(value)
+        else:
+            i = min(bisect_left(self._maxes, value), len(self._blocks) - 1)
+            block = self._blocks[i]
+            insort(block, value)
+            self._maxes[i] = block[-1]
+            if len(block) > 2 * self.BLOCK_SIZE:
+                self._blocks[i:i + 1] = [block[:self.BLOCK_SIZE], block[self.BLOCK_SIZE:]]
+                self._maxes[i:i + 1] = [block[self.BLOCK_SIZE - 1], block[-1]]
+        self._len += 1
+
+    def remove(self, value):
+        """
+        Remove one occurrence of a value.
         
-        Args:
-            cuisine (str, optional): The type of cuisine to filter by.
-            location (str, optional): The location to filter by.
-            rating (float, optional): The minimum rating to filter by.
+        Raises:
+            ValueError: If the value is not present.
+        """
+        i = bisect_left(self._maxes, value)
+        if i == len(self._blocks):
+            raise ValueError(f"{value!r} not in list")
+        block = self._blocks[i]
+        j = bisect_left(block, value)
+        if block[j] != value:
+            raise ValueError(f"{value!r} not in list")
+        del block[j]
+        if block:
+            self._maxes[i] = block[-1]
+        else:
+            del self._blocks[i]
+            del self._maxes[i]
+        self._len -= 1
+
+    def irange(self, minimum):
+        """
+        Iterate over the values greater than or equal to minimum.
+        """
+        i = bisect_left(self._maxes, minimum)
+        if i == len(self._blocks):
+            return iter(())
+        block = self._blocks[i]
+        return chain(islice(block, bisect_left(block, minimum), None), chain.from_iterable(self._blocks[i + 1:]))
+
+    def count_from(self, minimum):
+        """
+        Count the values greater than or equal to minimum.
+        """
+        i = bisect_left(self._maxes, minimum)
+        if i == len(self._blocks):
+            return 0
+        block = self._blocks[i]
+        return len(block) - bisect_left(block, minimum) + sum(map(len, self._blocks[i + 1:]))
+
+
+def _bucket_add(index, key, restaurant_id):
+    """
+    Add an id to a hash index bucket, keeping the bucket sorted.
+    
+    Buckets start as plain lists, which are cheapest for the many small buckets (e.g. one per name),
+    and become a SortedBlockList once they grow past two blocks.
+    """
+    bucket = index.get(key)
+    if bucket is None:
+        index[key] = [restaurant_id]
+    elif isinstance(bucket, list):
+        insort(bucket, restaurant_id)  # New ids are the largest, so this is usually an append
+        if len(bucket) > 2 * SortedBlockList.BLOCK_SIZE:
+            index[key] = SortedBlockList(bucket)
+    else:
+        bucket.add(restaurant_id)
+
+
+def _bucket_remove(index, key, restaurant_id):
+    """
+    Remove an id from a hash index bucket.
+    
+    Returns:
+        bool: True if the bucket became empty and the key was dropped.
+    """
+    bucket = index[key]
+    if isinstance(bucket, list):
+        del bucket[bisect_left(bucket, restaurant_id)]
+    else:
+        bucket.remove(restaurant_id)
+    if not len(bucket):
+        del index[key]
+        return True
+    return False
+
+
+def _iter_after(bucket, after):
+    """
+    Iterate over the ids in a sorted bucket that are greater than after.
+    """
+    if isinstance(bucket, list):
+        return islice(bucket, bisect_right(bucket, after), None)
+    return bucket.irange(after + 1)
+
+
+class QueryPlan:
+    """
+    The execution plan chosen by QueryPlanner for a single search.
+    
+    Attributes:
+        driver (str): The filter whose index produces the candidate rows ("cuisine", "location" or "rating"),
+                      or None when no filter was given.
+        estimates (dict): Estimated number of matching rows for every given filter.
+        residual (list): Filters checked on each candidate row after the index lookup.
+        predicates (dict): The normalized filter values (lower-cased text, float rating).
+        candidates (list): Sorted buckets of restaurant ids produced by a text driver index (None for rating).
+    """
+
+    def __init__(self, driver, estimates, residual, predicates, candidates):
+        self.driver = driver
+        self.estimates = estimates
+        self.residual = residual
+        self.predicates = predicates
+        self.candidates = candidates
+
+    def explain(self):
+        """
+        Describe the plan in one line.
         
         Returns:
-            list: A list of restaurants that match the provided search criteria.
+            str: For example "index on cuisine (~12 rows), then filter rating; estimates: cuisine=12, rating=431".
         """
-        results = self.browsing.search_by_filters(cuisine_type=cuisine, location=location, min_rating=rating)
-        return results
-    
\ No newline at end of file
+        if self.driver is None:
+            return "full scan (no filters)"
+        text = f"index on {self.driver} (~{self.estimates[self.driver]} rows)"
+        if self.residual:
+            text += ", then filter " + ", ".join(self.residual)
+        estimates = ", ".join(f"{field}={count}" for field, count in self.estimates.items())
+        return f"{text}; estimates: {estimates}"
+
+
+class QueryPlanner:
+    """
+    Chooses the most selective index for a multi-filter search and runs the remaining filters in one pass.
+    
+    Text filters keep the substring semantics of search_by_filters. Their selectivity comes from the hash
+    index buckets whose key contains the needle, and the rating filter's from a bisect on the rating index.
+    Both estimates are exact, so the driver is always the index yielding the fewest candidates.
+    
+    Plans refer to the live index buckets, so the caller holds the database's lock from planning until
+    it has read the matches it needs.
+    
+    Attributes:
+        database (RestaurantDatabase): The indexed database to plan against.
+    """
+
+    TEXT_FIELDS = ("cuisine", "location")
+
+    # A rating-driven plan matching at most this many rows sorts their ids; larger ones are paged by
+    # scanning in database order with the rating as a residual filter, which stops as soon as a page is full.
+    RATING_SORT_LIMIT = 4096
+
+    def __init__(self, database):
+        """
+        Initialize the QueryPlanner for a database.
+        
+        Args:
+            database (RestaurantDatabase): A database providing matching_buckets, count_min_rating and
+                                           ids_with_min_rating.
+        """
+        self.database = database
+
+    def plan(self, cuisine_type=None, location=None, min_rating=None):
+        """
+        Estimate every filter's selectivity and pick the cheapest one as the driver.
+        
+        Args:
+            cuisine_type (str, optional): The type of cuisine to filter by.
+            location (str, optional): The location to filter by.
+            min_rating (float, optional): The minimum acceptable rating to filter by.
+        
+        Returns:
+            QueryPlan: The chosen plan.
+        """
+        predicates = {}
+        if cuisine_type:
+            predicates["cuisine"] = cuisine_type.lower()
+        if location:
+            predicates["location"] = location.lower()
+        if min_rating:
+            predicates["rating"] = min_rating
+        if not predicates:
+            return QueryPlan(None, {}, [], predicates, None)
+
+        candidates = {}
+        estimates = {}
+        for field in self.TEXT_FIELDS:
+            if field in predicates:
+                candidates[field] = self.database.matching_buckets(field, predicates[field])
+                estimates[field] = sum(len(bucket) for bucket in candidates[field])
+        if "rating" in predicates:
+            estimates["rating"] = self.database.count_min_rating(predicates["rating"])
+
+        driver = min(estimates, key=estimates.get)
+        residual = [field for field in predicates if field != driver]
+        return QueryPlan(driver, estimates, residual, predicates, candidates.get(driver))
+
+    def execute(self, plan):
+        """
+        Run a plan: fetch the driver's candidates and check the residual filters in a single fused pass.
+        
+        Args:
+            plan (QueryPlan): A plan returned by plan().
+        
+        Returns:
+            list: The matching restaurants, in database order.
+        """
+        if plan.driver is None:
+            return list(self.database.get_restaurants())
+        return [restaurant for _, restaurant in self.iter_matches(plan)]
+
+    def iter_matches(self, plan, after=-1):
+        """
+        Lazily yield the rows matching a plan, in database order.
+        
+        Args:
+            plan (QueryPlan): A plan returned by plan().
+            after (int, optional): Only yield restaurants whose id is greater than this one.
+        
+        Yields:
+            tuple: (restaurant id, restaurant dictionary) pairs.
+        """
+        records = self.database.records
+        cuisine = plan.predicates["cuisine"] if "cuisine" in plan.residual else None
+        location = plan.predicates["location"] if "location" in plan.residual else None
+        min_rating = plan.predicates["rating"] if "rating" in plan.residual else None
+
+        if plan.driver is None:
+            restaurant_ids = self.database.iter_ids(after)
+        elif plan.driver == "rating" and plan.estimates["rating"] <= self.RATING_SORT_LIMIT:
+            restaurant_ids = sorted(restaurant_id for restaurant_id in self.database.ids_with_min_rating(plan.predicates["rating"])
+                                    if restaurant_id > after)
+        elif plan.driver == "rating":
+            restaurant_ids = self.database.iter_ids(after)
+            min_rating = plan.predicates["rating"]
+        else:
+            # Each hash bucket is already in database order and the buckets are disjoint
+            restaurant_ids = heapq.merge(*(_iter_after(bucket, after) for bucket in plan.candidates))
+
+        for restaurant_id in restaurant_ids:
+            restaurant = records.get(restaurant_id)
+            if restaurant is None:
+                continue  # Removed after the plan was made
+            if cuisine is not None and cuisine not in restaurant['cuisine'].lower():
+                continue
+            if location is not None and location not in restaurant['location'].lower():
+                continue
+            if min_rating is not None and restaurant['rating'] < min_rating:
+                continue
+            yield restaurant_id, restaurant
+
+
+class RestaurantDatabase:
+    """
+    A simulated in-memory database that stores restaurant information.
+    
+    Every restaurant gets a stable integer id when it is added. Ids only grow, so id order is the order in
+    which restaurants were added ("database order"). All secondary indexes are updated incrementally by
+    add(), update(), remove() and bulk_upsert(); the restaurant dictionaries must not be modified directly.
+    
+    Attributes:
+        records (dict): Maps restaurant id to the restaurant dictionary, in database order.
+        indexes (dict): Hash indexes keyed by field name (see INDEXED_FIELDS). Each index maps a lower-cased
+                        field value to the sorted restaurant ids having that value.
+        trigram_indexes (dict): For each indexed field, maps every trigram to the set of index keys containing it.
+                                Used to answer substring queries without looking at every key.
+        rating_index (SortedBlockList): (rating, -id) pairs, so walking it backwards gives the best rating
+                                        first and database order among equal ratings.
+        spatial_index (GridIndex): Restaurants that have "latitude" and "longitude", bucketed by grid cell.
+        version (int): Incremented on every change to the data, so caches can detect stale results.
+        lock (threading.RLock): Serializes changes to the data. Readers of the indexes hold it too, so that
+                                they never see a change halfway; the lookup methods below take it themselves.
+    """
+
+    # Fields that get a case-insensitive hash index for exact-match lookups and a trigram index for substrings.
+    INDEXED_FIELDS = ("cuisine", "location", "name")
+
+    # Fields every restaurant must have.
+    REQUIRED_FIELDS = ("name", "cuisine", "location", "rating")
+
+    def __init__(self, restaurants=None):
+        """
+        Initialize the RestaurantDatabase with a predefined set of restaurant data.
+        
+        Args:
+            restaurants (list, optional): Restaurant dictionaries to load instead of the built-in sample data.
+        """
+        if restaurants is None:
+            restaurants = [
+                {"name": "Italian Bistro", "cuisine": "Italian", "location": "Downtown","phonenumber": "+535 836 7284", "rating": 4.5, 
+                 "price_range": "$$", "delivery": True, "latitude": 60.1699, "longitude": 24.9384},
+                {"name": "Sushi House", "cuisine": "Japanese", "location": "Midtown","phonenumber": "+535 739 9483", "rating": 4.8, 
+                 "price_range": "$$$", "delivery": False, "latitude": 60.1841, "longitude": 24.9510},
+                {"name": "Burger King", "cuisine": "Fast Food", "location": "Uptown","phonenumber": "+535 824 9274", "rating": 4.0, 
+                 "price_range": "$", "delivery": True, "latitude": 60.2055, "longitude": 24.9655},
+                {"name": "Taco Town", "cuisine": "Mexican", "location": "Downtown","phonenumber": "+535 123 4325", "rating": 4.2, 
+                 "price_range": "$", "delivery": True, "latitude": 60.1675, "longitude": 24.9312},
+                {"name": "Pizza Palace", "cuisine": "Italian", "location": "Uptown","phonenumber": "+535 223 5535", "rating": 3.9, 
+                 "price_range": "$$", "delivery": True, "latitude": 60.2101, "longitude": 24.9789}
+            ]
+        self.records = {restaurant_id: restaurant for restaurant_id, restaurant in enumerate(restaurants)}
+        self.lock = threading.RLock()
+        self.version = 0
+        self.rebuild_indexes()
+
+    @property
+    def restaurants(self):
+        """
+        list: Every restaurant in database order. Read-only; use the mutation methods to change data.
+        """
+        return self.get_restaurants()
+
+    def __len__(self):
+        return len(self.records)
+
+    def get_restaurants(self):
+        """
+        Retrieve the list of restaurants in the database.
+        
+        The list is cached until the next add or remove.
+        
+        Returns:
+            list: A list of dictionaries, where each dictionary contains restaurant information.
+        """
+        restaurants = self._restaurant_list
+        if restaurants is None:
+            with self.lock:
+                restaurants = self._restaurant_list = list(self.records.values())
+        return restaurants
+
+    def get(self, restaurant_id):
+        """
+        Retrieve a single restaurant by id.
+        
+        Args:
+            restaurant_id (int): The id returned by add().
+        
+        Returns:
+            dict: The restaurant, or None if there is no restaurant with that id.
+        """
+        return self.records.get(restaurant_id)
+
+    def iter_ids(self, after=-1):
+        """
+        Iterate over restaurant ids in database order. Ids removed while iterating are skipped.
+        
+        Args:
+            after (int, optional): Only yield ids greater than this one.
+        
+        Yields:
+            int: Restaurant ids.
+        """
+        id_order = self._id_order
+        for restaurant_id in islice(id_order, bisect_right(id_order, after), None):
+            if restaurant_id in self.records:  # Skip ids removed since the last compaction
+                yield restaurant_id
+
+    def rebuild_indexes(self):
+        """
+        Rebuild every secondary index from `records`.
+        
+        Only needed after restaurant dictionaries were modified directly instead of through
+        add(), update(), remove() or bulk_upsert().
+        """
+        with self.lock:
+            self.version += 1
+            self._restaurant_list = None
+            self._id_order = list(self.records)
+            self._removed_ids = 0
+            self._next_id = self._id_order[-1] + 1 if self._id_order else 0
+
+            self.indexes = {field: {} for field in self.INDEXED_FIELDS}
+            for restaurant_id, restaurant in self.records.items():
+                for field in self.INDEXED_FIELDS:
+                    self.indexes[field].setdefault(restaurant[field].lower(), []).append(restaurant_id)
+            for index in self.indexes.values():
+                for key, bucket in index.items():
+                    if len(bucket) > 2 * SortedBlockList.BLOCK_SIZE:
+                        index[key] = SortedBlockList(bucket)
+
+            self.trigram_indexes = {field: {} for field in self.INDEXED_FIELDS}
+            for field in self.INDEXED_FIELDS:
+                trigram_index = self.trigram_indexes[field]
+                for key in self.indexes[field]:
+                    for trigram in _trigrams(key):
+                        trigram_index.setdefault(trigram, set()).add(key)
+
+            self.rating_index = SortedBlockList(sorted((restaurant['rating'], -restaurant_id)
+                                                       for restaurant_id, restaurant in self.records.items()))
+
+            self.spatial_index = GridIndex()
+            for restaurant_id, restaurant in self.records.items():
+                if restaurant.get('latitude') is not None and restaurant.get('longitude') is not None:
+                    self.spatial_index.add(restaurant_id, restaurant['latitude'], restaurant['longitude'])
+
+    def load_feed(self, path, file_format=None, use_mmap=False, trace_memory=False, max_errors=20):
+        """
+        Stream a CSV or JSONL restaurant feed into the database.
+        
+        The file is read row by row and each valid row is indexed as soon as it is read, so memory use
+        is the size of the loaded catalog plus one row. Only the rating index is built at the end, with
+        one sort instead of one insert per row. Invalid rows are skipped and reported.
+        
+        Args:
+            path (str): The feed file. CSV files need a header row with the restaurant field names.
+            file_format (str, optional): "csv" or "jsonl". Guessed from the file extension when omitted.
+            use_mmap (bool, optional): Read the file through a memory map. Defaults to False.
+            trace_memory (bool, optional): Measure peak Python memory with tracemalloc. This slows loading
+                                           down, so it is off by default.
+            max_errors (int, optional): How many rejected rows to describe in the report. Defaults to 20.
+        
+        Returns:
+            dict: A load report with "rows" (loaded), "rejected", "errors" (list of (line, message)),
+                  "seconds", "rows_per_sec" and "peak_memory_bytes" (None unless trace_memory is set).
+        
+        Raises:
+            ValueError: If the file format is unknown.
+            UnicodeDecodeError: If a CSV feed is not valid UTF-8. The rows before the bad one stay loaded
+                                and fully indexed.
+        """
+        if file_format is None:
+            extension = os.path.splitext(path)[1].lower()
+            file_format = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}.get(extension)
+        if file_format not in ("csv", "jsonl"):
+            raise ValueError(f"Unsupported feed format: {file_format}")
+
+        if trace_memory:
+            tracemalloc.start()
+        try:
+            start_time = time.perf_counter()
+            loaded = 0
+            rejected = 0
+            errors = []
+            new_ratings = []
+            # Everything except the rating index is maintained row by row
+            streamed_fields = self.INDEXED_FIELDS + ("latitude",)
+
+            with self.lock:
+                try:
+                    for line_number, raw in _read_feed(path, file_format, use_mmap):
+                        try:
+                            if isinstance(raw, Exception):
+                                raise raw
+                            restaurant = _coerce_restaurant(raw)
+                        except (ValueError, TypeError) as e:
+                            rejected += 1
+                            if len(errors) < max_errors:
+                                errors.append((line_number, str(e)))
+                            continue
+
+                        restaurant_id = self._next_id
+                        self._next_id += 1
+                        self.records[restaurant_id] = restaurant
+                        self._id_order.append(restaurant_id)
+                        self._index(restaurant_id, restaurant, streamed_fields)
+                        new_ratings.append((restaurant['rating'], -restaurant_id))
+                        loaded += 1
+                finally:
+                    # Even if reading fails partway, the rows already in `records` get rated and published
+                    if not len(self.rating_index):
+                        self.rating_index = SortedBlockList(sorted(new_ratings))
+                    else:
+                        for pair in new_ratings:
+                            self.rating_index.add(pair)
+                    self._restaurant_list = None
+                    self.version += 1
+
+            seconds = time.perf_counter() - start_time
+            peak_memory = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+        return {"rows": loaded, "rejected": rejected, "errors": errors, "seconds": seconds,
+                "rows_per_sec": loaded / seconds if seconds > 0 else 0.0, "peak_memory_bytes": peak_memory}
+
+    def add(self, restaurant):
+        """
+        Add a restaurant and index it.
+        
+        Args:
+            restaurant (dict): The restaurant's fields. It must have name, cuisine, location and rating.
+        
+        Returns:
+            int: The new restaurant's id.
+        
+        Raises:
+            ValueError: If a required field is missing or has the wrong type.
+        """
+        self._validate(restaurant)
+        with self.lock:
+            restaurant_id = self._next_id
+            self._next_id += 1
+            restaurant = dict(restaurant)
+            self.records[restaurant_id] = restaurant
+            self._id_order.append(restaurant_id)
+            self._index(restaurant_id, restaurant)
+            self._restaurant_list = None
+            self.version += 1
+            return restaurant_id
+
+    def update(self, restaurant_id, **changes):
+        """
+        Change some fields of a restaurant and update the affected indexes.
+        
+        The restaurant dictionary is changed in place, so references to it stay valid.
+        
+        Args:
+            restaurant_id (int): The id of the restaurant to change.
+            **changes: The new field values (e.g., rating=4.6, delivery=False).
+        
+        Returns:
+            dict: The updated restaurant.
+        
+        Raises:
+            KeyError: If there is no restaurant with that id.
+            ValueError: If a required field would be removed or given a value of the wrong type.
+        """
+        with self.lock:
+            restaurant = self.records[restaurant_id]
+            self._validate({**restaurant, **changes})
+            self._unindex(restaurant_id, restaurant, changes)
+            restaurant.update(changes)
+            self._index(restaurant_id, restaurant, changes)
+            self.version += 1
+            return restaurant
+
+    def remove(self, restaurant_id):
+        """
+        Remove a restaurant and drop it from every index.
+        
+        Args:
+            restaurant_id (int): The id of the restaurant to remove.
+        
+        Returns:
+            dict: The removed restaurant.
+        
+        Raises:
+            KeyError: If there is no restaurant with that id.
+        """
+        with self.lock:
+            restaurant = self.records[restaurant_id]
+            self._unindex(restaurant_id, restaurant)
+            del self.records[restaurant_id]
+            self._restaurant_list = None
+            self._removed_ids += 1
+            if self._removed_ids > len(self._id_order) // 2:
+                # Compact lazily so that removals stay O(1) amortized
+                self._id_order = list(self.records)
+                self._removed_ids = 0
+            self.version += 1
+            return restaurant
+
+    def bulk_upsert(self, restaurants):
+        """
+        Add or update many restaurants under a single lock.
+        
+        A dictionary with an "id" of an existing restaurant updates it with the other fields;
+        any other dictionary is added as a new restaurant.
+        
+        Args:
+            restaurants (iterable): Restaurant dictionaries.
+        
+        Returns:
+            list: The id of every restaurant, in input order.
+        """
+        restaurant_ids = []
+        with self.lock:
+            for restaurant in restaurants:
+                restaurant_id = restaurant.get("id")
+                fields = {field: value for field, value in restaurant.items() if field != "id"}
+                if restaurant_id in self.records:
+                    self.update(restaurant_id, **fields)
+                else:
+                    restaurant_id = self.add(fields)
+                restaurant_ids.append(restaurant_id)
+        return restaurant_ids
+
+    def _validate(self, restaurant):
+        """
+        Check that a restaurant has every required field, and that the indexed fields have values
+        the indexes can hold, before any index is changed.
+        
+        Raises:
+            ValueError: If a required field is missing or an indexed field has the wrong type.
+        """
+        for field in self.REQUIRED_FIELDS:
+            if restaurant.get(field) is None:
+                raise ValueError(f"Restaurant is missing required field '{field}'")
+        for field in self.INDEXED_FIELDS:
+            if not isinstance(restaurant[field], str):
+                raise ValueError(f"Restaurant field '{field}' must be a string")
+        if not _is_number(restaurant['rating']) or math.isnan(restaurant['rating']):
+            raise ValueError("Restaurant rating must be a number")
+        for field in ("latitude", "longitude"):
+            value = restaurant.get(field)
+            if value is not None and (not _is_number(value) or not math.isfinite(value)):
+                raise ValueError(f"Restaurant field '{field}' must be a number")
+
+    def _index(self, restaurant_id, restaurant, fields=None):
+        """
+        Add a restaurant to the indexes of the given fields (all fields when None).
+        """
+        for field in self.INDEXED_FIELDS:
+            if fields is None or field in fields:
+                key = restaurant[field].lower()
+                if key not in self.indexes[field]:
+                    for trigram in _trigrams(key):
+                        self.trigram_indexes[field].setdefault(trigram, set()).add(key)
+                _bucket_add(self.indexes[field], key, restaurant_id)
+        if fields is None or "rating" in fields:
+            self.rating_index.add((restaurant['rating'], -restaurant_id))
+        if fields is None or "latitude" in fields or "longitude" in fields:
+            if restaurant.get('latitude') is not None and restaurant.get('longitude') is not None:
+                self.spatial_index.add(restaurant_id, restaurant['latitude'], restaurant['longitude'])
+
+    def _unindex(self, restaurant_id, restaurant, fields=None):
+        """
+        Remove a restaurant from the indexes of the given fields (all fields when None).
+        """
+        for field in self.INDEXED_FIELDS:
+            if fields is None or field in fields:
+                key = restaurant[field].lower()
+                if _bucket_remove(self.indexes[field], key, restaurant_id):
+                    for trigram in _trigrams(key):
+                        keys = self.trigram_indexes[field][trigram]
+                        keys.discard(key)
+                        if not keys:
+                            del self.trigram_indexes[field][trigram]
+        if fields is None or "rating" in fields:
+            self.rating_index.remove((restaurant['rating'], -restaurant_id))
+        if fields is None or "latitude" in fields or "longitude" in fields:
+            if restaurant.get('latitude') is not None and restaurant.get('longitude') is not None:
+                self.spatial_index.remove(restaurant_id, restaurant['latitude'], restaurant['longitude'])
+
+    def find_exact(self, field, value):
+        """
+        Look up restaurants whose field matches the value exactly, ignoring case.
+        
+        Args:
+            field (str): An indexed field name (e.g., "cuisine").
+            value (str): The value to match (e.g., "Italian").
+        
+        Returns:
+            list: Matching restaurants, in database order.
+        """
+        with self.lock:
+            restaurant_ids = self.indexes[field].get(value.lower(), [])
+            return [self.records[restaurant_id] for restaurant_id in restaurant_ids]
+
+    def matching_buckets(self, field, needle):
+        """
+        Collect the index buckets whose key contains the needle as a substring.
+        
+        For needles of three or more characters only the keys in the shortest trigram posting set are
+        checked; every key containing the needle contains all of its trigrams, so none is missed.
+        Shorter needles are checked against every key.
+        
+        Args:
+            field (str): An indexed field name (e.g., "cuisine").
+            needle (str): A lower-cased substring to look for.
+        
+        Returns:
+            list: Sorted buckets of restaurant ids, one per matching key. They are the live buckets, so
+                  callers iterating them hold self.lock until they are done.
+        """
+        with self.lock:
+            index = self.indexes[field]
+            trigrams = _trigrams(needle)
+            if trigrams:
+                trigram_index = self.trigram_indexes[field]
+                postings = [trigram_index.get(trigram, ()) for trigram in trigrams]
+                candidate_keys = min(postings, key=len)
+            else:
+                candidate_keys = index
+            return [index[key] for key in candidate_keys if needle in key]
+
+    def count_min_rating(self, min_rating):
+        """
+        Count the restaurants rated at least min_rating.
+        
+        Args:
+            min_rating (float): The minimum acceptable rating.
+        
+        Returns:
+            int: The number of matching restaurants.
+        """
+        with self.lock:
+            return self.rating_index.count_from((min_rating, -math.inf))
+
+    def ids_with_min_rating(self, min_rating):
+        """
+        Get the ids of restaurants rated at least min_rating, in rating order.
+        
+        Args:
+            min_rating (float): The minimum acceptable rating.
+        
+        Returns:
+            list: Restaurant ids sorted by ascending rating.
+        """
+        with self.lock:
+            return [-negated_id for _, negated_id in self.rating_index.irange((min_rating, -math.inf))]
+
+    def find_min_rating(self, min_rating):
+        """
+        Look up restaurants rated at least min_rating using the rating index.
+        
+        Args:
+            min_rating (float): The minimum acceptable rating.
+        
+        Returns:
+            list: Matching restaurants, in database order.
+        """
+        with self.lock:
+            return [self.records[restaurant_id] for restaurant_id in sorted(self.ids_with_min_rating(min_rating))]
+
+    def iter_by_rating_desc(self):
+        """
+        Iterate over the restaurants from the best rating to the worst. The caller holds self.lock
+        while iterating.
+        
+        Yields:
+            dict: Restaurants ordered by descending rating, ties in database order.
+        """
+        for _, negated_id in reversed(self.rating_index):
+            yield self.records[-negated_id]
+
+
+class ColumnarRestaurantDatabase:
+    """
+    A column-oriented, NumPy-backed alternative to RestaurantDatabase for large catalogs.
+    
+    Cuisine, location and price range are dictionary-encoded: each distinct value is stored once in
+    `categories` and rows hold small integer codes. Ratings live in a float64 array, so that they
+    compare against a minimum rating exactly like the dict-based database, and delivery status in a
+    bool array. Filters run as boolean masks over whole columns, and only the matching
+    rows are turned back into dictionaries.
+    
+    Attributes:
+        categories (dict): For each encoded field, the list of its distinct values (index = code).
+        codes (dict): For each encoded field, an int32 array with one code per restaurant.
+        names (list): Restaurant names.
+        phonenumbers (list): Restaurant phone numbers.
+        ratings (numpy.ndarray): float64 ratings.
+        delivery (numpy.ndarray): bool delivery status.
+        latitudes (numpy.ndarray): float64 latitudes, NaN for restaurants without coordinates.
+        longitudes (numpy.ndarray): float64 longitudes, NaN for restaurants without coordinates.
+        version (int): Always 0, the columns are never modified after loading.
+    """
+
+    ENCODED_FIELDS = ("cuisine", "location", "price_range")
+
+    def __init__(self, restaurants=None):
+        """
+        Initialize the ColumnarRestaurantDatabase by encoding restaurant dictionaries into columns.
+        
+        Args:
+            restaurants (iterable, optional): Restaurant dictionaries to load. Defaults to the sample data of
+                                              RestaurantDatabase.
+        
+        Raises:
+            ImportError: If NumPy is not installed.
+        """
+        if np is None:
+            raise ImportError("ColumnarRestaurantDatabase requires NumPy")
+        if restaurants is None:
+            restaurants = RestaurantDatabase().get_restaurants()
+
+        self.categories = {field: [] for field in self.ENCODED_FIELDS}
+        lookups = {field: {} for field in self.ENCODED_FIELDS}
+        raw_codes = {field: [] for field in self.ENCODED_FIELDS}
+        self.names = []
+        self.phonenumbers = []
+        ratings = []
+        delivery = []
+        latitudes = []
+        longitudes = []
+
+        for restaurant in restaurants:
+            for field in self.ENCODED_FIELDS:
+                value = restaurant.get(field, "")
+                code = lookups[field].get(value)
+                if code is None:
+                    code = lookups[field][value] = len(self.categories[field])
+                    self.categories[field].append(value)
+                raw_codes[field].append(code)
+            self.names.append(restaurant["name"])
+            self.phonenumbers.append(restaurant.get("phonenumber", ""))
+            ratings.append(restaurant["rating"])
+            delivery.append(restaurant.get("delivery", False))
+            latitudes.append(restaurant.get("latitude", math.nan))
+            longitudes.append(restaurant.get("longitude", math.nan))
+
+        self.codes = {field: np.array(raw_codes[field], dtype=np.int32) for field in self.ENCODED_FIELDS}
+        self.ratings = np.array(ratings, dtype=np.float64)
+        self.delivery = np.array(delivery, dtype=bool)
+        self.latitudes = np.array(latitudes, dtype=np.float64)
+        self.longitudes = np.array(longitudes, dtype=np.float64)
+        self._restaurants = None  # Materialized on first get_restaurants() call
+        self.version = 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def get_restaurants(self):
+        """
+        Retrieve every restaurant as a dictionary.
+        
+        The list is built on first use and cached, so callers that only filter never pay for it.
+        
+        Returns:
+            list: A list of dictionaries, where each dictionary contains restaurant information.
+        """
+        if self._restaurants is None:
+            self._restaurants = self._materialize(np.arange(len(self)))
+        return self._restaurants
+
+    def filter_restaurants(self, cuisine_type=None, location=None, min_rating=None):
+        """
+        Apply the search_by_filters filters as vectorized masks.
+        
+        Args:
+            cuisine_type (str, optional): Substring of the cuisine to filter by (case-insensitive).
+            location (str, optional): Substring of the location to filter by (case-insensitive).
+            min_rating (float, optional): The minimum acceptable rating to filter by.
+        
+        Returns:
+            list: The matching restaurants as dictionaries, in database order.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if cuisine_type:
+            mask &= self._category_mask("cuisine", lambda value: cuisine_type.lower() in value.lower())
+        if location:
+            mask &= self._category_mask("location", lambda value: location.lower() in value.lower())
+        if min_rating:
+            mask &= self.ratings >= float(min_rating)
+        return self._materialize(np.flatnonzero(mask))
+
+    def find_exact(self, field, value):
+        """
+        Look up restaurants whose encoded field matches the value exactly, ignoring case.
+        
+        Args:
+            field (str): An encoded field name (e.g., "cuisine").
+            value (str): The value to match (e.g., "Italian").
+        
+        Returns:
+            list: Matching restaurants, in database order.
+        """
+        return self._materialize(np.flatnonzero(self._category_mask(field, lambda other: other.lower() == value.lower())))
+
+    def find_min_rating(self, min_rating):
+        """
+        Look up restaurants rated at least min_rating.
+        
+        Args:
+            min_rating (float): The minimum acceptable rating.
+        
+        Returns:
+            list: Matching restaurants, in database order.
+        """
+        return self._materialize(np.flatnonzero(self.ratings >= float(min_rating)))
+
+    def _category_mask(self, field, predicate):
+        """
+        Evaluate a predicate once per distinct value and expand it to a row mask through the codes.
+        
+        Returns:
+            numpy.ndarray: A bool array with one entry per restaurant.
+        """
+        lookup = np.array([predicate(value) for value in self.categories[field]], dtype=bool)
+        if not lookup.size:
+            return np.zeros(len(self), dtype=bool)
+        return lookup[self.codes[field]]
+
+    def _materialize(self, row_ids):
+        """
+        Turn rows back into restaurant dictionaries.
+        
+        Columns are gathered for all rows at once.
+        
+        Args:
+            row_ids (numpy.ndarray): Row positions, in the order they should be returned.
+        
+        Returns:
+            list: One dictionary per row id.
+        """
+        cuisines = self.categories["cuisine"]
+        locations = self.categories["location"]
+        price_ranges = self.categories["price_range"]
+        columns = zip(row_ids.tolist(),
+                      self.codes["cuisine"][row_ids].tolist(),
+                      self.codes["location"][row_ids].tolist(),
+                      self.ratings[row_ids].tolist(),
+                      self.codes["price_range"][row_ids].tolist(),
+                      self.delivery[row_ids].tolist())
+        restaurants = [
+            {"name": self.names[row_id], "cuisine": cuisines[cuisine], "location": locations[location],
+             "phonenumber": self.phonenumbers[row_id], "rating": rating,
+             "price_range": price_ranges[price_range], "delivery": delivery}
+            for row_id, cuisine, location, rating, price_range, delivery in columns
+        ]
+        # Only restaurants that were loaded with coordinates get them back
+        located = ~np.isnan(self.latitudes[row_ids])
+        for position, latitude, longitude in zip(np.flatnonzero(located).tolist(),
+                                                 self.latitudes[row_ids][located].tolist(),
+                                                 self.longitudes[row_ids][located].tolist()):
+            restaurants[position]["latitude"] = latitude
+            restaurants[position]["longitude"] = longitude
+        return restaurants
+
+
+class RestaurantSearch:
+    """
+    A class that interfaces with RestaurantBrowsing to perform restaurant searches based on user input.
+    
+    Results are kept in a bounded LRU cache keyed on the normalized filters. Every entry remembers the
+    database version it was computed for and is only served while that version is current, so a change
+    to the database can never return stale results. Databases without a version are not cached.
+    
+    Attributes:
+        browsing (RestaurantBrowsing): An instance of RestaurantBrowsing used to perform searches.
+        cache_size (int): The maximum number of cached searches; 0 disables caching.
+        hits (int): Searches answered from the cache.
+        misses (int): Searches that had to run against the database.
+        evictions (int): Entries dropped because the cache was full.
+    """
+
+    def __init__(self, browsing, cache_size=256):
+        """
+        Initialize the RestaurantSearch with a reference to a RestaurantBrowsing instance.
+        
+        Args:
+            browsing (RestaurantBrowsing): An instance of the RestaurantBrowsing class.
+            cache_size (int, optional): The maximum number of cached searches. Defaults to 256.
+        """
+        self.browsing = browsing
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._cache = OrderedDict()  # Normalized filters or page request -> (database version, results)
+        self._lock = threading.Lock()
+
+    def search_restaurants(self, cuisine=None, location=None, rating=None):
+        """
+        Search for restaurants using multiple optional filters: cuisine, location, and rating.
+        
+        Args:
+            cuisine (str, optional): The type of cuisine to filter by.
+            location (str, optional): The location to filter by.
+            rating (float, optional): The minimum rating to filter by.
+        
+        Returns:
+            list: A list of restaurants that match the provided search criteria.
+        """
+        # Filters are matched case-insensitively and empty values are ignored, so normalizing
+        # them here does not change the results.
+        key = (cuisine.lower() if cuisine else None, location.lower() if location else None, _parse_rating(rating))
+        results = self._cached(key, lambda: self.browsing.search_by_filters(
+            cuisine_type=key[0], location=key[1], min_rating=key[2]))
+        return list(results)
+
+    def make_cursor(self, cuisine=None, location=None, rating=None):
+        """
+        Create a cursor for paging through search results with page().
+        
+        Args:
+            cuisine (str, optional): The type of cuisine to filter by.
+            location (str, optional): The location to filter by.
+            rating (float, optional): The minimum rating to filter by.
+        
+        Returns:
+            str: An opaque continuation token.
+        
+        Raises:
+            ValueError: If the rating is not a finite number.
+        """
+        return self.browsing.make_cursor(cuisine_type=cuisine.lower() if cuisine else None,
+                                         location=location.lower() if location else None,
+                                         min_rating=_parse_rating(rating))
+
+    def page(self, cursor, limit=50):
+        """
+        Fetch one page of search results. Pages share the LRU cache with search_restaurants.
+        
+        Args:
+            cursor (str): A token from make_cursor() or from a previous page() call.
+            limit (int, optional): The maximum number of restaurants to return. Defaults to 50.
+        
+        Returns:
+            tuple: (list of restaurants, next cursor or None).
+        """
+        results, next_cursor = self._cached(("page", cursor, limit), lambda: self.browsing.page(cursor, limit))
+        return list(results), next_cursor
+
+    def _cached(self, key, compute):
+        """
+        Return the cached value for key if it was computed for the current database version,
+        otherwise compute it and cache it.
+        """
+        version = getattr(self.browsing.database, "version", None)
+        if version is None or self.cache_size <= 0:
+            return compute()
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] == version:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = compute()
+
+        with self._lock:
+            self._cache[key] = (version, value)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def cache_info(self):
+        """
+        Report cache statistics for sizing the cache.
+        
+        Returns:
+            dict: The hits, misses, evictions, current size and maximum size of the cache.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "size": len(self._cache), "maxsize": self.cache_size}
+
+    def clear_cache(self):
+        """
+        Drop every cached search. The counters are kept.
+        """
+        with self._lock:
+            self._cache.clear()
+
+    def explain(self, cuisine=None, location=None, rating=None):
+        """
+        Describe the plan search_restaurants would use for the given filters.
+        
+        Args:
+            cuisine (str, optional): The type of cuisine to filter by.
+            location (str, optional): The location to filter by.
+            rating (float, optional): The minimum rating to filter by.
+        
+        Returns:
+            str: A one-line description of the chosen plan.
+        """
+        return self.browsing.explain_filters(cuisine_type=cuisine, location=location, min_rating=rating)
+    
@@ -1,13 +1,170 @@
+import hashlib
+import math
 import re
+import threading
+from itertools import islice
+
+from Password_Hashing import DEFAULT_HASHER
+from User_Storage import UserRecord, UserExistsError
+
+EMAIL_PATTERN = re.compile(r'^\w{1,}@(\w{1,}+\.)+[a-zA-Z]{1,}$')  # Compiled once instead of on every check
+REGISTER_CHUNK_SIZE = 1000  # Users register_many hashes and commits at a time
+BLOOM_FALSE_POSITIVE_RATE = 0.01  # Share of new emails that still have to be looked up in the store
+BLOOM_MIN_CAPACITY = 1024
+BLOOM_HEADROOM = 2  # The filter is sized for this many times the users loaded, so it is rarely rebuilt
+
+class BloomFilter:
+    """
+    A set of strings that answers "definitely not in it" or "probably in it" from a few bits each.
+
+    Attributes:
+        capacity (int): Number of items the filter was sized for.
+        false_positive_rate (float): The rate of false positives it was sized for, once full.
+        size (int): Number of bits.
+        hash_count (int): Bits set per item.
+        count (int): Items added.
+    """
+    def __init__(self, capacity, false_positive_rate=BLOOM_FALSE_POSITIVE_RATE):
+        """
+        Initializes an empty filter with the optimal number of bits and hashes for capacity items.
+
+        Args:
+            capacity (int): The expected number of items.
+            false_positive_rate (float, optional): The acceptable rate of false positives at capacity.
+        """
+        self.capacity = max(1, capacity)
+        self.false_positive_rate = false_positive_rate
+        self.size = max(8, math.ceil(-self.capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _hashes(self, item):
+        # Double hashing: the i-th bit is at (start + i * step) % size, from the two halves of one digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+    def add(self, item):
+        position, step = self._hashes(item)
+        bits, size = self.bits, self.size
+        for _ in range(self.hash_count):
+            bit = position % size
+            bits[bit >> 3] |= 1 << (bit & 7)
+            position += step
+        self.count += 1
+
+    def __contains__(self, item):
+        position, step = self._hashes(item)
+        bits, size = self.bits, self.size
+        for _ in range(self.hash_count):
+            bit = position % size
+            if not bits[bit >> 3] & (1 << (bit & 7)):
+                return False  # Most new emails stop at the first or second bit
+            position += step
+        return True
+
+    def __len__(self):
+        return self.count
+
+    def expected_false_positive_rate(self):
+        """The false positive rate to expect with the items added so far."""
+        return (1 - math.exp(-self.hash_count * self.count / self.size)) ** self.hash_count
+
+    def info(self):
+        """
+        Returns:
+            dict: The capacity, items added, memory in bytes, hashes per item and expected false positive rate.
+        """
+        return {"capacity": self.capacity, "items": self.count, "memory_bytes": len(self.bits),
+                "hash_count": self.hash_count, "expected_false_positive_rate": self.expected_false_positive_rate()}
+
 
 class UserRegistration:
-    def __init__(self):
+    def __init__(self, hasher=None, false_positive_rate=BLOOM_FALSE_POSITIVE_RATE):
         """
         Initializes the UserRegistration class with an empty dictionary to store user data.
-        Each entry in the dictionary will map an email to a dictionary containing the user's password and confirmation status.
+        Each entry in the dictionary will map an email to a UserRecord containing the user's password hash and confirmation status.
+
+        Most signups use a new email, so the "Email already registered" check first asks an in-memory Bloom filter
+        of the registered emails, and only looks an email up in the users store (which may be on disk) if the filter
+        says it is probably there. The filter is rebuilt whenever `users` is replaced, e.g. when the users are
+        loaded. It only knows about users added through this object, so with a store that other processes write
+        too (like users.db, shared by the HTTP server and the desktop app) it can miss an email registered
+        elsewhere. That is safe: the store's insert-only add_user/add_many refuses the email when the user is
+        committed, and the signup fails as "Email already registered" like any other duplicate.
+
+        Args:
+            hasher (PasswordHasher, optional): Hashes and verifies the passwords. Defaults to the shared DEFAULT_HASHER.
+            false_positive_rate (float, optional): What the Bloom filter is sized for.
+
+        Attributes:
+            store_lookups (int): Duplicate checks the filter passed on to the users store.
+            lookups_avoided (int): Duplicate checks the filter answered by itself.
+            false_positives (int): Store lookups that found no user.
         """
+        self.hasher = hasher if hasher is not None else DEFAULT_HASHER
+        self.lock = threading.Lock()  # Makes checking that an email is free and taking it one step
+        self.false_positive_rate = false_positive_rate
+        self.store_lookups = 0
+        self.lookups_avoided = 0
+        self.false_positives = 0
         self.users = {}
 
+    @property
+    def users(self):
+        return self._users
+
+    @users.setter
+    def users(self, users):
+        self._users = users
+        self.rebuild_filter()
+
+    def rebuild_filter(self):
+        """
+        Rebuilds the Bloom filter from the users store, sized for BLOOM_HEADROOM times the users in it.
+        """
+        email_filter = BloomFilter(max(BLOOM_MIN_CAPACITY, BLOOM_HEADROOM * len(self._users)), self.false_positive_rate)
+        for email in self._users:
+            email_filter.add(email)
+        self.email_filter = email_filter
+
+    def is_registered(self, email):
+        """
+        Checks if an email is registered, looking it up in the users store only if the Bloom filter has it.
+
+        Returns:
+            bool: True if the email is registered. False may be stale for an email that another process
+                  registered in a shared store; the insert when registering has the final word.
+        """
+        if email not in self.email_filter:
+            self.lookups_avoided += 1
+            return False
+        self.store_lookups += 1
+        if email in self.users:
+            return True
+        self.false_positives += 1
+        return False
+
+    def filter_info(self):
+        """
+        Reports how well the Bloom filter in front of the duplicate check works, for sizing it.
+
+        Returns:
+            dict: The filter's capacity, items, memory in bytes, hash count and expected false positive rate,
+                  plus the store lookups made and avoided and the observed false positive rate.
+        """
+        negatives = self.false_positives + self.lookups_avoided  # Checks of emails that were not registered
+        return {**self.email_filter.info(), "store_lookups": self.store_lookups,
+                "lookups_avoided": self.lookups_avoided, "false_positives": self.false_positives,
+                "observed_false_positive_rate": self.false_positives / negatives if negatives else 0.0}
+
+    def _remember(self, emails):
+        """Adds newly registered emails to the Bloom filter; the caller holds self.lock."""
+        for email in emails:
+            self.email_filter.add(email)
+        if len(self.email_filter) > self.email_filter.capacity:
+            self.rebuild_filter()  # Full: the false positive rate would keep climbing
+
     def register(self, email, password, confirm_password):
         """
         Registers a new user.
@@ -19,8 +176,9 @@ class UserRegistration:
         - Validates that the password meets the strength requirements.
         - Checks if the email is already registered.
         
-        If all checks pass, the user is registered, and their email and password are stored in the `users` dictionary, along with a confirmation 
+        If all checks pass, the user is registered, and their email and password hash are stored in the `users` dictionary, along with a confirmation 
         status set to False (indicating the user is not yet confirmed). A success message is returned.
+        The password is hashed in the hasher's process pool; this call waits for it.
 
         Args:
             email (str): The user's email address.
@@ -32,18 +190,142 @@ class UserRegistration:
                   On success, it returns {"success": True, "message": "Registration successful, confirmation email sent"}.
                   On failure, it returns {"success": False, "error": "Specific error message"}.
         """
+        error = self.validate(email, password, confirm_password)
+        if error is not None:
+            return {"success": False, "error": error}
+        if self.is_registered(email):
+            return {"success": False, "error": "Email already registered"}  # If the email is already registered, return an error.
+
+        password_hash = self.hasher.hash(password)  # Slow, so done without holding the lock
+        with self.lock:
+            if self.is_registered(email):
+                return {"success": False, "error": "Email already registered"}  # Registered by someone else meanwhile.
+            # Register the user if all conditions are met and return a success message.
+            user = UserRecord(password_hash)  # A compact, dict-like record; not confirmed yet
+            if hasattr(self.users, "add_user"):
+                try:
+                    self.users.add_user(email, user)  # Insert only: never replaces an existing account
+                except UserExistsError:
+                    return {"success": False, "error": "Email already registered"}  # Registered by another process.
+            else:
+                self.users[email] = user
+            self._remember([email])
+        return {"success": True, "message": "Registration successful, confirmation email sent"}
+
+    def register_many(self, records, chunk_size=REGISTER_CHUNK_SIZE):
+        """
+        Registers many users at once, e.g. when importing the accounts of a corporate customer.
+
+        The records are read as a stream, so they can come straight from a large file. They are handled
+        chunk_size at a time: each chunk is validated like register does, its passwords are hashed in
+        parallel in the hasher's process pool, and its new users are committed to the store together.
+        An email is rejected as already registered if it is in the store or earlier in the same import.
+
+        Args:
+            records (iterable): Dicts with "email" and "password", and optionally "confirm_password"
+                (which defaults to the password). A record without a string email and password is
+                rejected on its own, like an invalid one.
+            chunk_size (int, optional): Records hashed and committed at a time.
+
+        Returns:
+            list: One result per record, in order, like those of register. Identical results are
+                  the same dict object, so that a million of them stay small; do not modify them.
+        """
+        outcomes = {}  # Shared result dicts, by error message (None for success)
+
+        def outcome(error):
+            if error not in outcomes:
+                outcomes[error] = ({"success": True, "message": "Registration successful, confirmation email sent"}
+                                   if error is None else {"success": False, "error": error})
+            return outcomes[error]
+
+        results = []
+        records = iter(records)
+        while chunk := list(islice(records, chunk_size)):
+            accepted = {}  # email -> (row, password) of the chunk's valid new users
+            for record in chunk:
+                try:
+                    email, password = record["email"], record["password"]
+                except (KeyError, TypeError):
+                    email = password = None
+                if not isinstance(email, str) or not isinstance(password, str):
+                    results.append(outcome("Email and password are required"))
+                    continue
+                error = self.validate(email, password, record.get("confirm_password", password))
+                if error is None and (email in accepted or self.is_registered(email)):
+                    error = "Email already registered"  # Earlier chunks are in the store by now
+                if error is None:
+                    accepted[email] = (len(results), password)
+                results.append(outcome(error))
+
+            hashes = self.hasher.hash_many(password for _, password in accepted.values())
+            with self.lock:
+                new_users = []
+                for (email, (row, _)), password_hash in zip(accepted.items(), hashes):
+                    if self.is_registered(email):
+                        results[row] = outcome("Email already registered")  # Registered by someone else meanwhile.
+                    else:
+                        new_users.append((email, UserRecord(password_hash)))
+                if hasattr(self.users, "add_many"):
+                    # One commit for the whole chunk, which never replaces an existing account
+                    for email in self.users.add_many(new_users):
+                        results[accepted[email][0]] = outcome("Email already registered")  # Registered by another process.
+                else:
+                    self.users.update(new_users)
+                self._remember(email for email, _ in new_users)
+        return results
+
+    def validate(self, email, password, confirm_password):
+        """
+        Runs the checks of register that do not need the stored users.
+
+        Returns:
+            str: The error message of the first failed check, or None if the details are valid.
+        """
         if not self.is_valid_email(email):
-            return {"success": False, "error": "Invalid email format"}  # If email format is invalid, return an error.
+            return "Invalid email format"  # If email format is invalid, return an error.
         if password != confirm_password:
-            return {"success": False, "error": "Passwords do not match"}  # If passwords don't match, return an error.
+            return "Passwords do not match"  # If passwords don't match, return an error.
         if not self.is_strong_password(password):
-            return {"success": False, "error": "Password is not strong enough"}  # If password isn't strong, return an error.
-        if email in self.users:
-            return {"success": False, "error": "Email already registered"}  # If the email is already registered, return an error.
+            return "Password is not strong enough"  # If password isn't strong, return an error.
+        return None
 
-        # Register the user if all conditions are met and return a success message.
-        self.users[email] = {"password": password, "confirmed": False}
-        return {"success": True, "message": "Registration successful, confirmation email sent"}
+    def login(self, email, password):
+        """
+        Checks a user's password.
+
+        Passwords stored in plaintext (before hashing was added) or hashed with older cost settings are
+        rehashed with the current settings once the user logs in with them.
+
+        Args:
+            email (str): The user's email address.
+            password (str): The password to check.
+
+        Returns:
+            dict: {"success": True, "message": "Login successful"} if the password matches,
+                  otherwise {"success": False, "error": "Invalid email or password"}.
+        """
+        user = self.users.get(email)
+        if user is None or not self.hasher.verify(password, user["password"]):
+            return {"success": False, "error": "Invalid email or password"}
+        if self.hasher.needs_rehash(user["password"]):
+            self.set_password(email, password)
+        return {"success": True, "message": "Login successful"}
+
+    def set_password(self, email, password):
+        """
+        Stores a new hash of password for a registered user.
+
+        Args:
+            email (str): The user's email address.
+            password (str): The new password.
+        """
+        password_hash = self.hasher.hash(password)
+        with self.lock:
+            if hasattr(self.users, "update_user"):
+                self.users.update_user(email, password=password_hash)  # Saves only the change
+            else:
+                self.users[email] = UserRecord.from_mapping({**self.users[email], "password": password_hash})
 
     def is_valid_email(self, email): #Add regex pattern (import re)
         """
@@ -56,7 +338,7 @@ class UserRegistration:
         Returns:
             bool: True if the email is valid, False otherwise.
         """
-        return re.match(r'^\w{1,}@(\w{1,}+\.)+[a-zA-Z]{1,}$', email)
+        return EMAIL_PATTERN.match(email)
 
     def is_strong_password(self, password):
         """
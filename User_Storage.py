@@ -0,0 +1,781 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Mapping, MutableMapping
+from contextlib import contextmanager
+
+try:
+    import fcntl  # Advisory file locks; not available on Windows
+except ImportError:
+    fcntl = None
+
+FSYNC_POLICIES = ("always", "group", "interval")
+COMPACT_AFTER = 10_000  # Journal records before the background compaction writes a new snapshot
+FSYNC_INTERVAL_S = 1.0  # How often the "interval" policy syncs the journal to disk
+COALESCE_WINDOW_S = 0.05  # How long UsersFileWriter gathers changes before writing them together
+MAX_WRITES_PER_S = 10  # Cap on the writes of one UsersFileWriter, however many changes arrive
+
+
+class UserExistsError(ValueError):
+    """Raised by add_user when the email is already registered."""
+
+
+class UserRecord(Mapping):
+    """
+    One registered user, as a read-only mapping that looks like the {"password": ..., "confirmed": ...}
+    dict it replaces, but takes a third of the memory: with millions of users loaded, the per-user
+    dict was the biggest cost after the password hashes themselves.
+
+    Fields other than password and confirmed are kept in a dict that only exists for users that have
+    any. Records are immutable: change a user by storing a new record, e.g. record.replace(confirmed=True).
+
+    Attributes:
+        password (str): The password hash.
+        confirmed (bool): Whether the user has confirmed the email address.
+        extra (dict): Any other fields, or None.
+    """
+    __slots__ = ("password", "confirmed", "extra")
+
+    def __init__(self, password, confirmed=False, extra=None):
+        object.__setattr__(self, "password", password)
+        object.__setattr__(self, "confirmed", bool(confirmed))
+        object.__setattr__(self, "extra", extra or None)
+
+    @classmethod
+    def from_mapping(cls, user):
+        """Convert a user dict (or any mapping with a "password") to a record; records are returned as is."""
+        if isinstance(user, cls):
+            return user
+        extra = {key: value for key, value in user.items() if key not in ("password", "confirmed")}
+        return cls(user["password"], user.get("confirmed", False), extra)
+
+    @staticmethod
+    def json_object_hook(obj):
+        """For json.load: turns the user objects of a users file into records as they are parsed,
+        so that the whole file never exists as dicts at once."""
+        return UserRecord.from_mapping(obj) if "password" in obj else obj
+
+    def replace(self, **fields):
+        """A copy of the record with some fields changed."""
+        return UserRecord.from_mapping({**self, **fields})
+
+    def __getitem__(self, key):
+        if key == "password":
+            return self.password
+        if key == "confirmed":
+            return self.confirmed
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        yield "password"
+        yield "confirmed"
+        if self.extra is not None:
+            yield from self.extra
+
+    def __len__(self):
+        return 2 + (len(self.extra) if self.extra is not None else 0)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UserRecord is immutable, store record.replace(...) instead")
+
+    def __reduce__(self):
+        return UserRecord, (self.password, self.confirmed, self.extra)
+
+    def __repr__(self):
+        return f"UserRecord({dict(self)!r})"
+
+
+def _to_json(value):
+    """json default: writes records and other mappings as JSON objects."""
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def write_json_atomically(path, data, indent=None):
+    """
+    Replace the JSON file at path with data, so that readers and crashes only ever see the old or
+    the new file complete: write a temporary file next to it, sync it and rename it over path.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=indent, separators=None if indent else (",", ":"), default=_to_json)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if hasattr(os, "O_DIRECTORY"):  # Make the rename itself durable
+        directory_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
+
+
+@contextmanager
+def _write_lock(path):
+    """
+    Hold the advisory lock on path + ".lock", which every writer of a users file takes, so that
+    processes sharing the file never interleave their writes.
+    """
+    with open(path + ".lock", "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)  # Released when the file is closed
+        yield
+
+
+class JournaledUserStore(MutableMapping):
+    """
+    The registered users as a dict-like store that saves every change by appending one record to a
+    journal, instead of rewriting the whole users file.
+
+    The users live in a JSON snapshot (users.json, the same format save_users writes) plus an
+    append-only journal of set/update/delete records made since the snapshot (users.json.journal).
+    Loading reads the snapshot and replays the journal. Once the journal holds compact_after records,
+    a background thread writes a fresh snapshot and starts an empty journal. Snapshots are written
+    under the same lock as UsersFileWriter's writes.
+
+    When records reach the disk is set by the fsync policy:
+        "always": every write is fsynced before it returns.
+        "group": every write is durable before it returns, but concurrent writers share one fsync
+            (group commit).
+        "interval": writes reach the OS immediately and are fsynced every fsync_interval_s seconds,
+            so an OS crash can lose the last interval. A crash of the app itself loses nothing.
+
+    Users are kept as compact UserRecord objects, which are immutable: change a user with
+    update_user() or by assigning a new dict or record.
+
+    Attributes:
+        path (str): The snapshot file.
+        journal_path (str): The journal of changes since the snapshot.
+        journal_records (int): Records in the journal(s) since the last snapshot.
+        lock (threading.RLock): Serializes changes to the users and the journal.
+    """
+
+    def __init__(self, path, fsync="group", fsync_interval_s=FSYNC_INTERVAL_S, compact_after=COMPACT_AFTER):
+        """
+        Load the users from path and its journal.
+
+        Raises:
+            ValueError: If fsync is not one of FSYNC_POLICIES.
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.rotated_path = path + ".journal.old"  # Journal being folded into a new snapshot
+        self.fsync = fsync
+        self.fsync_interval_s = fsync_interval_s
+        self.compact_after = compact_after
+        self.lock = threading.RLock()
+        self.journal_records = 0
+        self._users = self._load()
+        self._journal = None  # Opened on the first write
+        self._appended = 0  # Sequence number of the last record appended, perhaps still in the buffer
+        self._written = 0  # Sequence number of the last record handed to the OS
+        self._synced = 0  # Sequence number of the last record known to be on disk
+        self._sync_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = None
+        self._closed = False
+
+    # Mapping interface
+
+    def __getitem__(self, email):
+        return self._users[email]
+
+    def __contains__(self, email):
+        return email in self._users
+
+    def __iter__(self):
+        return iter(self._users)
+
+    def __len__(self):
+        return len(self._users)
+
+    def __setitem__(self, email, user):
+        user = UserRecord.from_mapping(user)
+        with self.lock:
+            self._users[email] = user
+            sequence = self._append({"op": "set", "email": email, "user": user})
+        self._sync(sequence)
+
+    def __delitem__(self, email):
+        with self.lock:
+            del self._users[email]
+            sequence = self._append({"op": "delete", "email": email})
+        self._sync(sequence)
+
+    def add_user(self, email, user):
+        """
+        Add a new user; unlike store[email] = user, never replaces an existing one.
+
+        Raises:
+            UserExistsError: If the email is already registered.
+        """
+        if self.add_many([(email, user)]):
+            raise UserExistsError(email)
+
+    def add_many(self, users):
+        """
+        Add many new users with a single flush and fsync, skipping those already registered.
+
+        Args:
+            users (iterable): (email, user) pairs.
+
+        Returns:
+            list: The emails that were already registered and so not added.
+        """
+        with self.lock:
+            existing = []
+            new_users = {}
+            for email, user in users:
+                if email in self._users or email in new_users:
+                    existing.append(email)
+                else:
+                    new_users[email] = user
+            self.set_many(new_users.items())  # Reentrant: self.lock is an RLock
+        return existing
+
+    def set_many(self, users):
+        """
+        Add or replace many users, e.g. a chunk of a bulk import, with a single flush and fsync.
+
+        Args:
+            users (iterable): (email, user) pairs.
+        """
+        sequence = None
+        with self.lock:
+            for email, user in users:
+                self._users[email] = user = UserRecord.from_mapping(user)
+                sequence = self._append({"op": "set", "email": email, "user": user}, flush=False)
+            if sequence is not None:
+                self._flush()
+        if sequence is not None:
+            self._sync(sequence)
+
+    def update_user(self, email, **fields):
+        """
+        Change some fields of a registered user, e.g. update_user(email, confirmed=True).
+
+        Raises:
+            KeyError: If the user is not registered.
+        """
+        with self.lock:
+            self._users[email] = self._users[email].replace(**fields)  # A snapshot being written never sees it change
+            sequence = self._append({"op": "update", "email": email, "fields": fields})
+        self._sync(sequence)
+
+    # Persistence
+
+    def sync(self):
+        """Force every record written so far to disk."""
+        self._sync(self._written, force=True)
+
+    def compact(self):
+        """
+        Write all users into a new snapshot and drop the journal records it replaces. Writers are
+        only blocked while the users are copied, not while the snapshot is written.
+        """
+        with self._compact_lock:
+            with self.lock:
+                if self.journal_records == 0:
+                    return
+                users = dict(self._users)
+                self._rotate_journal()
+                self.journal_records = 0
+            self._write_snapshot(users)
+            os.remove(self.rotated_path)
+
+    def close(self):
+        """Stop the background thread and sync the journal. The store stays readable."""
+        with self.lock:
+            self._closed = True
+            self._wake.set()
+        if self._worker is not None:
+            self._worker.join()
+        with self.lock, self._sync_lock:
+            if self._journal is not None:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                self._journal.close()
+                self._journal = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _load(self):
+        users = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                users = json.load(f, object_hook=UserRecord.json_object_hook)
+        if os.path.exists(self.rotated_path):  # Left behind by a compaction that did not finish
+            self.journal_records += self._replay(self.rotated_path, users)
+        if os.path.exists(self.journal_path):
+            self.journal_records += self._replay(self.journal_path, users)
+        return users
+
+    def _replay(self, path, users):
+        """Apply the records of a journal file to users and return how many there were."""
+        count = 0
+        good_end = 0
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # A record torn by a crash mid-write; nothing after it was acknowledged
+                if not line.endswith(b"\n"):
+                    break
+                op, email = record["op"], record["email"]
+                if op == "set":
+                    users[email] = UserRecord.from_mapping(record["user"])
+                elif op == "update":
+                    users[email] = UserRecord.from_mapping({**users.get(email, {}), **record["fields"]})
+                elif op == "delete":
+                    users.pop(email, None)
+                good_end += len(line)
+                count += 1
+        if good_end != os.path.getsize(path):
+            # Cut the torn record off, so that new records are not appended onto it
+            with open(path, "r+b") as f:
+                f.truncate(good_end)
+        return count
+
+    def _append(self, record, flush=True):
+        """Write one record to the journal; the caller holds self.lock. Returns its sequence number.
+        With flush=False the caller calls _flush() once it has written all its records."""
+        if self._closed:
+            raise ValueError("The user store is closed")
+        if self._journal is None:
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+            self._start_worker()
+        self._journal.write(json.dumps(record, separators=(",", ":"), default=_to_json) + "\n")
+        self._appended += 1
+        self.journal_records += 1
+        if flush:
+            self._flush()  # Hand it to the OS right away, so a crash of the app loses nothing
+        if self.journal_records >= self.compact_after:
+            self._wake.set()
+        return self._appended
+
+    def _flush(self):
+        """Hand the appended records to the OS; the caller holds self.lock. Only records flushed
+        count as written, so a concurrent _sync never marks records still in the buffer as synced."""
+        self._journal.flush()
+        self._written = self._appended
+        if self.fsync == "always":
+            os.fsync(self._journal.fileno())
+            self._synced = self._written
+
+    def _sync(self, sequence, force=False):
+        """Make sure record number sequence is on disk, according to the fsync policy."""
+        if self.fsync != "group" and not force:
+            return
+        with self._sync_lock:
+            if self._synced >= sequence or self._journal is None:
+                return  # Another writer's fsync already covered this record
+            target = self._written
+            os.fsync(self._journal.fileno())
+            self._synced = target
+
+    def _rotate_journal(self):
+        """Close the journal and move it aside for compaction; the caller holds self.lock."""
+        with self._sync_lock:
+            if self._journal is not None:
+                os.fsync(self._journal.fileno())
+                self._journal.close()
+                self._journal = None
+                self._synced = self._written
+        if not os.path.exists(self.journal_path):
+            open(self.rotated_path, "a").close()
+        elif os.path.exists(self.rotated_path):
+            # An earlier compaction did not finish: keep its records in front of the new ones
+            with open(self.rotated_path, "ab") as rotated, open(self.journal_path, "rb") as journal:
+                rotated.write(journal.read())
+                rotated.flush()
+                os.fsync(rotated.fileno())
+            os.remove(self.journal_path)
+        else:
+            os.replace(self.journal_path, self.rotated_path)
+
+    def _write_snapshot(self, users):
+        """Atomically replace the snapshot under the write lock, see write_json_atomically."""
+        with _write_lock(self.path):
+            write_json_atomically(self.path, users)
+
+    def _start_worker(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._background, name="user-store", daemon=True)
+            self._worker.start()
+
+    def _background(self):
+        """Interval fsyncs and compaction, off the threads that register users."""
+        timeout = self.fsync_interval_s if self.fsync == "interval" else None
+        while True:
+            self._wake.wait(timeout)
+            self._wake.clear()
+            if self.fsync == "interval":
+                self._sync(self._written, force=True)
+            if self._closed:
+                return
+            if self.journal_records >= self.compact_after:
+                self.compact()
+
+
+class UsersFileWriter:
+    """
+    Saves the users as a complete users.json like save_users always did, but safely under
+    concurrency and without a rewrite per registration.
+
+    save() only hands the users over. A background thread waits coalesce_window_s for more changes
+    and then writes the newest users once for all of them (group commit), at most
+    max_writes_per_s times a second however many registrations arrive. Each write is atomic (see
+    write_json_atomically) and made under an advisory lock on path + ".lock", so app instances
+    sharing the file never interleave their writes; users that another instance added to the file
+    meanwhile are kept. A user that was in the file when the writer was created, or in its last
+    write, and is missing from the users saved now was deleted, and is left out.
+
+    Attributes:
+        path (str): The users file.
+        writes (int): Files written so far.
+    """
+
+    def __init__(self, path, coalesce_window_s=COALESCE_WINDOW_S, max_writes_per_s=MAX_WRITES_PER_S, indent=4):
+        self.path = path
+        self.coalesce_window_s = coalesce_window_s
+        self.min_interval_s = 1 / max_writes_per_s
+        self.indent = indent
+        self.writes = 0
+        self._condition = threading.Condition()
+        self._pending = None  # The newest users handed to save() and not written yet
+        self._known = self._emails_on_disk()  # Emails in the last write; those missing from a save were deleted
+        self._requested = 0  # Sequence number of the last save()
+        self._written = 0  # Sequence number of the last save() whose users are on disk
+        self._failed = 0  # Sequence number of the last save() whose write failed
+        self._error = None
+        self._last_write = 0.0
+        self._closed = False
+        self._worker = None
+
+    def save(self, users, wait=True):
+        """
+        Schedule users to be written.
+
+        Args:
+            users (Mapping): All the users; they are copied before save() returns.
+            wait (bool, optional): Block until a write that includes these users is on disk.
+
+        Raises:
+            OSError: If wait is True and the write failed.
+            ValueError: If the writer is closed, or wait is True and the users file is not valid JSON.
+            TypeError: If wait is True and a user is not JSON serializable.
+        """
+        users = dict(users)  # On the caller's thread, which knows how to keep users from changing meanwhile
+        with self._condition:
+            if self._closed:
+                raise ValueError("The users file writer is closed")
+            self._pending = users
+            self._requested += 1
+            sequence = self._requested
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._background, name="users-file", daemon=True)
+                self._worker.start()
+            self._condition.notify_all()
+            if wait:
+                self._wait(sequence)
+
+    def flush(self):
+        """Block until everything handed to save() so far is on disk."""
+        with self._condition:
+            self._wait(self._requested)
+
+    def close(self):
+        """Write what is still pending and stop the background thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._worker is not None:
+            self._worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _wait(self, sequence):
+        """Wait for sequence to be written; the caller holds self._condition."""
+        while self._written < sequence and self._failed < sequence:
+            self._condition.wait()
+        if self._written < sequence:
+            raise self._error
+
+    def _emails_on_disk(self):
+        """The emails in the users file, so that users deleted before the first save stay deleted."""
+        if not os.path.exists(self.path):
+            return set()
+        with open(self.path, "r") as f:
+            return set(json.load(f))
+
+    def _background(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+            if not self._closed:
+                # Gather the registrations of a burst, but never write more often than the cap allows
+                delay = max(self.coalesce_window_s, self._last_write + self.min_interval_s - time.monotonic())
+                time.sleep(delay)
+            with self._condition:
+                users, self._pending = self._pending, None
+                sequence = self._requested
+            try:
+                self._write(users)
+            except Exception as error:  # Reported to the waiting save() calls; the thread keeps running
+                with self._condition:
+                    self._failed, self._error = sequence, error
+                    self._condition.notify_all()
+                continue
+            with self._condition:
+                self._written = sequence
+                self._condition.notify_all()
+
+    def _write(self, users):
+        with _write_lock(self.path):
+            merged = users
+            if os.path.exists(self.path):
+                with open(self.path, "r") as f:
+                    on_disk = json.load(f)
+                deleted = self._known - users.keys()
+                # Keep the users other instances have added, but not the ones deleted here
+                merged = {email: user for email, user in on_disk.items() if email not in deleted}
+                merged.update(users)
+            write_json_atomically(self.path, merged, indent=self.indent)
+        self._known = users.keys()
+        self._last_write = time.monotonic()
+        self.writes += 1
+
+
+SQLITE_SYNCHRONOUS = ("OFF", "NORMAL", "FULL")
+ITER_BATCH_SIZE = 1000  # Emails fetched per query while iterating over a SQLiteUserStore
+
+
+class SQLiteUserStore(MutableMapping):
+    """
+    The registered users as a dict-like store backed by an SQLite database, for user bases too
+    large to keep in memory.
+
+    Nothing is loaded up front: every lookup reads one row through the email primary key, and
+    every change is written as its own transaction. The database runs in WAL mode, so readers are
+    never blocked by a registration being written.
+
+    Each user is a row (email, password, confirmed, extra), where extra holds any other fields as
+    JSON. Users are read as immutable UserRecord objects, so change a user with update_user() or
+    by assigning a new dict or record, like with JournaledUserStore.
+
+    Attributes:
+        path (str): The database file.
+        lock (threading.RLock): Serializes use of the connection, which is shared by all threads.
+    """
+
+    def __init__(self, path, migrate_from=None, synchronous="FULL"):
+        """
+        Open or create the database at path.
+
+        Args:
+            path (str): The database file.
+            migrate_from (str, optional): A users.json file (with its journal, if any) whose users
+                are copied into a newly created database. The migration runs only once.
+            synchronous (str): SQLite's synchronous setting. "FULL" makes every change durable
+                before it returns; "NORMAL" can lose the last changes on an OS crash, but is faster.
+
+        Raises:
+            ValueError: If synchronous is not one of SQLITE_SYNCHRONOUS.
+        """
+        if synchronous not in SQLITE_SYNCHRONOUS:
+            raise ValueError(f"Unknown synchronous setting: {synchronous}")
+        import sqlite3  # Only needed by this backend
+        self.path = path
+        self.lock = threading.RLock()
+        # Autocommit mode: single statements commit by themselves, batches use explicit transactions
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(f"PRAGMA synchronous={synchronous}")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "email TEXT PRIMARY KEY, password TEXT NOT NULL, confirmed INTEGER NOT NULL, extra TEXT"
+            ") WITHOUT ROWID"
+        )
+        if self._db.execute("PRAGMA user_version").fetchone()[0] == 0:
+            if migrate_from is not None:
+                self._migrate(migrate_from)
+            self._db.execute("PRAGMA user_version=1")  # Never migrate again
+
+    # Mapping interface
+
+    def __getitem__(self, email):
+        with self.lock:
+            row = self._db.execute(
+                "SELECT password, confirmed, extra FROM users WHERE email = ?", (email,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(email)
+        return self._to_user(row)
+
+    def __contains__(self, email):
+        with self.lock:
+            return self._db.execute("SELECT 1 FROM users WHERE email = ?", (email,)).fetchone() is not None
+
+    def __iter__(self):
+        """Iterate over the emails in batches, so the users are never all in memory at once."""
+        last = ""
+        while True:
+            with self.lock:
+                batch = self._db.execute(
+                    "SELECT email FROM users WHERE email > ? ORDER BY email LIMIT ?", (last, ITER_BATCH_SIZE)
+                ).fetchall()
+            for (email,) in batch:
+                yield email
+            if len(batch) < ITER_BATCH_SIZE:
+                return
+            last = batch[-1][0]
+
+    def __len__(self):
+        with self.lock:
+            return self._db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def __setitem__(self, email, user):
+        with self.lock:
+            self._db.execute("INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?)", self._to_row(email, user))
+
+    def __delitem__(self, email):
+        with self.lock:
+            if self._db.execute("DELETE FROM users WHERE email = ?", (email,)).rowcount == 0:
+                raise KeyError(email)
+
+    def add_user(self, email, user):
+        """
+        Add a new user with a plain INSERT, so that the email primary key decides, even against
+        other processes writing the same database, and an existing account is never replaced.
+
+        Raises:
+            UserExistsError: If the email is already registered.
+        """
+        import sqlite3
+        with self.lock:
+            try:
+                self._db.execute("INSERT INTO users VALUES (?, ?, ?, ?)", self._to_row(email, user))
+            except sqlite3.IntegrityError:
+                raise UserExistsError(email) from None
+
+    def add_many(self, users):
+        """
+        Add many new users in a single transaction, skipping those already registered.
+
+        Args:
+            users (iterable): (email, user) pairs.
+
+        Returns:
+            list: The emails that were already registered and so not added.
+        """
+        rows = [self._to_row(email, user) for email, user in users]
+        existing = []
+        with self.lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for row in rows:
+                    if self._db.execute("INSERT OR IGNORE INTO users VALUES (?, ?, ?, ?)", row).rowcount == 0:
+                        existing.append(row[0])
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+        return existing
+
+    def set_many(self, users):
+        """
+        Add or replace many users, e.g. a chunk of a bulk import, in a single transaction.
+
+        Args:
+            users (iterable): (email, user) pairs.
+        """
+        rows = [self._to_row(email, user) for email, user in users]
+        with self.lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany("INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?)", rows)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def update_user(self, email, **fields):
+        """
+        Change some fields of a registered user, e.g. update_user(email, confirmed=True).
+
+        Raises:
+            KeyError: If the user is not registered.
+        """
+        with self.lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                user = self[email].replace(**fields)
+                self._db.execute("INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?)", self._to_row(email, user))
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    # Persistence
+
+    def sync(self):
+        """Every change is committed as it is made; only fold the WAL back into the database."""
+        with self.lock:
+            self._db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def close(self):
+        with self.lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _migrate(self, json_path):
+        """Copy the users of a users.json snapshot and its journal in one transaction."""
+        if not any(os.path.exists(json_path + suffix) for suffix in ("", ".journal", ".journal.old")):
+            return
+        with JournaledUserStore(json_path) as users:
+            rows = (self._to_row(email, users[email]) for email in users)
+            with self.lock:
+                self._db.execute("BEGIN")
+                self._db.executemany("INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?)", rows)
+                self._db.execute("COMMIT")
+
+    @staticmethod
+    def _to_row(email, user):
+        extra = {key: value for key, value in user.items() if key not in ("password", "confirmed")}
+        return email, user["password"], int(bool(user.get("confirmed", False))), json.dumps(extra) if extra else None
+
+    @staticmethod
+    def _to_user(row):
+        password, confirmed, extra = row
+        return UserRecord(password, confirmed, json.loads(extra) if extra is not None else None)
@@ -1,76 +1,113 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
-import json
-import os
-
-from User_Registration import UserRegistration
-from Order_Placement import Cart, OrderPlacement, UserProfile, RestaurantMenu, PaymentMethod
-from Payment_Processing import PaymentProcessing
-from Restaurant_Browsing import RestaurantDatabase, RestaurantBrowsing
-
-# Utility functions for user data storage
-USERS_FILE = "users.json"
-
-def load_users():
-    """Loading users from users.json"""
-    
-    if not os.path.exists(USERS_FILE): #jos ei löyty niin palautetaan tyhjää
-        return {}
-    with open(USERS_FILE, "r") as f: #avataan f:nä 
-        return json.load(f)
-
-def save_users(users):
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f, indent=4)
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from Order_Placement import PaymentMethod
+# User storage and loading live in the service layer; they are re-exported here for existing callers
+from Food_Delivery_Service import FoodDeliveryService, USERS_FILE, NEARBY_RADIUS_KM, load_users, save_users, load_registration, load_catalog
+
+# Results are fetched from the search cursor one page at a time as the user scrolls
+RESULTS_PAGE_SIZE = 100
+RESULTS_VISIBLE_ROWS = 10  # Height of the results table in rows
+RESULTS_BUFFER_ROWS = 20  # Extra rows kept around the viewport so small scrolls need no refill
+SEARCH_DEBOUNCE_MS = 300  # Pause in typing before a search-as-you-type query runs
+SEARCH_POLL_MS = 20  # How often the main thread checks for finished background searches
+CHECKOUT_TIMEOUT_S = 30.0  # How long checkout waits for the payment before giving up
+CHECKOUT_POLL_MS = 100  # How often checkout progress is updated
+CREDENTIALS_POLL_MS = 20  # How often the login and register screens check for a hashed password
 
 class Application(tk.Tk):
+    """The desktop UI: a thin client of FoodDeliveryService, which holds all the business logic."""
+
     def __init__(self):
         super().__init__()
         self.title("Mobile Food Delivery App")
         self.geometry("600x400")
 
-        # Load user registration data from file
-        self.user_data = load_users()
-
-        # Initialize core classes
-        self.registration = UserRegistration()
-        self.registration.users = self.user_data  # Load existing users into registration system
-
-        self.database = RestaurantDatabase()
-        self.browsing = RestaurantBrowsing(self.database)
+        # Load the users and the restaurant catalog in the background so that the first screen
+        # shows right away; the service waits for them only if they are needed sooner
+        startup = ThreadPoolExecutor(max_workers=2, thread_name_prefix="startup")
+        self.service = FoodDeliveryService(registration=startup.submit(load_registration),
+                                           catalog=startup.submit(load_catalog))
+        startup.shutdown(wait=False)
 
         # Initially no user logged in
         self.logged_in_email = None
+        self.session_token = None
 
-        # Create initial frame
+        # Create initial frame. Screens are built once and swapped in and out, see show_frame
         self.current_frame = None
+        self.frames = {}
         self.show_startup_frame()
 
+    @property
+    def registration(self):
+        return self.service.registration
+
+    @property
+    def user_data(self):
+        return self.registration.users
+
+    @property
+    def database(self):
+        return self.service.database
+
+    @property
+    def browsing(self):
+        return self.service.browsing
+
+    @property
+    def search(self):
+        return self.service.search
+
+    def when_done(self, future, callback, poll_ms=CREDENTIALS_POLL_MS):
+        """
+        Call callback(result) on the main thread once future is done, polling it with after() so
+        that the UI keeps responding meanwhile.
+        """
+        if future.done():
+            callback(future.result())
+        else:
+            self.after(poll_ms, self.when_done, future, callback, poll_ms)
+
+    def show_frame(self, frame_class, *args):
+        """
+        Show the screen of frame_class. It is built on first use; afterwards the same frame is
+        reset with args and packed again instead of rebuilding its widgets.
+        
+        Args:
+            frame_class (type): The screen to show, e.g. LoginFrame.
+            *args: Passed to the constructor on first use and to reset() after that.
+        """
+        frame = self.frames.get(frame_class)
+        if frame is None:
+            frame = self.frames[frame_class] = frame_class(self, *args)
+        else:
+            frame.reset(*args)
+        if self.current_frame is not None and self.current_frame is not frame:
+            self.current_frame.pack_forget()
+        self.current_frame = frame
+        frame.pack(fill="both", expand=True)
+
     def show_startup_frame(self):
-        if self.current_frame:
-            self.current_frame.destroy()
-        self.current_frame = StartupFrame(self)
-        self.current_frame.pack(fill="both", expand=True)
+        self.show_frame(StartupFrame)
 
     def show_register_frame(self):
-        if self.current_frame:
-            self.current_frame.destroy()
-        self.current_frame = RegisterFrame(self)
-        self.current_frame.pack(fill="both", expand=True)
+        self.show_frame(RegisterFrame)
 
     def show_login_frame(self):
-        if self.current_frame:
-            self.current_frame.destroy()
-        self.current_frame = LoginFrame(self)
-        self.current_frame.pack(fill="both", expand=True)
+        self.show_frame(LoginFrame)
 
-    def login_user(self, email):
+    def login_user(self, email, token=None):
+        """Show the main screen for email, in the session token from FoodDeliveryService.login.
+        Without a token a new session is opened for the user."""
         self.logged_in_email = email
+        self.session_token = token if token is not None else self.service.open_session(email)
         # After login, show main app frame
-        if self.current_frame:
-            self.current_frame.destroy()
-        self.current_frame = MainAppFrame(self, email)
-        self.current_frame.pack(fill="both", expand=True)
+        self.show_frame(MainAppFrame, email)
 
 
 class StartupFrame(tk.Frame):
@@ -81,6 +118,9 @@ class StartupFrame(tk.Frame):
         tk.Button(self, text="Register", command=self.go_to_register, width=20).pack(pady=10)
         tk.Button(self, text="Login", command=self.go_to_login, width=20).pack(pady=10)
 
+    def reset(self):
+        pass
+
     def go_to_register(self):
         self.master.show_register_frame()
 
@@ -100,8 +140,15 @@ class RegisterFrame(tk.Frame):
         self.pass_entry = self.create_entry("Password:", show="*")
         self.conf_pass_entry = self.create_entry("Confirm Password:", show="*")
 
-        tk.Button(self, text="Register", command=self.register_user).pack(pady=10)
+        self.register_button = tk.Button(self, text="Register", command=self.register_user)
+        self.register_button.pack(pady=10)
         tk.Button(self, text="Back", command=self.go_back).pack()
+        self.pending = None  # Future of a registration whose password is being hashed
+
+    def reset(self):
+        """Clear the form when the screen is shown again."""
+        for entry in (self.email_entry, self.pass_entry, self.conf_pass_entry):
+            entry.delete(0, "end")
 
     def create_entry(self, label_text, show=None):
         frame = tk.Frame(self)
@@ -116,10 +163,15 @@ class RegisterFrame(tk.Frame):
         password = self.pass_entry.get()
         confirm_password = self.conf_pass_entry.get()
 
-        result = self.master.registration.register(email, password, confirm_password)
+        # Hashing the password takes a while, so it runs in the background; saved by the user store
+        self.register_button.config(state="disabled")
+        self.pending = self.master.service.submit_register(email, password, confirm_password)
+        self.master.when_done(self.pending, self.on_registered)
+
+    def on_registered(self, result):
+        self.pending = None
+        self.register_button.config(state="normal")
         if result["success"]:
-            # Save the updated users to file
-            save_users(self.master.registration.users)
             messagebox.showinfo("Success", "Registration successful! Please log in.")
             self.master.show_login_frame()
         else:
@@ -138,8 +190,15 @@ class LoginFrame(tk.Frame):
         self.email_entry = self.create_entry("Email:")
         self.pass_entry = self.create_entry("Password:", show="*")
 
-        tk.Button(self, text="Login", command=self.login).pack(pady=10)
+        self.login_button = tk.Button(self, text="Login", command=self.login)
+        self.login_button.pack(pady=10)
         tk.Button(self, text="Back", command=self.go_back).pack()
+        self.pending = None  # Future of a login whose password is being checked
+
+    def reset(self):
+        """Clear the form when the screen is shown again."""
+        for entry in (self.email_entry, self.pass_entry):
+            entry.delete(0, "end")
 
     def create_entry(self, label_text, show=None):
         frame = tk.Frame(self)
@@ -152,33 +211,496 @@ class LoginFrame(tk.Frame):
     def login(self):
         email = self.email_entry.get()
         password = self.pass_entry.get()
-        # Validate login
-        # For simplicity, just check if user exists and password matches
-        users = self.master.registration.users
-        if email in users and users[email]["password"] == password:
-            self.master.login_user(email)
+        # Checking the password hash takes a while, so it runs in the background
+        self.login_button.config(state="disabled")
+        self.pending = self.master.service.submit_login(email, password)
+        self.master.when_done(self.pending, lambda result: self.on_login(email, result))
+
+    def on_login(self, email, result):
+        self.pending = None
+        self.login_button.config(state="normal")
+        if result["success"]:
+            self.master.login_user(email, result["token"])
         else:
-            messagebox.showerror("Error", "Invalid email or password")
+            messagebox.showerror("Error", result["error"])
 
     def go_back(self):
         self.master.show_startup_frame()
 
 
+class SearchWorker:
+    """Run searches on a background thread and hand the newest result back to the Tk main thread.
+
+    Every submitted search gets a generation number. Submitting a new search cancels the previous
+    one if it has not started yet and makes any older result stale. Finished searches are passed
+    through a queue that the main thread drains with after(), and only a result of the latest
+    generation is delivered, so a slow old search can never overwrite newer results. A search can
+    also be debounced, so that typing only searches once the user pauses.
+
+    Attributes:
+        after (callable): Schedules a callback on the main thread, e.g. widget.after.
+        after_cancel (callable): Cancels a scheduled callback, e.g. widget.after_cancel.
+        generation (int): Number of the latest submitted search.
+    """
+
+    def __init__(self, after, after_cancel, poll_ms=SEARCH_POLL_MS):
+        self.after = after
+        self.after_cancel = after_cancel
+        self.poll_ms = poll_ms
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search")
+        self.results = queue.Queue()
+        self.generation = 0
+        self.future = None
+        self._debounce_id = None
+        self._poll_id = None
+
+    def submit(self, search, on_done, on_error=None, delay_ms=0):
+        """
+        Run search() in the background and call on_done(result) on the main thread, unless a newer
+        search is submitted meanwhile. If search() raises, on_error(exception) is called instead.
+        
+        Args:
+            search (callable): The search to run; it must not touch Tk widgets.
+            on_done (callable): Receives the result on the main thread.
+            on_error (callable, optional): Receives the exception on the main thread.
+            delay_ms (int, optional): Debounce delay; the search only starts if nothing newer
+                is submitted within it. Defaults to 0.
+        
+        Returns:
+            int: The generation number of the search.
+        """
+        self.cancel()
+        generation = self.generation
+        if delay_ms:
+            self._debounce_id = self.after(delay_ms, lambda: self._start(generation, search, on_done, on_error))
+        else:
+            self._start(generation, search, on_done, on_error)
+        return generation
+
+    def cancel(self):
+        """Drop the pending search, if any, and make every earlier result stale."""
+        self.generation += 1
+        if self._debounce_id is not None:
+            self.after_cancel(self._debounce_id)
+            self._debounce_id = None
+        if self.future is not None:
+            self.future.cancel()  # Only succeeds if the search has not started yet
+
+    def poll(self):
+        """Deliver finished searches on the main thread, dropping stale results."""
+        self._poll_id = None
+        while True:
+            try:
+                generation, callback, value = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if generation == self.generation and callback is not None:
+                callback(value)
+        # A finished search has queued its result before done() turns true, so check done() first
+        running = self.future is not None and not self.future.done()
+        if running or not self.results.empty():
+            self._schedule_poll()
+
+    def shutdown(self):
+        """Cancel everything and stop the worker thread without waiting for a running search."""
+        self.cancel()
+        if self._poll_id is not None:
+            self.after_cancel(self._poll_id)
+            self._poll_id = None
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _start(self, generation, search, on_done, on_error):
+        self._debounce_id = None
+        if generation != self.generation:
+            return
+        self.future = self.executor.submit(self._run, generation, search, on_done, on_error)
+        self._schedule_poll()
+
+    def _run(self, generation, search, on_done, on_error):
+        """Runs on the worker thread; never calls back into Tk."""
+        if generation != self.generation:
+            return  # Superseded while waiting for the thread
+        try:
+            self.results.put((generation, on_done, search()))
+        except Exception as error:
+            self.results.put((generation, on_error, error))
+
+    def _schedule_poll(self):
+        if self._poll_id is None:
+            self._poll_id = self.after(self.poll_ms, self.poll)
+
+
+class CheckoutWorker:
+    """Confirm an order on a background thread so that the payment round-trip never blocks Tk.
+
+    The main thread polls the confirmation with after(), reporting progress on every poll.
+    Only one confirmation per order can be in flight: start() refuses while the previous one is
+    still running, even after it timed out, and OrderPlacement.confirm_order refuses concurrent
+    calls itself.
+
+    Cancelling, or reaching the timeout, sets the cancel event so that a payment that has not
+    started yet never starts. A payment that is already running cannot be interrupted. If it
+    still goes through after the timeout was reported, the confirmation is delivered as well,
+    so the user always learns about a successful charge.
+
+    Attributes:
+        after (callable): Schedules a callback on the main thread, e.g. widget.after.
+        after_cancel (callable): Cancels a scheduled callback, e.g. widget.after_cancel.
+        timeout_s (float): Seconds to wait for the confirmation before reporting a timeout.
+        active (bool): True from start() until the outcome has been delivered.
+    """
+
+    def __init__(self, after, after_cancel, timeout_s=CHECKOUT_TIMEOUT_S, poll_ms=CHECKOUT_POLL_MS):
+        self.after = after
+        self.after_cancel = after_cancel
+        self.timeout_s = timeout_s
+        self.poll_ms = poll_ms
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkout")
+        self.future = None
+        self.cancel_event = None
+        self.active = False
+        self._started_at = None
+        self._on_done = None
+        self._on_progress = None
+        self._poll_id = None
+
+    def in_flight(self):
+        """True while a confirmation is still running on the worker thread."""
+        return self.future is not None and not self.future.done()
+
+    def start(self, order_placement, payment_method, on_done, on_progress=None):
+        """
+        Start confirming the order in the background.
+        
+        Args:
+            order_placement (OrderPlacement): The order to confirm.
+            payment_method (PaymentMethod): Passed to OrderPlacement.confirm_order.
+            on_done (callable): Receives the confirmation result dict on the main thread.
+            on_progress (callable, optional): Receives the elapsed seconds on every poll.
+        
+        Returns:
+            bool: False if a confirmation is already in flight and nothing was started.
+        """
+        if self.in_flight():
+            return False
+        self.cancel_event = threading.Event()
+        self._on_done = on_done
+        self._on_progress = on_progress
+        self._started_at = time.monotonic()
+        self.active = True
+        self.future = self.executor.submit(order_placement.confirm_order, payment_method, cancel_event=self.cancel_event)
+        self._schedule_poll()
+        return True
+
+    def cancel(self):
+        """Ask the confirmation to stop; it is only stopped if the payment has not started yet."""
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+
+    def poll(self):
+        self._poll_id = None
+        if self.future.done():
+            try:
+                result = self.future.result()
+            except Exception as error:
+                result = {"success": False, "message": f"Checkout failed: {error}"}
+            # After a timeout was reported, only a payment that went through is still worth telling
+            if self.active or result["success"]:
+                self._deliver(result)
+            return
+        elapsed = time.monotonic() - self._started_at
+        if self.active and elapsed >= self.timeout_s:
+            self.cancel()
+            self._deliver({"success": False, "message": "Payment timed out", "timed_out": True})
+        elif self.active and self._on_progress is not None:
+            self._on_progress(elapsed)
+        self._schedule_poll()
+
+    def shutdown(self):
+        """Stop polling; a running confirmation finishes on its own but is no longer reported."""
+        self.cancel()
+        if self._poll_id is not None:
+            self.after_cancel(self._poll_id)
+            self._poll_id = None
+        self.executor.shutdown(wait=False)
+
+    def _deliver(self, result):
+        self.active = False
+        self._on_done(result)
+
+    def _schedule_poll(self):
+        if self._poll_id is None:
+            self._poll_id = self.after(self.poll_ms, self.poll)
+
+
+class ResultsModel:
+    """Result rows behind the results table, sortable by any column without touching the widget.
+
+    Sort keys are computed once per row and column and cached, so re-sorting never re-parses
+    values. Sorting produces a permutation of row indexes; rows are looked up through it, and
+    reversing the current sort only flips a flag instead of reordering anything.
+    """
+
+    SORT_KEYS = {"rating": float}  # Columns not listed sort case-insensitively as text
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.order = None  # Row indexes in sorted order, None while unsorted
+        self.reversed = False
+        self.sort_columns = []  # [(column, descending), ...] as currently shown, most significant first
+        self._keys = {}  # column -> cached sort key of every row
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.rows[self._row_index(i)] for i in range(len(self.rows))[index]]
+        return self.rows[self._row_index(range(len(self.rows))[index])]
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def extend(self, rows):
+        """Append rows, e.g. a newly fetched page, keeping the current sort if there is one."""
+        start = len(self.rows)
+        self.rows.extend(rows)
+        for column, keys in self._keys.items():
+            keys.extend(self._sort_key(column, row) for row in self.rows[start:])
+        if self.sort_columns:
+            self.sort(self.sort_columns)
+
+    def sort_keys(self, column):
+        """Return the cached sort key of every row for column."""
+        keys = self._keys.get(column)
+        if keys is None:
+            keys = self._keys[column] = [self._sort_key(column, row) for row in self.rows]
+        return keys
+
+    def sort(self, columns):
+        """Sort by [(column, descending), ...], most significant column first.
+
+        Asking for the current sort with every direction flipped just reverses it in O(1).
+        """
+        columns = list(columns)
+        if self.sort_columns and columns == [(column, not descending) for column, descending in self.sort_columns]:
+            self.reverse()
+            return
+        order = list(range(len(self.rows)))
+        # Stable sorts from the least to the most significant column give the combined order
+        for column, descending in reversed(columns):
+            order.sort(key=self.sort_keys(column).__getitem__, reverse=descending)
+        self.order = order
+        self.reversed = False
+        self.sort_columns = columns
+
+    def reverse(self):
+        """Reverse the current order without sorting again."""
+        self.reversed = not self.reversed
+        self.sort_columns = [(column, not descending) for column, descending in self.sort_columns]
+
+    def toggle_sort(self, column):
+        """Header click: reverse if column is already the primary sort, otherwise make it the primary
+        sort and keep the previous sort columns as tie-breakers."""
+        if self.sort_columns and self.sort_columns[0][0] == column:
+            self.reverse()
+        else:
+            self.sort([(column, False)] + [spec for spec in self.sort_columns if spec[0] != column])
+
+    def _row_index(self, position):
+        if self.reversed:
+            position = len(self.rows) - 1 - position
+        return position if self.order is None else self.order[position]
+
+    def _sort_key(self, column, row):
+        key = self.SORT_KEYS.get(column)
+        if key is not None:
+            return key(row[column])
+        return str(row.get(column, "")).lower()
+
+
+class VirtualResultsView:
+    """Show a large result set in a Treeview without creating a widget item per result.
+
+    The tree only holds a fixed pool of items for the visible rows plus a small buffer. Scrolling
+    moves a window over the result rows and writes the rows under it into the pooled items, so the
+    number of Tk items stays constant however long the result set is. The scrollbar is driven by
+    the window position instead of by the tree itself.
+
+    Rows come either from a list (set_rows) or from a search cursor (set_cursor/set_page), in which
+    case pages are fetched through fetch_page(cursor, limit) only when the window gets close to them.
+    They are held in a ResultsModel, which does the sorting.
+
+    Sorting needs every row, so it sorts the rows fetched so far at once and hands the rest of the
+    cursor to load_in_background(load, on_done, on_error), e.g. a SearchWorker; the remaining rows
+    are merged into the sort when they arrive. Without it the rest is fetched before sorting.
+    """
+
+    def __init__(self, tree, scrollbar, columns, fetch_page=None, visible_rows=RESULTS_VISIBLE_ROWS,
+                 buffer_rows=RESULTS_BUFFER_ROWS, page_size=RESULTS_PAGE_SIZE, load_in_background=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.columns = columns
+        self.fetch_page = fetch_page
+        self.load_in_background = load_in_background
+        self.loading = False  # The rest of the cursor is being fetched in the background
+        self.visible_rows = visible_rows
+        self.buffer_rows = buffer_rows
+        self.page_size = page_size
+        self.rows = ResultsModel()
+        self.cursor = None  # Continuation token for rows not fetched yet
+        self.offset = 0  # Index of the first visible row
+        self.first = 0  # Index of the row shown by the first pooled item
+        self.items = []  # Pooled tree items, reused on every refill
+        tree.configure(height=visible_rows)
+        scrollbar.configure(command=self.yview)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            tree.bind(sequence, self.on_mousewheel)
+
+    def set_rows(self, rows):
+        """Show a fully known list of result rows."""
+        self.rows = ResultsModel(rows)
+        self.cursor = None
+        self.loading = False
+        self.refresh(0)
+
+    def set_cursor(self, cursor):
+        """Show the result set behind a search cursor, fetching pages lazily."""
+        self.set_page([], cursor)
+
+    def set_page(self, rows, cursor):
+        """Show an already fetched first page of results; cursor continues after it."""
+        self.rows = ResultsModel(rows)
+        self.cursor = cursor
+        self.loading = False
+        self.refresh(0)
+
+    def sort(self, columns):
+        """Sort every result row by [(column, descending), ...] and redraw from the top."""
+        self._load_rest()
+        self.rows.sort(columns)
+        self.refresh(0)
+
+    def toggle_sort(self, column):
+        """Sort by column from a header click, see ResultsModel.toggle_sort."""
+        self._load_rest()
+        self.rows.toggle_sort(column)
+        self.refresh(0)
+
+    def refresh(self, offset):
+        """Refill the pooled items around offset, e.g. after the rows changed."""
+        self._fetch_until(offset + self.visible_rows + self.buffer_rows)
+        self.offset = self._clamp(offset)
+        self._fill(max(0, self.offset - self.buffer_rows // 2))
+        self._position()
+
+    def scroll_to(self, offset):
+        """Move the viewport so that row offset is at the top, refilling the pool only when needed."""
+        self._fetch_until(offset + self.visible_rows + self.buffer_rows)
+        self.offset = self._clamp(offset)
+        if self.offset < self.first or self.offset + self.visible_rows > self.first + len(self.items):
+            self._fill(max(0, self.offset - self.buffer_rows // 2))
+        self._position()
+
+    def visible(self):
+        """Return the result rows currently in the viewport."""
+        return self.rows[self.offset:self.offset + self.visible_rows]
+
+    def yview(self, *args):
+        """Scrollbar command: ("moveto", fraction) or ("scroll", count, "units"/"pages")."""
+        if args[0] == "moveto":
+            self.scroll_to(round(float(args[1]) * len(self.rows)))
+        elif args[0] == "scroll":
+            count = int(args[1])
+            if args[2] == "pages":
+                count *= self.visible_rows
+            self.scroll_to(self.offset + count)
+
+    def on_mousewheel(self, event):
+        step = -1 if event.num == 4 or getattr(event, "delta", 0) > 0 else 1
+        self.scroll_to(self.offset + 3 * step)
+        return "break"
+
+    def _clamp(self, offset):
+        return max(0, min(offset, len(self.rows) - self.visible_rows))
+
+    def _fetch_until(self, count):
+        """Fetch cursor pages until at least count rows are known (all of them if count is None)."""
+        while self.cursor is not None and (count is None or len(self.rows) < count):
+            page, self.cursor = self.fetch_page(self.cursor, self.page_size)
+            self.rows.extend(page)
+
+    def _load_rest(self):
+        """Fetch the rows not fetched yet, in the background if possible, so that a sort covers them."""
+        if self.cursor is None:
+            return
+        if self.load_in_background is None:
+            self._fetch_until(None)
+            return
+        rows, cursor = self.rows, self.cursor
+        # Scrolling must not fetch pages the background load is already fetching
+        self.cursor = None
+        self.loading = True
+
+        def done(rest):
+            if rows is self.rows:  # Dropped if another result set was shown meanwhile
+                self.loading = False
+                rows.extend(rest)  # Keeps the current sort
+                self.refresh(self.offset)
+
+        def failed(error):
+            if rows is self.rows:
+                self.loading = False
+                self.cursor = cursor
+
+        self.load_in_background(lambda: self._fetch_rest(cursor), done, failed)
+
+    def _fetch_rest(self, cursor):
+        """Return every row after cursor; runs on a worker thread, so it only calls fetch_page."""
+        rest = []
+        while cursor is not None:
+            page, cursor = self.fetch_page(cursor, self.page_size)
+            rest.extend(page)
+        return rest
+
+    def _fill(self, first):
+        self.first = first
+        rows = self.rows[first:first + self.visible_rows + self.buffer_rows]
+        for index, row in enumerate(rows):
+            values = tuple(row[column] for column in self.columns)
+            if index < len(self.items):
+                self.tree.item(self.items[index], values=values)
+            else:
+                self.items.append(self.tree.insert("", "end", values=values))
+        if len(rows) < len(self.items):
+            self.tree.delete(*self.items[len(rows):])
+            del self.items[len(rows):]
+
+    def _position(self):
+        if self.items:
+            self.tree.yview_moveto((self.offset - self.first) / len(self.items))
+        total = len(self.rows)
+        if self.cursor is not None or self.loading:
+            total += self.page_size  # More rows follow, so the thumb must not reach the end yet
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible_rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+
 class MainAppFrame(tk.Frame):
     def __init__(self, master, user_email):
         self.sort_ascending = True
         super().__init__(master)
-        tk.Label(self, text=f"Welcome, {user_email}", font=("Arial", 14)).pack(pady=10)
+        self.welcome_label = tk.Label(self, text=f"Welcome, {user_email}", font=("Arial", 14))
+        self.welcome_label.pack(pady=10)
 
         self.user_email = user_email
-        self.database = master.database
-        self.browsing = master.browsing
+        self.service = master.service
 
-        # Create user's profile and cart
-        self.user_profile = UserProfile(delivery_address="123 Main St")
-        self.cart = Cart()
-        self.restaurant_menu = RestaurantMenu(available_items=["Burger", "Pizza", "Salad"])
-        self.order_placement = OrderPlacement(self.cart, self.user_profile, self.restaurant_menu)
+        # User's profile and cart live in the service session
+        self.restaurant_menu = self.service.restaurant_menu
+        self.create_session()
 
         # Search Frame
         search_frame = tk.Frame(self)
@@ -189,13 +711,27 @@ class MainAppFrame(tk.Frame):
         tk.Button(search_frame, text="Search", command=self.search_restaurants).pack(side="left")
 
         tk.Label(search_frame, text="Rating at least:").pack(side="left", padx=5)
-        self.num_rating_value = tk.Spinbox(search_frame, from_=0, to=5)
+        self.num_rating_value = tk.Spinbox(search_frame, from_=0, to=5, command=self.search_as_you_type)
         self.num_rating_value.pack(side="left", padx=5)
 
+        # Searches run in the background; typing searches once the user pauses
+        self.search_worker = SearchWorker(self.after, self.after_cancel)
+        self.cuisine_var.bind("<KeyRelease>", self.search_as_you_type)
+        self.num_rating_value.bind("<KeyRelease>", self.search_as_you_type)
+
         # Results Treeview
-        self.results_tree = ttk.Treeview(self, columns=("cuisine", "location","phonenumber", "rating"), show="headings")
-        self.results_tree.heading("cuisine", text="Cuisine")
-        self.results_tree.heading("location", text="Location")
+        results_frame = tk.Frame(self)
+        results_frame.pack(pady=10, fill="x")
+        self.results_tree = ttk.Treeview(results_frame, columns=("cuisine", "location","phonenumber", "rating"), show="headings")
+        self.results_scrollbar = ttk.Scrollbar(results_frame, orient="vertical")
+        # Rows a sort needs beyond the fetched pages are loaded on their own worker, so a sort never
+        # cancels a pending search
+        self.results_worker = SearchWorker(self.after, self.after_cancel)
+        self.results_view = VirtualResultsView(self.results_tree, self.results_scrollbar,
+                                               ("cuisine", "location", "phonenumber", "rating"), fetch_page=self.fetch_page,
+                                               load_in_background=self.load_results)
+        self.results_tree.heading("cuisine", text="Cuisine", command=lambda: self.results_view.toggle_sort("cuisine"))
+        self.results_tree.heading("location", text="Location", command=lambda: self.results_view.toggle_sort("location"))
         self.results_tree.heading("phonenumber", text="Phone number")
         self.results_tree.heading("rating", text="Rating", command=self.sort_by_rating)  #Added sort
 
@@ -204,46 +740,92 @@ class MainAppFrame(tk.Frame):
         self.results_tree.column("location", width=150, anchor="w")
         self.results_tree.column("phonenumber", width=150, anchor="w")
         self.results_tree.column("rating", width=100, anchor="w")
-        self.results_tree.pack(pady=10, fill="x")
+        self.results_scrollbar.pack(side="right", fill="y")
+        self.results_tree.pack(side="left", fill="x", expand=True)
 
         # Buttons for actions
         action_frame = tk.Frame(self)
         action_frame.pack(pady=5)
         tk.Button(action_frame, text="View All Restaurants", command=self.view_all_restaurants).pack(side="left", padx=5)
+        tk.Button(action_frame, text="Deliver Near Me", command=self.view_nearby_restaurants).pack(side="left", padx=5)
         tk.Button(action_frame, text="Add Item to Cart", command=self.add_item_to_cart).pack(side="left", padx=5)
         tk.Button(action_frame, text="View Cart", command=self.view_cart).pack(side="left", padx=5)
         tk.Button(action_frame, text="Checkout", command=self.checkout).pack(side="left", padx=5)
 
+    def create_session(self):
+        """Pick up the per-login state from the service: the user's profile, cart and order."""
+        session = self.service.session(self.master.session_token)
+        self.user_profile = session.user_profile
+        self.cart = session.cart
+        self.order_placement = session.order_placement
+
+    def reset(self, user_email):
+        """Start a fresh session for user_email when the screen is shown again after a login."""
+        self.search_worker.cancel()
+        self.results_worker.cancel()
+        self.user_email = user_email
+        self.welcome_label.config(text=f"Welcome, {user_email}")
+        self.create_session()
+        self.sort_ascending = True
+        self.cuisine_var.delete(0, "end")
+        self.num_rating_value.delete(0, "end")
+        self.num_rating_value.insert(0, "0")
+        self.results_view.set_rows([])
+
     def sort_by_rating(self):
-        items = [(self.results_tree.item(child, "values"), child) for child in self.results_tree.get_children()]
-    
         # Järjestetään arvostelun mukaan, käännetään tarvittaessa
-        sorted_items = sorted(items, key=lambda x: float(x[0][3]), reverse=self.sort_ascending)
-    
-        # Päivitetään järjestys
-        for index, (values, child) in enumerate(sorted_items):
-            self.results_tree.move(child, "", index)
+        self.results_view.sort([("rating", self.sort_ascending)])
     
         # Vaihdetaan järjestyssuuntaa seuraavaa klikkausta varten
         self.sort_ascending = not self.sort_ascending
 
-    def search_restaurants(self):
-        self.results_tree.delete(*self.results_tree.get_children())
+    def search_restaurants(self, delay_ms=0):
         cuisine = self.cuisine_var.get().strip()
         rating = self.num_rating_value.get().strip()
         try:
             rating = float(rating)
         except ValueError:
             rating = None
-        results = self.browsing.search_by_filters(cuisine_type=cuisine if cuisine else None, min_rating=rating)
-        for r in results:
-            self.results_tree.insert("", "end", values=(r["cuisine"], r["location"], r["phonenumber"], r["rating"]))
+        self.run_search(lambda: self.service.search_restaurants(cuisine=cuisine if cuisine else None, rating=rating,
+                                                                limit=RESULTS_PAGE_SIZE), delay_ms)
+
+    def search_as_you_type(self, event=None):
+        self.search_restaurants(delay_ms=SEARCH_DEBOUNCE_MS)
 
     def view_all_restaurants(self):
-        self.results_tree.delete(*self.results_tree.get_children())
-        results = self.database.get_restaurants()
-        for r in results:
-            self.results_tree.insert("", "end", values=(r["cuisine"], r["location"], r["phonenumber"], r["rating"]))
+        self.run_search(lambda: self.service.search_restaurants(limit=RESULTS_PAGE_SIZE))
+
+    def view_nearby_restaurants(self):
+        """Show restaurants that deliver within NEARBY_RADIUS_KM of the user's address, nearest first."""
+        cuisine = self.cuisine_var.get().strip()
+        token = self.master.session_token
+        self.run_search(lambda: self.service.nearby(token, NEARBY_RADIUS_KM, cuisine=cuisine if cuisine else None))
+
+    def run_search(self, search, delay_ms=0):
+        """Run search() in the background; it returns a service result with the first page of restaurants."""
+        self.search_worker.submit(search, self.show_search_result,
+                                  on_error=lambda error: messagebox.showerror("Error", f"Search failed: {error}"),
+                                  delay_ms=delay_ms)
+
+    def show_search_result(self, result):
+        if result["success"]:
+            self.results_view.set_page(result["restaurants"], result.get("cursor"))
+        else:
+            messagebox.showerror("Error", result["error"])
+
+    def fetch_page(self, cursor, limit):
+        """Fetch the next page of results for the results view as it scrolls."""
+        result = self.service.page(cursor, limit)
+        return (result["restaurants"], result["cursor"]) if result["success"] else ([], None)
+
+    def load_results(self, load, on_done, on_error):
+        """Run load() for the results view in the background, e.g. the rest of a result set to sort."""
+        self.results_worker.submit(load, on_done, on_error=on_error)
+
+    def destroy(self):
+        self.search_worker.shutdown()
+        self.results_worker.shutdown()
+        super().destroy()
 
     def add_item_to_cart(self):
         # For simplicity, let's assume user always adds "Pizza"
@@ -298,47 +880,85 @@ class AddItemPopup(tk.Toplevel):
 
 
 class CartViewPopup(tk.Toplevel):
+    """Show the cart with one row per item, keyed by item name.
+
+    update_cart_view compares the items with the rows already shown: new items get a row, rows
+    whose quantity changed get their label updated in place and rows of removed items are destroyed
+    one by one, so a change never rebuilds the whole list. The rows scroll, so large carts fit too.
+    """
+
     def __init__(self, master, cart):
         super().__init__(master)
         self.title("Cart Items")
 
         self.cart = cart
-        items = self.cart.view_cart()
-
-        self.update_cart_view(items=items)
+        self.rows = {}  # Item name -> (row frame, label)
+
+        canvas = tk.Canvas(self, highlightthickness=0)
+        scrollbar = ttk.Scrollbar(self, orient="vertical", command=canvas.yview)
+        canvas.configure(yscrollcommand=scrollbar.set)
+        self.items_frame = tk.Frame(canvas)
+        self.items_frame.bind("<Configure>", lambda event: canvas.configure(scrollregion=canvas.bbox("all")))
+        canvas.create_window((0, 0), window=self.items_frame, anchor="nw")
+        scrollbar.pack(side="right", fill="y")
+        canvas.pack(side="left", fill="both", expand=True)
+        self.empty_label = tk.Label(self.items_frame, text="Your cart is empty")
+
+        self.update_cart_view(items=self.cart.view_cart())
         
     def update_cart_view(self, items):
-        if not items:
-            tk.Label(self, text="Your cart is empty").pack(pady=20)
-        else:
-            for i in items:
+        """Bring the rows in line with items, a list of dicts as returned by Cart.view_cart."""
+        shown = set()
+        for i in items:
+            name = i["name"]
+            shown.add(name)
+            text = f"{name} x{i['quantity']} = ${i['subtotal']:.2f}"
+            row = self.rows.get(name)
+            if row is None:
                 # Create a frame for each item to contain the label and button
-                item_frame = tk.Frame(self)
+                item_frame = tk.Frame(self.items_frame)
                 item_frame.pack(pady=5, anchor="w")  # Adjust padding as needed
 
                 # Create label for the item
-                item_label = tk.Label(item_frame, text=f"{i['name']} x{i['quantity']} = ${i['subtotal']:.2f}")
+                item_label = tk.Label(item_frame, text=text)
                 item_label.pack(side="left", padx=10)
 
                 # Create a "Remove" button for the item
-                remove_button = tk.Button(item_frame, text="Remove", command=lambda item=i: self.remove_item(item))
+                remove_button = tk.Button(item_frame, text="Remove", command=lambda name=name: self.remove_item(name))
                 remove_button.pack(side="left")
+                self.rows[name] = (item_frame, item_label)
+            elif row[1].cget("text") != text:
+                row[1].config(text=text)
+        for name in [name for name in self.rows if name not in shown]:
+            self.remove_row(name)
+        if self.rows:
+            self.empty_label.pack_forget()
+        else:
+            self.empty_label.pack(pady=20)
 
-    def remove_item(self, item):
-        for cart_item in self.cart.items:
-            if cart_item.name == item['name'] and cart_item.quantity == item['quantity']:
-                print(f"Removing {cart_item.name} from cart.")
-                self.master.cart.items.remove(cart_item) 
-                self.update_cart_view(items = self.cart.items)
-                self.destroy()
-                break
+    def refresh(self):
+        """Update the rows after the cart changed elsewhere."""
+        self.update_cart_view(self.cart.view_cart())
+
+    def remove_item(self, name):
+        """Remove the item from the cart and drop its row; the rest of the view stays as it is."""
+        self.cart.remove_item(name)
+        self.remove_row(name)
+        if not self.rows:
+            self.empty_label.pack(pady=20)
+
+    def remove_row(self, name):
+        item_frame, _ = self.rows.pop(name)
+        item_frame.destroy()
 
 
 class CheckoutPopup(tk.Toplevel):
-    def __init__(self, master, order_placement):
+    def __init__(self, master, order_placement, timeout_s=CHECKOUT_TIMEOUT_S):
         super().__init__(master)
         self.title("Checkout")
         self.order_placement = order_placement
+        self.worker = CheckoutWorker(self.after, self.after_cancel, timeout_s=timeout_s)
+        self.protocol("WM_DELETE_WINDOW", self.close)
 
         order_data = order_placement.proceed_to_checkout()
         tk.Label(self, text="Review your order:", font=("Arial", 12)).pack(pady=10)
@@ -367,7 +987,13 @@ class CheckoutPopup(tk.Toplevel):
         self.card_entry.insert(0, "1234567812345678")
         self.card_entry.pack(pady=5)
 
-        tk.Button(self, text="Confirm Order", command=self.confirm_order).pack(pady=10)
+        self.confirm_button = tk.Button(self, text="Confirm Order", command=self.confirm_order)
+        self.confirm_button.pack(pady=10)
+
+        # Progress of the payment, which runs in the background
+        self.progress = ttk.Progressbar(self, mode="determinate", maximum=timeout_s, length=200)
+        self.status_label = tk.Label(self, text="")
+        self.cancel_button = tk.Button(self, text="Cancel", command=self.cancel_order)
 
     def confirm_order(self):
         # Process order confirmation with the given payment method
@@ -377,14 +1003,49 @@ class CheckoutPopup(tk.Toplevel):
         # For now, we'll simulate PaymentMethod.process_payment by checking if total > 0.
         # In a full scenario, integrate PaymentProcessing similarly.
 
-        # Confirm the order
-        result = self.order_placement.confirm_order(payment_method_obj)
+        # Confirm the order in the background; the result comes back in on_confirmed
+        if not self.worker.start(self.order_placement, payment_method_obj, self.on_confirmed, self.show_progress):
+            messagebox.showerror("Error", "Order confirmation already in progress")
+            return
+        self.confirm_button.config(state="disabled")
+        self.progress["value"] = 0
+        self.progress.pack(pady=5)
+        self.status_label.config(text="Processing payment...")
+        self.status_label.pack()
+        self.cancel_button.config(state="normal")
+        self.cancel_button.pack(pady=5)
+
+    def show_progress(self, elapsed):
+        self.progress["value"] = elapsed
+        self.status_label.config(text=f"Processing payment... {elapsed:.0f} s")
+
+    def cancel_order(self):
+        self.worker.cancel()
+        self.cancel_button.config(state="disabled")
+        self.status_label.config(text="Cancelling...")
+
+    def on_confirmed(self, result):
+        self.progress.pack_forget()
+        self.status_label.pack_forget()
+        self.cancel_button.pack_forget()
+        self.confirm_button.config(state="normal")
         if result["success"]:
             messagebox.showinfo("Order Confirmed", f"Order ID: {result['order_id']}\nEstimated Delivery: {result['estimated_delivery']}")
             self.destroy()
         else:
             messagebox.showerror("Error", result["message"])
 
+    def close(self):
+        """Window close button: a payment in flight is cancelled if possible, never abandoned."""
+        if self.worker.in_flight():
+            self.cancel_order()
+            return
+        self.destroy()
+
+    def destroy(self):
+        self.worker.shutdown()
+        super().destroy()
+
 
 if __name__ == "__main__":
     app = Application()
@@ -0,0 +1,59 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Add the directory containing User_Registration.py to the system path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from User_Registration import UserRegistration
+from User_Storage import SQLiteUserStore
+
+def write_users_db(path, num_users):
+    """Create a users database with num_users users, in one transaction."""
+    SQLiteUserStore(path).close()  # Creates the schema
+    db = sqlite3.connect(path, isolation_level=None)
+    db.execute("PRAGMA synchronous=OFF")
+    db.execute("BEGIN")
+    db.executemany("INSERT INTO users VALUES (?, ?, 0, NULL)",
+                   ((f"user{i}@example.com", f"Password{i}") for i in range(num_users)))
+    db.execute("COMMIT")
+    db.close()
+
+def benchmark_duplicate_check(num_users, probes=100_000, duplicate_share=0.05):
+    """Time the "Email already registered" check of signup attempts, most of them with new emails."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "users.db")
+        write_users_db(path, num_users)
+        store = SQLiteUserStore(path)
+        emails = [f"user{i}@example.com" if i % int(1 / duplicate_share) == 0 else f"new{i}@example.com"
+                  for i in range(probes)]
+
+        start_time = time.perf_counter()
+        for email in emails:
+            email in store
+        store_us = (time.perf_counter() - start_time) * 1e6 / probes
+
+        start_time = time.perf_counter()
+        registration = UserRegistration()
+        registration.users = store  # Builds the filter from the store
+        build_s = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for email in emails:
+            registration.is_registered(email)
+        filter_us = (time.perf_counter() - start_time) * 1e6 / probes
+
+        info = registration.filter_info()
+        print(f"{num_users:>9} users | store only {store_us:6.2f} us | with filter {filter_us:6.2f} us | "
+              f"filter built in {build_s:6.2f} s, {info['memory_bytes'] / 2 ** 20:6.2f} MiB "
+              f"({info['memory_bytes'] / num_users:4.2f} B/user), {info['hash_count']} hashes | "
+              f"false positives: expected {info['expected_false_positive_rate']:.4f}, "
+              f"observed {info['observed_false_positive_rate']:.4f} | store lookups avoided {info['lookups_avoided']}")
+        store.close()
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    for size in sizes:
+        benchmark_duplicate_check(size)
@@ -1,52 +1,75 @@
+import asyncio
+import json
 import time
 import sys
 import os
-import tkinter as tk
-from unittest.mock import patch
 
-# Add the directory containing main.py to the system path
+# Add the directory containing Food_Delivery_Service.py to the system path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from main import Application
-
-def simulate_user_actions(user_id):
-    app = Application()
-    app.show_register_frame()
-
-    # Simulate user registration
-    register_frame = app.current_frame
-    email = f"user{user_id}@example.com"
-    password = "Password123"  # Ensure the password meets the strength requirements
-    register_frame.email_entry.insert(0, email)
-    register_frame.pass_entry.insert(0, password)
-    register_frame.conf_pass_entry.insert(0, password)
-    register_frame.register_user()
-
-    # Simulate user login
-    app.show_login_frame()
-    login_frame = app.current_frame
-    login_frame.email_entry.insert(0, email)
-    login_frame.pass_entry.insert(0, password)
-    login_frame.login()
-
-    # Check if login was successful
-    if app.logged_in_email != email:
-        print(f"User {user_id} login failed.")
-        app.destroy()
-        return
-
-    print(f"User {user_id} actions completed.")
-    app.destroy()
-
-def load_test(num_users):
-    for i in range(num_users):
-        simulate_user_actions(i)
+from Food_Delivery_Service import FoodDeliveryService
+
+async def request(reader, writer, method, target, body=None, token=None):
+    """Send one request on a keep-alive connection and return the decoded JSON answer."""
+    payload = json.dumps(body).encode() if body is not None else b""
+    authorization = f"Authorization: Bearer {token}\r\n" if token else ""
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: localhost\r\n{authorization}"
+                 f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload)
+    await writer.drain()
+    await reader.readline()  # Status line
+    length = 0
+    while (line := await reader.readline()) != b"\r\n":
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return json.loads(await reader.readexactly(length))
+
+async def simulate_user_actions(user_id, port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        # Simulate user registration
+        email = f"user{user_id}@example.com"
+        password = "Password123"  # Ensure the password meets the strength requirements
+        await request(reader, writer, "POST", "/register", {"email": email, "password": password, "confirm_password": password})
+
+        # Simulate user login
+        login = await request(reader, writer, "POST", "/login", {"email": email, "password": password})
+        if not login["success"]:
+            print(f"User {user_id} login failed.")
+            return False
+
+        # Browse, fill the cart and order
+        token = login["token"]
+        await request(reader, writer, "GET", "/restaurants?rating=4", token=token)
+        await request(reader, writer, "POST", "/cart/items", {"item": "Pizza", "quantity": 2}, token=token)
+        order = await request(reader, writer, "POST", "/orders", token=token)
+        return order["success"]
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+async def load_test(num_users, concurrency):
+    """Run num_users simulated users against an in-process server, concurrency of them at a time."""
+    service = FoodDeliveryService()
+    server = await service.serve(port=0)
+    port = server.sockets[0].getsockname()[1]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(user_id):
+        async with semaphore:
+            return await simulate_user_actions(user_id, port)
+
+    results = await asyncio.gather(*(limited(i) for i in range(num_users)))
+    server.close()
+    await server.wait_closed()
+    return sum(results)
 
 if __name__ == "__main__":
-    num_users = 100  # Number of users to simulate
+    num_users = int(sys.argv[1]) if len(sys.argv) > 1 else 1000  # Number of users to simulate
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 200  # Connections open at the same time
     start_time = time.time()
-    with patch('tkinter.messagebox.showinfo', return_value=None), patch('tkinter.messagebox.showerror', return_value=None):
-        load_test(num_users)
-
+    completed = asyncio.run(load_test(num_users, concurrency))
     end_time = time.time()
-    print(f"Load test completed in {end_time - start_time} seconds.")
\ No newline at end of file
+    print(f"{completed}/{num_users} users completed their order.")
+    print(f"Load test completed in {end_time - start_time} seconds "
+          f"({num_users / (end_time - start_time):.0f} users/s, {concurrency} concurrent).")
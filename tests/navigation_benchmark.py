@@ -0,0 +1,47 @@
+import sys
+import os
+import time
+import tkinter as tk
+
+# Add the directory containing main.py to the system path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import Application, StartupFrame, RegisterFrame, LoginFrame, MainAppFrame
+
+EMAIL = "benchmark@example.com"
+ROUTE = [(RegisterFrame, ()), (LoginFrame, ()), (MainAppFrame, (EMAIL,)), (StartupFrame, ())]
+
+def navigate_by_rebuilding(app, frame_class, args):
+    """Navigation as it worked before the frame cache: destroy the screen and build the next one."""
+    app.current_frame.destroy()
+    app.current_frame = frame_class(app, *args)
+    app.current_frame.pack(fill="both", expand=True)
+
+def navigate_with_cache(app, frame_class, args):
+    app.show_frame(frame_class, *args)
+
+def benchmark_navigation(navigate, rounds):
+    """Return the mean time of one screen change in milliseconds, including the pending redraw."""
+    app = Application()
+    app.frames.clear()  # Both runs start from a freshly built startup screen
+    app.update()
+    start_time = time.perf_counter()
+    for _ in range(rounds):
+        for frame_class, args in ROUTE:
+            navigate(app, frame_class, args)
+            app.update_idletasks()
+    elapsed = time.perf_counter() - start_time
+    app.destroy()
+    return elapsed * 1000 / (rounds * len(ROUTE))
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    try:
+        tk.Tk().destroy()
+    except tk.TclError as error:
+        print(f"No display available, skipping the navigation benchmark: {error}")
+        sys.exit(0)
+    rebuild_ms = benchmark_navigation(navigate_by_rebuilding, rounds)
+    cached_ms = benchmark_navigation(navigate_with_cache, rounds)
+    print(f"{rounds} rounds of {len(ROUTE)} screens | rebuild {rebuild_ms:7.2f} ms/navigation, "
+          f"cached {cached_ms:7.2f} ms/navigation ({rebuild_ms / cached_ms:4.1f}x)")
@@ -0,0 +1,65 @@
+import argparse
+import json
+import os
+import re
+import resource
+import sys
+import tempfile
+import time
+import timeit
+
+# Add the directory containing User_Registration.py to the system path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Password_Hashing import PasswordHasher, MAX_WORKERS
+from User_Registration import UserRegistration, EMAIL_PATTERN
+from User_Storage import SQLiteUserStore
+
+def write_jsonl(path, num_users, duplicate_every=100):
+    """Write an import file with num_users accounts, every duplicate_every-th of them a duplicate."""
+    with open(path, "w") as f:
+        for i in range(num_users):
+            email = f"user{i - 1 if i % duplicate_every == duplicate_every - 1 else i}@example.com"
+            f.write(json.dumps({"email": email, "password": f"Password{i}"}) + "\n")
+
+def benchmark_email_check(samples=100_000):
+    """The per-record cost of compiling the pattern through re.match against the precompiled one."""
+    pattern = r'^\w{1,}@(\w{1,}+\.)+[a-zA-Z]{1,}$'
+    email = "some.user1234@example.com"
+    uncompiled = timeit.timeit(lambda: re.match(pattern, email), number=samples)
+    compiled = timeit.timeit(lambda: EMAIL_PATTERN.match(email), number=samples)
+    print(f"email check: re.match {uncompiled / samples * 1e9:6.0f} ns | precompiled {compiled / samples * 1e9:6.0f} ns")
+
+def benchmark_import(num_users, scrypt_n, chunk_size):
+    """Import a JSONL file end to end: read, validate, hash, and commit to an SQLite store."""
+    hasher = PasswordHasher(scrypt_n=scrypt_n)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "users.jsonl")
+        write_jsonl(path, num_users)
+        registration = UserRegistration(hasher=hasher)
+        registration.users = SQLiteUserStore(os.path.join(directory, "users.db"), synchronous="NORMAL")
+        hasher.hash("warm up the worker processes")
+
+        start_time = time.perf_counter()
+        with open(path) as f:
+            results = registration.register_many((json.loads(line) for line in f), chunk_size=chunk_size)
+        elapsed = time.perf_counter() - start_time
+
+        registered = sum(result["success"] for result in results)
+        rss_mib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux reports KiB
+        print(f"{num_users:>9} users | {elapsed:8.2f} s | {num_users / elapsed:9.0f} rows/s | "
+              f"{registered} registered, {num_users - registered} rejected | peak RSS {rss_mib:7.1f} MiB")
+        registration.users.close()
+    hasher.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark bulk user imports with register_many.")
+    parser.add_argument("sizes", nargs="*", type=int, help="numbers of users to import (try 1000000)")
+    parser.add_argument("--scrypt-n", type=int, default=2 ** 8,
+                        help="scrypt cost; the production cost of 16384 takes hours for a million users")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+    print(f"scrypt n={args.scrypt_n}, {MAX_WORKERS} hashing processes, chunks of {args.chunk_size}")
+    benchmark_email_check()
+    for size in args.sizes or [10_000, 100_000]:
+        benchmark_import(size, args.scrypt_n, args.chunk_size)
@@ -0,0 +1,164 @@
+import json
+import random
+import sys
+import tempfile
+import os
+import time
+import tracemalloc
+
+# Add the directory containing Restaurant_Browsing.py to the system path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Restaurant_Browsing import RestaurantBrowsing, RestaurantDatabase, ColumnarRestaurantDatabase, np
+
+CUISINES = ["Italian", "Japanese", "Fast Food", "Mexican", "Thai", "Indian", "Chinese", "Greek", "French", "Finnish"]
+LOCATIONS = ["Downtown", "Midtown", "Uptown", "Harbor", "Old Town", "Airport", "University", "Riverside"]
+PRICE_RANGES = ["$", "$$", "$$$"]
+
+def generate_restaurants(num_restaurants, seed=42):
+    """Build a synthetic catalog with the same fields as the sample data."""
+    rng = random.Random(seed)
+    return [
+        {"name": f"Restaurant {i}", "cuisine": rng.choice(CUISINES), "location": rng.choice(LOCATIONS),
+         "phonenumber": f"+535 {i:09d}", "rating": round(rng.uniform(1.0, 5.0), 1),
+         "price_range": rng.choice(PRICE_RANGES), "delivery": rng.random() < 0.7}
+        for i in range(num_restaurants)
+    ]
+
+def timed(function, repeats):
+    """Return the mean wall-clock time of function() in milliseconds."""
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start_time) / repeats * 1000
+
+def scan_by_cuisine(database, cuisine_type):
+    """The pre-index implementation of search_by_cuisine, kept for comparison."""
+    return [restaurant for restaurant in database.get_restaurants()
+            if restaurant['cuisine'].lower() == cuisine_type.lower()]
+
+def benchmark_exact_match(num_restaurants, repeats=5):
+    database = RestaurantDatabase(generate_restaurants(num_restaurants))
+    browsing = RestaurantBrowsing(database)
+    scan_ms = timed(lambda: scan_by_cuisine(database, "thai"), repeats)
+    index_ms = timed(lambda: browsing.search_by_cuisine("thai"), repeats)
+    print(f"{num_restaurants:>9} rows | exact cuisine: scan {scan_ms:9.2f} ms, index {index_ms:9.2f} ms "
+          f"({scan_ms / index_ms:5.1f}x)")
+
+def benchmark_rating(num_restaurants, repeats=5):
+    database = RestaurantDatabase(generate_restaurants(num_restaurants))
+    browsing = RestaurantBrowsing(database)
+    rows = database.get_restaurants()
+    scan_ms = timed(lambda: [r for r in rows if r['rating'] >= 4.8], repeats)
+    index_ms = timed(lambda: browsing.search_by_rating(4.8), repeats)
+    sort_ms = timed(lambda: sorted(rows, key=lambda r: r['rating'], reverse=True)[:10], repeats)
+    top_k_ms = timed(lambda: browsing.top_k_by_rating(10), repeats)
+    print(f"{num_restaurants:>9} rows | rating >= 4.8: scan {scan_ms:9.2f} ms, index {index_ms:9.2f} ms | "
+          f"top 10: full sort {sort_ms:9.2f} ms, index {top_k_ms:9.3f} ms")
+
+def benchmark_filters(num_restaurants, repeats=5):
+    database = RestaurantDatabase(generate_restaurants(num_restaurants))
+    browsing = RestaurantBrowsing(database)
+    rows = database.get_restaurants()
+
+    def chained_scan():
+        # The pre-planner implementation: one intermediate list per filter
+        results = [r for r in rows if "thai" in r['cuisine'].lower()]
+        results = [r for r in results if "harbor" in r['location'].lower()]
+        return [r for r in results if r['rating'] >= 4.5]
+
+    scan_ms = timed(chained_scan, repeats)
+    planned_ms = timed(lambda: browsing.search_by_filters("thai", "harbor", 4.5), repeats)
+    print(f"{num_restaurants:>9} rows | filters: chained scan {scan_ms:9.2f} ms, planned {planned_ms:9.2f} ms "
+          f"[{browsing.explain_filters('thai', 'harbor', 4.5)}]")
+
+def benchmark_substring(num_restaurants, repeats=5):
+    database = RestaurantDatabase(generate_restaurants(num_restaurants))
+    browsing = RestaurantBrowsing(database)
+    rows = database.get_restaurants()
+    scan_ms = timed(lambda: [r for r in rows if "ant 4242" in r['name'].lower()], repeats)
+    index_ms = timed(lambda: browsing.search_by_name("ant 4242"), repeats)
+    print(f"{num_restaurants:>9} rows | name substring: scan {scan_ms:9.2f} ms, trigram index {index_ms:9.2f} ms")
+
+def benchmark_geospatial(num_restaurants, repeats=200):
+    # Spread the catalog over a country-sized area (roughly Finland)
+    rng = random.Random(1)
+    rows = generate_restaurants(num_restaurants)
+    for row in rows:
+        row["latitude"] = rng.uniform(60.0, 70.0)
+        row["longitude"] = rng.uniform(20.0, 31.0)
+    browsing = RestaurantBrowsing(RestaurantDatabase(rows))
+    points = [(rng.uniform(60.5, 69.5), rng.uniform(20.5, 30.5)) for _ in range(repeats)]
+    queries = iter(points * 2)
+    radius_ms = timed(lambda: browsing.search_nearby(*next(queries), 5.0), repeats)
+    nearest_ms = timed(lambda: browsing.nearest(*next(queries), 10, cuisine_type="thai"), repeats)
+    print(f"{num_restaurants:>9} rows | 5 km radius {radius_ms:9.3f} ms, 10 nearest thai {nearest_ms:9.3f} ms")
+
+def benchmark_mutations(num_restaurants, repeats=1000):
+    database = RestaurantDatabase(generate_restaurants(num_restaurants))
+    rng = random.Random(3)
+    restaurant_ids = [rng.randrange(num_restaurants) for _ in range(repeats)]
+    updates = iter(restaurant_ids)
+    update_ms = timed(lambda: database.update(next(updates), rating=round(rng.uniform(1.0, 5.0), 1)), repeats)
+    new_rows = iter(generate_restaurants(repeats, seed=9))
+    add_ms = timed(lambda: database.add(next(new_rows)), repeats)
+    removals = iter(sorted(set(restaurant_ids)))
+    remove_ms = timed(lambda: database.remove(next(removals)), len(set(restaurant_ids)))
+    print(f"{num_restaurants:>9} rows | update rating {update_ms * 1000:7.1f} us, add {add_ms * 1000:7.1f} us, "
+          f"remove {remove_ms * 1000:7.1f} us")
+
+def benchmark_loader(num_restaurants):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "feed.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for row in generate_restaurants(num_restaurants):
+                f.write(json.dumps(row) + "\n")
+        for use_mmap in [False, True]:
+            database = RestaurantDatabase([])
+            report = database.load_feed(path, use_mmap=use_mmap)
+            print(f"{num_restaurants:>9} rows | JSONL load{' (mmap)' if use_mmap else ''}: "
+                  f"{report['rows_per_sec']:10.0f} rows/s, {report['seconds']:6.2f} s")
+        # Peak memory while loading vs. memory held by the finished catalog: the difference is the
+        # loader's own working set and must not grow with the file size.
+        tracemalloc.start()
+        database = RestaurantDatabase([])
+        database.load_feed(path)
+        catalog_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{num_restaurants:>9} rows | JSONL load peak memory {peak_bytes / 2**20:8.1f} MiB, "
+              f"catalog {catalog_bytes / 2**20:8.1f} MiB, loader overhead {(peak_bytes - catalog_bytes) / 2**20:6.1f} MiB")
+
+def traced_size(build):
+    """Return (object, bytes allocated while building it) using tracemalloc."""
+    tracemalloc.start()
+    built = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return built, size
+
+def benchmark_columnar(num_restaurants, repeats=5):
+    if np is None:
+        print("NumPy is not installed, skipping the columnar benchmark")
+        return
+    rows, rows_bytes = traced_size(lambda: generate_restaurants(num_restaurants))
+    columnar, columnar_bytes = traced_size(lambda: ColumnarRestaurantDatabase(rows))
+    row_browsing = RestaurantBrowsing(RestaurantDatabase(rows))
+    columnar_browsing = RestaurantBrowsing(columnar)
+    for label, filters in [("selective", ("thai", "harbor", 4.5)), ("broad", ("a", None, 2.0))]:
+        row_ms = timed(lambda: row_browsing.search_by_filters(*filters), repeats)
+        columnar_ms = timed(lambda: columnar_browsing.search_by_filters(*filters), repeats)
+        print(f"{num_restaurants:>9} rows | {label} filters: list of dicts {row_ms:9.2f} ms, columnar {columnar_ms:9.2f} ms")
+    print(f"{num_restaurants:>9} rows | memory: list of dicts {rows_bytes / num_restaurants:7.1f} B/row, "
+          f"columnar {columnar_bytes / num_restaurants:7.1f} B/row")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for size in sizes:
+        benchmark_exact_match(size)
+        benchmark_rating(size)
+        benchmark_filters(size)
+        benchmark_substring(size)
+        benchmark_geospatial(size)
+        benchmark_mutations(size)
+        benchmark_loader(size)
+        benchmark_columnar(size)
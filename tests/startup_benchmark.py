@@ -0,0 +1,66 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Runs in a fresh interpreter so that module imports are part of the measurement
+STARTUP_SCRIPT = """
+import sys, time
+start_time = time.perf_counter()
+sys.path.insert(0, {root!r})
+import main
+app = main.Application()
+app.update()
+first_frame = time.perf_counter() - start_time
+app.registration, app.search  # Wait for the background loads
+ready = time.perf_counter() - start_time
+app.destroy()
+print(first_frame, ready)
+"""
+
+# Startup as it was before: everything is imported and loaded before the first frame
+EAGER_SCRIPT = """
+import sys, time
+start_time = time.perf_counter()
+sys.path.insert(0, {root!r})
+import main, Payment_Processing
+from Restaurant_Browsing import RestaurantDatabase, RestaurantBrowsing, RestaurantSearch
+users = main.load_users("journal")  # Parses all of users.json, like before
+RestaurantSearch(RestaurantBrowsing(RestaurantDatabase()))
+app = main.Application()
+app.update()
+print(time.perf_counter() - start_time)
+"""
+
+def write_users(path, num_users):
+    """Write a users.json with num_users registered users, in the format save_users writes."""
+    users = {f"user{i}@example.com": {"password": f"Password{i}", "confirmed": False} for i in range(num_users)}
+    with open(path, "w") as f:
+        json.dump(users, f, indent=4)
+
+def run(script, directory):
+    output = subprocess.run([sys.executable, "-c", script.format(root=ROOT)], cwd=directory,
+                            capture_output=True, text=True, check=True).stdout
+    return [float(value) * 1000 for value in output.split()]
+
+def benchmark_startup(num_users):
+    with tempfile.TemporaryDirectory() as directory:
+        write_users(os.path.join(directory, "users.json"), num_users)
+        eager_ms, = run(EAGER_SCRIPT, directory)
+        first_frame_ms, ready_ms = run(STARTUP_SCRIPT, directory)
+    print(f"{num_users:>9} users | eager first frame {eager_ms:8.1f} ms | lazy first frame {first_frame_ms:8.1f} ms, "
+          f"users and catalog ready {ready_ms:8.1f} ms")
+
+if __name__ == "__main__":
+    try:
+        import tkinter as tk
+        tk.Tk().destroy()
+    except tk.TclError as error:
+        print(f"No display available, skipping the startup benchmark: {error}")
+        sys.exit(0)
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000, 1_000_000]
+    for size in sizes:
+        benchmark_startup(size)
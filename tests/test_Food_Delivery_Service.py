@@ -0,0 +1,237 @@
+import asyncio
+import inspect
+import json
+import unittest
+from unittest import mock
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Food_Delivery_Service import FoodDeliveryService, ROUTES, PARAM_PARSERS
+from User_Registration import UserRegistration
+from Password_Hashing import PasswordHasher
+
+# Cheap hashing settings, so that the tests do not spend their time in scrypt
+FAST_HASHER = PasswordHasher(scrypt_n=2 ** 8, max_workers=0)
+
+class TestFoodDeliveryService(unittest.TestCase):
+    def setUp(self):
+        self.saved = []
+        self.service = FoodDeliveryService(registration=UserRegistration(hasher=FAST_HASHER),
+                                           save_users=lambda users: self.saved.append(dict(users)))
+        self.service.register("user@example.com", "Password123", "Password123")
+        self.token = self.service.login("user@example.com", "Password123")["token"]
+
+    def test_register_saves_users(self):
+        self.assertEqual(list(self.saved[-1]), ["user@example.com"])
+        result = self.service.register("user@example.com", "Password123", "Password123")
+        self.assertEqual(result, {"success": False, "error": "Email already registered"})
+        self.assertEqual(len(self.saved), 1)
+
+    def test_login(self):
+        self.assertEqual(self.service.login("user@example.com", "wrong"), {"success": False, "error": "Invalid email or password"})
+        self.assertEqual(self.service.session(self.token).email, "user@example.com")
+        self.assertNotEqual(self.service.login("user@example.com", "Password123")["token"], self.token)
+
+    def test_logout_ends_session(self):
+        self.assertTrue(self.service.logout(self.token)["success"])
+        self.assertEqual(self.service.view_cart(self.token), {"success": False, "error": "Not logged in"})
+        self.assertFalse(self.service.logout(self.token)["success"])
+
+    def test_search_and_page(self):
+        result = self.service.search_restaurants(cuisine="Italian", limit=1)
+        self.assertEqual([r["name"] for r in result["restaurants"]], ["Italian Bistro"])
+        result = self.service.search_restaurants(limit=2)
+        rest = self.service.page(result["cursor"], 100)
+        self.assertEqual(len(result["restaurants"]) + len(rest["restaurants"]), len(self.service.database.get_restaurants()))
+        self.assertIsNone(rest["cursor"])
+        self.assertEqual(self.service.page("not a cursor"), {"success": False, "error": "Invalid cursor"})
+        self.assertEqual(self.service.search_restaurants(rating="nan"), {"success": False, "error": "Invalid rating"})
+        for limit in [0, -1, "abc"]:
+            self.assertEqual(self.service.page(result["cursor"], limit),
+                             {"success": False, "error": "Limit must be a positive whole number"})
+
+    def test_nearby_uses_session_address(self):
+        result = self.service.nearby(self.token, 5.0)
+        self.assertTrue(result["success"])
+        self.assertTrue(all(r["delivery"] for r in result["restaurants"]))
+        self.assertFalse(self.service.nearby("unknown")["success"])
+        for radius in ["abc", 0, -1, "nan", "inf"]:
+            self.assertEqual(self.service.nearby(self.token, radius),
+                             {"success": False, "error": "Radius must be a positive number"})
+
+    def test_cart_checkout_and_order(self):
+        self.assertEqual(self.service.checkout(self.token), {"success": False, "message": "Cart is empty"})
+        self.assertFalse(self.service.add_to_cart(self.token, "Sushi")["success"])
+        self.assertFalse(self.service.add_to_cart(self.token, "Pizza", "zero")["success"])
+        self.service.add_to_cart(self.token, "Pizza", 2)
+        self.service.add_to_cart(self.token, "Salad")
+        self.service.remove_from_cart(self.token, "Salad")
+        cart = self.service.view_cart(self.token)
+        self.assertEqual(cart["items"], [{"name": "Pizza", "quantity": 2, "subtotal": 20.0}])
+        self.assertAlmostEqual(cart["total_info"]["total"], 27.0)
+        self.assertEqual(self.service.checkout(self.token)["delivery_address"], "123 Main St")
+        self.assertTrue(self.service.confirm_order(self.token)["success"])
+
+    def test_confirm_order_through_payment_gateway(self):
+        self.service.add_to_cart(self.token, "Pizza")
+        declined = {"card_number": "1111222233334444", "cvv": "123"}
+        self.assertEqual(self.service.confirm_order(self.token, "credit_card", declined)["message"], "Payment failed")
+        valid = {"card_number": "1234567812345678", "cvv": "123"}
+        self.assertTrue(self.service.confirm_order(self.token, "credit_card", valid)["success"])
+        # A client retrying the request is not charged again
+        self.assertEqual(self.service.confirm_order(self.token, "credit_card", valid)["message"], "Order already confirmed")
+
+    def test_sessions_have_separate_carts(self):
+        other = self.service.open_session("other@example.com")
+        self.service.add_to_cart(self.token, "Pizza")
+        self.assertEqual(self.service.view_cart(other)["items"], [])
+
+    def test_registration_can_still_be_loading(self):
+        class Loading:
+            def result(self):
+                registration = UserRegistration()
+                registration.users = {"late@example.com": {"password": "Password123"}}
+                return registration
+
+        service = FoodDeliveryService(registration=Loading())
+        self.assertTrue(service.login("late@example.com", "Password123")["success"])
+
+    def test_passwords_are_hashed(self):
+        stored = self.service.registration.users["user@example.com"]["password"]
+        self.assertNotIn("Password123", stored)
+        self.assertTrue(stored.startswith("scrypt$256$8$1$"))
+
+    def test_submit_login(self):
+        future = self.service.submit_login("user@example.com", "Password123")
+        self.assertEqual(self.service.session(future.result(timeout=5)["token"]).email, "user@example.com")
+        future = self.service.submit_register("new@example.com", "Password123", "Password1234")
+        self.assertEqual(future.result(timeout=5), {"success": False, "error": "Passwords do not match"})
+
+
+class TestHttpInterface(unittest.TestCase):
+    def setUp(self):
+        self.service = FoodDeliveryService(registration=UserRegistration(hasher=FAST_HASHER))
+
+    def request(self, method, target, body=None, token=None):
+        headers = {"authorization": f"Bearer {token}"} if token else {}
+        return self.service.handle_request(method, target, headers, json.dumps(body).encode() if body is not None else b"")
+
+    def test_routes(self):
+        status, result = self.request("POST", "/register", {"email": "a@example.com", "password": "Password123",
+                                                            "confirm_password": "Password123"})
+        self.assertEqual((status, result["success"]), (200, True))
+        token = self.request("POST", "/login", {"email": "a@example.com", "password": "Password123"})[1]["token"]
+        self.assertTrue(self.request("POST", "/cart/items", {"item": "Burger", "quantity": 3}, token)[1]["success"])
+        self.assertEqual(self.request("GET", "/cart", token=token)[1]["items"][0]["quantity"], 3)
+        status, result = self.request("GET", "/restaurants?cuisine=japanese&rating=4.5")
+        self.assertEqual([r["name"] for r in result["restaurants"]], ["Sushi House"])
+        self.assertEqual(self.request("GET", "/menu", token=token)[0], 200)  # Token is ignored where not needed
+
+    def test_stats(self):
+        self.request("POST", "/register", {"email": "a@example.com", "password": "Password123",
+                                           "confirm_password": "Password123"})
+        self.request("GET", "/restaurants?cuisine=japanese")
+        status, result = self.request("GET", "/stats")
+        self.assertEqual(status, 200)
+        self.assertEqual((result["email_filter"]["items"], result["email_filter"]["lookups_avoided"]), (1, 2))
+        self.assertEqual(result["search_cache"]["misses"], 1)
+
+    def test_errors(self):
+        self.assertEqual(self.request("GET", "/nowhere")[0], 404)
+        self.assertEqual(self.request("POST", "/cart")[0], 404)
+        self.assertEqual(self.service.handle_request("POST", "/login", {}, b"{not json")[0], 400)
+        self.assertEqual(self.request("POST", "/login", ["a", "b"])[0], 400)
+        status, result = self.request("POST", "/login", {"email": "a@example.com"})
+        self.assertEqual(status, 400)
+        self.assertIn("password", result["error"])
+        self.assertEqual(self.request("GET", "/restaurants?limit=0")[1]["success"], False)
+
+    def test_parameter_types(self):
+        for method, target, body in [("GET", "/restaurants", {"cuisine": 5}),
+                                     ("POST", "/register", {"email": ["a"], "password": "Password123",
+                                                            "confirm_password": "Password123"}),
+                                     ("POST", "/login", {"email": "a@example.com", "password": None}),
+                                     ("GET", "/restaurants?rating=nan", None),
+                                     ("GET", "/restaurants?rating=abc", None),
+                                     ("GET", "/restaurants", {"rating": True}),
+                                     ("GET", "/restaurants?limit=2.5", None),
+                                     ("POST", "/orders", {"token": "x", "payment_details": "card"})]:
+            status, result = self.request(method, target, body)
+            self.assertEqual(status, 400, (target, body, result))
+            self.assertFalse(result["success"])
+        status, result = self.request("GET", "/restaurants", {"cuisine": None, "rating": 4.5, "limit": "1"})
+        self.assertEqual((status, [r["name"] for r in result["restaurants"]]), (200, ["Italian Bistro"]))
+
+    def test_every_parameter_has_a_parser(self):
+        for name in ROUTES.values():
+            for parameter in inspect.signature(getattr(self.service, name)).parameters:
+                self.assertIn(parameter, PARAM_PARSERS)
+
+    def test_handler_exception_gives_500(self):
+        with mock.patch.object(self.service, "menu", side_effect=RuntimeError("boom")), \
+                mock.patch("traceback.print_exc"):
+            self.assertEqual(self.request("GET", "/menu"), (500, {"success": False, "error": "Internal server error"}))
+
+
+class TestHttpServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.hasher = PasswordHasher(scrypt_n=2 ** 8, max_workers=2)  # Hashes in worker processes
+        self.service = FoodDeliveryService(registration=UserRegistration(hasher=self.hasher))
+        self.server = await self.service.serve(port=0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.hasher.shutdown()
+
+    async def send(self, writer, reader, method, target, body=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        writer.write(f"{method} {target} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(payload)}\r\n\r\n".encode() + payload)
+        await writer.drain()
+        status_line = await reader.readline()
+        headers = {}
+        while (line := await reader.readline()) != b"\r\n":
+            name, _, value = line.decode().partition(":")
+            headers[name.lower()] = value.strip()
+        return int(status_line.split()[1]), json.loads(await reader.readexactly(int(headers["content-length"])))
+
+    async def test_keep_alive_connection(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        status, result = await self.send(writer, reader, "GET", "/menu")
+        self.assertEqual(status, 200)
+        self.assertEqual([item["name"] for item in result["items"]], ["Burger", "Pizza", "Salad"])
+        status, result = await self.send(writer, reader, "POST", "/login", {"email": "x@example.com", "password": "x"})
+        self.assertEqual((status, result["success"]), (200, False))
+        writer.close()
+        await writer.wait_closed()
+
+    async def test_handler_exception_keeps_connection(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        with mock.patch.object(self.service, "menu", side_effect=RuntimeError("boom")), \
+                mock.patch("traceback.print_exc"):
+            status, result = await self.send(writer, reader, "GET", "/menu")
+        self.assertEqual((status, result["success"]), (500, False))
+        status, _ = await self.send(writer, reader, "GET", "/menu")
+        self.assertEqual(status, 200)
+        writer.close()
+        await writer.wait_closed()
+
+    async def test_concurrent_clients(self):
+        async def client(i):
+            reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+            password = "Password123"
+            await self.send(writer, reader, "POST", "/register",
+                            {"email": f"user{i}@example.com", "password": password, "confirm_password": password})
+            _, result = await self.send(writer, reader, "POST", "/login", {"email": f"user{i}@example.com", "password": password})
+            writer.close()
+            await writer.wait_closed()
+            return result["success"]
+
+        self.assertTrue(all(await asyncio.gather(*(client(i) for i in range(50)))))
+        self.assertEqual(len(self.service.sessions), 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import time
 import unittest
 from unittest import mock
 import sys
@@ -22,10 +23,25 @@ class TestModuleIntegrations(unittest.TestCase):
             "testuser@example.com": {"password": "password123"}
         }
 
+    def wait_for_checkout(self, checkout_popup):
+        """Run the Tk event loop until the background confirmation has been delivered."""
+        deadline = time.monotonic() + 5
+        while checkout_popup.worker.active and time.monotonic() < deadline:
+            self.app.update()
+            time.sleep(0.01)
+
+    def wait_for_login(self):
+        """Run the Tk event loop until the password has been checked in the background."""
+        deadline = time.monotonic() + 5
+        while self.login_frame.pending is not None and time.monotonic() < deadline:
+            self.app.update()
+            time.sleep(0.01)
+
     def test_successful_login(self):
         self.login_frame.email_entry.insert(0, "testuser@example.com")
         self.login_frame.pass_entry.insert(0, "password123")
         self.login_frame.login()
+        self.wait_for_login()
 
         # Check if the user is logged in and the main app frame is shown
         self.assertEqual(self.app.logged_in_email, "testuser@example.com")
@@ -37,6 +53,7 @@ class TestModuleIntegrations(unittest.TestCase):
 
         with mock.patch('tkinter.messagebox.showerror') as mock_showerror:
             self.login_frame.login()
+            self.wait_for_login()
             mock_showerror.assert_called_once_with("Error", "Invalid email or password")
 
         # Check if the user is not logged in and the login frame is still shown
@@ -67,6 +84,7 @@ class TestModuleIntegrations(unittest.TestCase):
 
         # Simulate confirming the order
         checkout_popup.confirm_order()
+        self.wait_for_checkout(checkout_popup)
 
         # Check if the success message box was shown
         mock_showinfo.assert_called_once_with("Order Confirmed", "Order ID: 12345\nEstimated Delivery: 30 minutes")
@@ -96,6 +114,7 @@ class TestModuleIntegrations(unittest.TestCase):
 
         # Simulate confirming the order
         checkout_popup.confirm_order()
+        self.wait_for_checkout(checkout_popup)
 
         # Check if the error message box was shown
         mock_showerror.assert_called_once_with("Error", "Payment failed")
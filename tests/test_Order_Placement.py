@@ -1,3 +1,4 @@
+import threading
 import unittest
 from unittest import mock
 import sys
@@ -79,6 +80,55 @@ class TestOrderPlacement(unittest.TestCase):
             self.assertFalse(result["success"])
             self.assertEqual(result["message"], "Payment failed")
 
+    def test_confirm_order_refuses_concurrent_confirmation(self):
+        """Test case for a second confirmation while the first one is still in flight."""
+        self.cart.add_item("Pizza", 12.99, 1)
+        payment_method = PaymentMethod()
+        with mock.patch.object(payment_method, 'process_payment', return_value=True) as process_payment:
+            with self.order.confirm_lock:
+                result = self.order.confirm_order(payment_method)
+            self.assertEqual(result, {"success": False, "message": "Order confirmation already in progress"})
+            process_payment.assert_not_called()
+            self.assertTrue(self.order.confirm_order(payment_method)["success"])
+
+    def test_confirm_order_twice_charges_once(self):
+        """Test case for a retried confirmation after the first one already succeeded."""
+        self.cart.add_item("Pizza", 12.99, 1)
+        payment_method = PaymentMethod()
+        with mock.patch.object(payment_method, 'process_payment', return_value=True) as process_payment:
+            first = self.order.confirm_order(payment_method)
+            second = self.order.confirm_order(payment_method)
+            process_payment.assert_called_once()
+        self.assertTrue(second["success"])
+        self.assertEqual(second["order_id"], first["order_id"])
+        self.assertEqual(second["message"], "Order already confirmed")
+
+    def test_confirm_order_retry_after_failed_payment(self):
+        """Test case for confirming again after a failed payment, which charged nothing."""
+        self.cart.add_item("Pizza", 12.99, 1)
+        payment_method = PaymentMethod()
+        with mock.patch.object(payment_method, 'process_payment', side_effect=[False, True]) as process_payment:
+            self.assertFalse(self.order.confirm_order(payment_method)["success"])
+            self.assertEqual(self.order.confirm_order(payment_method)["message"], "Order confirmed")
+            self.assertEqual(process_payment.call_count, 2)
+
+    def test_confirm_order_cancelled_before_payment(self):
+        """Test case for cancelling an order before the payment has started."""
+        self.cart.add_item("Pizza", 12.99, 1)
+        payment_method = PaymentMethod()
+        cancel_event = threading.Event()
+        cancel_event.set()
+        with mock.patch.object(payment_method, 'process_payment') as process_payment:
+            result = self.order.confirm_order(payment_method, cancel_event=cancel_event)
+            self.assertEqual(result["message"], "Order cancelled")
+            process_payment.assert_not_called()
+
+    def test_user_profile_coordinates(self):
+        """Test case for a profile with and without a located delivery address."""
+        self.assertFalse(self.user_profile.has_coordinates())
+        located = UserProfile(delivery_address="123 Main St", latitude=60.1699, longitude=24.9384)
+        self.assertTrue(located.has_coordinates())
+
     def test_get_subtotal(self):
         """Test case for calculating subtotal of a CartItem."""
         item = CartItem("Burger", 8.99, 3)
@@ -0,0 +1,90 @@
+import asyncio
+import tempfile
+import unittest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Password_Hashing import PasswordHasher
+from User_Registration import UserRegistration
+from User_Storage import JournaledUserStore
+
+class TestPasswordHasher(unittest.TestCase):
+    def setUp(self):
+        self.hasher = PasswordHasher(scrypt_n=2 ** 8, max_workers=0)
+
+    def test_hash_and_verify(self):
+        stored = self.hasher.hash("Password123")
+        self.assertTrue(stored.startswith("scrypt$256$8$1$"))
+        self.assertNotEqual(stored, self.hasher.hash("Password123"))  # Salted
+        self.assertTrue(self.hasher.verify("Password123", stored))
+        self.assertFalse(self.hasher.verify("Password124", stored))
+        self.assertFalse(self.hasher.needs_rehash(stored))
+
+    def test_pbkdf2(self):
+        hasher = PasswordHasher(algorithm="pbkdf2_sha256", pbkdf2_iterations=1000, max_workers=0)
+        stored = hasher.hash("Password123")
+        self.assertTrue(stored.startswith("pbkdf2_sha256$1000$"))
+        self.assertTrue(self.hasher.verify("Password123", stored))  # Verifies whatever the current settings
+        self.assertTrue(self.hasher.needs_rehash(stored))
+        with self.assertRaises(ValueError):
+            PasswordHasher(algorithm="md5")
+
+    def test_plaintext_and_old_costs_need_rehash(self):
+        self.assertTrue(self.hasher.verify("Password123", "Password123"))
+        self.assertFalse(self.hasher.verify("Password12", "Password123"))
+        self.assertTrue(self.hasher.needs_rehash("Password123"))
+        cheaper = PasswordHasher(scrypt_n=2 ** 4, max_workers=0).hash("Password123")
+        self.assertTrue(self.hasher.verify("Password123", cheaper))
+        self.assertTrue(self.hasher.needs_rehash(cheaper))
+
+    def test_process_pool_and_async(self):
+        hasher = PasswordHasher(scrypt_n=2 ** 8, max_workers=2)
+        self.addCleanup(hasher.shutdown)
+        futures = [hasher.submit_hash(f"Password{i}") for i in range(4)]
+        hashes = [future.result(timeout=30) for future in futures]
+        self.assertTrue(all(hasher.submit_verify(f"Password{i}", stored).result(timeout=30)
+                            for i, stored in enumerate(hashes)))
+
+        async def login():
+            stored = await hasher.hash_async("Password123")
+            return await hasher.verify_async("Password123", stored)
+
+        self.assertTrue(asyncio.run(login()))
+
+
+class TestLogin(unittest.TestCase):
+    def setUp(self):
+        self.registration = UserRegistration(hasher=PasswordHasher(scrypt_n=2 ** 8, max_workers=0))
+
+    def test_register_stores_hash(self):
+        self.assertTrue(self.registration.register("user@example.com", "Password123", "Password123")["success"])
+        self.assertNotEqual(self.registration.users["user@example.com"]["password"], "Password123")
+        self.assertTrue(self.registration.login("user@example.com", "Password123")["success"])
+        self.assertEqual(self.registration.login("user@example.com", "Password12"),
+                         {"success": False, "error": "Invalid email or password"})
+        self.assertFalse(self.registration.login("nobody@example.com", "Password123")["success"])
+
+    def test_plaintext_is_rehashed_on_login(self):
+        self.registration.users = {"old@example.com": {"password": "Password123", "confirmed": True}}
+        self.assertFalse(self.registration.login("old@example.com", "wrong")["success"])
+        self.assertEqual(self.registration.users["old@example.com"]["password"], "Password123")
+        self.assertTrue(self.registration.login("old@example.com", "Password123")["success"])
+        user = self.registration.users["old@example.com"]
+        self.assertTrue(user["password"].startswith("scrypt$256$8$1$"))
+        self.assertTrue(user["confirmed"])
+        self.assertTrue(self.registration.login("old@example.com", "Password123")["success"])
+
+    def test_rehash_is_saved_by_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "users.json")
+            with JournaledUserStore(path) as users:
+                users["old@example.com"] = {"password": "Password123", "confirmed": False}
+                self.registration.users = users
+                self.registration.login("old@example.com", "Password123")
+            with JournaledUserStore(path) as users:
+                self.assertFalse(self.registration.hasher.needs_rehash(users["old@example.com"]["password"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
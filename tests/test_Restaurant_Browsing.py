@@ -1,9 +1,19 @@
 import unittest
+import base64
+import json
+import random
+import tempfile
+import threading
 from unittest import mock
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from Restaurant_Browsing import RestaurantBrowsing, RestaurantDatabase, RestaurantSearch
+from Restaurant_Browsing import RestaurantBrowsing, RestaurantDatabase, RestaurantSearch, ColumnarRestaurantDatabase, GridIndex, haversine_km
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 """Stubbing the RestaurantDatabase"""
 class RestaurantStubbDatabase():
@@ -105,5 +115,629 @@ class TestRestaurantBrowsing(unittest.TestCase):
         results = self.browsing.search_by_filters(cuisine_type=None, location=None, min_rating=None)
         self.assertGreater(len(results), 0, "Expected at least one result")
 
+class TestRestaurantDatabaseIndexes(unittest.TestCase):
+    """
+    Unit tests for the hash indexes kept by RestaurantDatabase.
+    """
+
+    def setUp(self):
+        self.database = RestaurantDatabase()
+        self.browsing = RestaurantBrowsing(self.database)
+
+    def test_find_exact_ignores_case(self):
+        """
+        Test that index lookups match regardless of case.
+        """
+        results = self.database.find_exact("cuisine", "iTaLiAn")
+        self.assertEqual([restaurant['name'] for restaurant in results], ["Italian Bistro", "Pizza Palace"])
+
+    def test_indexed_search_matches_scan(self):
+        """
+        Test that indexed cuisine and location searches return the same rows as a full scan.
+        """
+        for cuisine in ["Italian", "japanese", "Thai"]:
+            expected = [r for r in self.database.get_restaurants() if r['cuisine'].lower() == cuisine.lower()]
+            self.assertEqual(self.browsing.search_by_cuisine(cuisine), expected)
+        for location in ["Downtown", "UPTOWN", "Nowhere"]:
+            expected = [r for r in self.database.get_restaurants() if r['location'].lower() == location.lower()]
+            self.assertEqual(self.browsing.search_by_location(location), expected)
+
+    def test_rebuild_indexes_after_direct_change(self):
+        """
+        Test that rebuild_indexes picks up restaurant dictionaries changed in place.
+        """
+        self.database.get_restaurants()[0]['cuisine'] = "Thai"
+        self.database.rebuild_indexes()
+        self.assertEqual(len(self.browsing.search_by_cuisine("thai")), 1)
+
+    def test_search_by_rating_uses_index(self):
+        """
+        Test that the rating index returns the same rows as a scan, in database order.
+        """
+        for min_rating in [0, 3.9, 4.05, 4.5, 5.0]:
+            expected = [r for r in self.database.get_restaurants() if r['rating'] >= min_rating]
+            self.assertEqual(self.browsing.search_by_rating(min_rating), expected)
+
+    def test_top_k_by_rating(self):
+        """
+        Test that top_k_by_rating returns the best rated matches first and respects the filters.
+        """
+        results = self.browsing.top_k_by_rating(2)
+        self.assertEqual([r['name'] for r in results], ["Sushi House", "Italian Bistro"])
+        results = self.browsing.top_k_by_rating(5, cuisine_type="ital", min_rating=4.0)
+        self.assertEqual([r['name'] for r in results], ["Italian Bistro"])
+        self.assertEqual(self.browsing.top_k_by_rating(0), [])
+
+    def test_top_k_by_rating_without_index(self):
+        """
+        Test that top_k_by_rating also works with a database that has no rating index.
+        """
+        browsing = RestaurantBrowsing(RestaurantStubbDatabase())
+        results = browsing.top_k_by_rating(3, cuisine_type="Italian")
+        self.assertEqual([r['rating'] for r in results], [4.5, 4.0, 3.0])
+
+class TestRestaurantDatabaseMutations(unittest.TestCase):
+    """
+    Unit tests for add, update, remove and bulk_upsert keeping every index in sync.
+    """
+
+    def setUp(self):
+        self.database = RestaurantDatabase()
+        self.browsing = RestaurantBrowsing(self.database)
+        self.thai = {"name": "Thai Corner", "cuisine": "Thai", "location": "Midtown", "phonenumber": "+535 000 0000",
+                     "rating": 4.1, "price_range": "$", "delivery": True, "latitude": 60.18, "longitude": 24.95}
+
+    def assert_indexes_match_rebuild(self):
+        """
+        Check that incrementally maintained indexes give the same answers as freshly built ones.
+        """
+        rebuilt = RestaurantBrowsing(RestaurantDatabase(self.database.get_restaurants()))
+        for cuisine in [None, "thai", "ital", "a"]:
+            for rating in [None, 4.0, 4.6]:
+                self.assertEqual(self.browsing.search_by_filters(cuisine, None, rating),
+                                 rebuilt.search_by_filters(cuisine, None, rating))
+        self.assertEqual(self.browsing.search_by_name("o"), rebuilt.search_by_name("o"))
+        self.assertEqual(self.browsing.top_k_by_rating(10), rebuilt.top_k_by_rating(10))
+        self.assertEqual(self.browsing.nearest(60.18, 24.95, 10), rebuilt.nearest(60.18, 24.95, 10))
+
+    def test_add(self):
+        """
+        Test that an added restaurant is found through every index and gets a new id.
+        """
+        restaurant_id = self.database.add(self.thai)
+        self.assertEqual(restaurant_id, 5)
+        self.assertEqual(self.browsing.search_by_cuisine("thai"), [self.database.get(restaurant_id)])
+        self.assertEqual(self.browsing.search_by_name("corner")[0]['name'], "Thai Corner")
+        self.assertEqual(self.browsing.nearest(60.18, 24.95, 1)[0]['name'], "Thai Corner")
+        self.assert_indexes_match_rebuild()
+
+    def test_update(self):
+        """
+        Test that changed ratings, cuisines and coordinates move between index entries.
+        """
+        self.database.update(1, rating=3.0, delivery=True)
+        self.database.update(0, cuisine="Thai", latitude=60.3, longitude=25.1)
+        self.assertEqual(self.browsing.top_k_by_rating(1)[0]['name'], "Italian Bistro")
+        self.assertEqual(self.browsing.search_by_cuisine("thai")[0]['name'], "Italian Bistro")
+        self.assertEqual(len(self.browsing.search_by_cuisine("italian")), 1)
+        self.assert_indexes_match_rebuild()
+
+    def test_remove(self):
+        """
+        Test that removed restaurants disappear from every index and from paging.
+        """
+        removed = self.database.remove(0)
+        self.assertEqual(removed['name'], "Italian Bistro")
+        self.assertIsNone(self.database.get(0))
+        self.assertEqual(len(self.database.get_restaurants()), 4)
+        self.assertEqual(self.browsing.search_by_name("bistro"), [])
+        results, _ = self.browsing.page(self.browsing.make_cursor(), 10)
+        self.assertEqual(len(results), 4)
+        with self.assertRaises(KeyError):
+            self.database.remove(0)
+        self.assert_indexes_match_rebuild()
+
+    def test_bulk_upsert(self):
+        """
+        Test that bulk_upsert updates rows with a known id and adds the others.
+        """
+        restaurant_ids = self.database.bulk_upsert([{"id": 2, "rating": 5.0}, self.thai, {"id": 99, **self.thai}])
+        self.assertEqual(restaurant_ids, [2, 5, 6])
+        self.assertEqual(self.database.get(2)['rating'], 5.0)
+        self.assertNotIn("id", self.database.get(6))
+        self.assert_indexes_match_rebuild()
+
+    def test_invalid_restaurant(self):
+        """
+        Test that restaurants without required fields are rejected and leave the database unchanged.
+        """
+        with self.assertRaises(ValueError):
+            self.database.add({"name": "No Cuisine", "location": "Downtown", "rating": 4.0})
+        with self.assertRaises(ValueError):
+            self.database.update(0, rating=None)
+        for fields in [{"rating": "4.5"}, {"rating": True}, {"rating": float("nan")}, {"cuisine": 7},
+                       {"name": None}, {"latitude": "60.1", "longitude": 24.9}]:
+            with self.assertRaises(ValueError):
+                self.database.add({"name": "Bad", "cuisine": "Thai", "location": "Downtown", "rating": 4.0, **fields})
+            with self.assertRaises(ValueError):
+                self.database.update(0, **fields)
+        self.assertEqual(len(self.database), 5)
+        self.assertEqual(self.database.get(0)["rating"], RestaurantDatabase().get(0)["rating"])
+        self.assert_indexes_match_rebuild()
+
+    def test_searches_during_live_updates(self):
+        """
+        Test that searches running next to a writer never fail and only return matching restaurants.
+        """
+        rows = [{"name": f"Restaurant {i}", "cuisine": ["Italian", "Thai", "Mexican"][i % 3], "location": "Downtown",
+                 "rating": (i % 5) + 1.0, "latitude": 60.1 + i % 100 / 1000, "longitude": 24.9} for i in range(20000)]
+        database = RestaurantDatabase(rows)
+        browsing = RestaurantBrowsing(database)
+        done = threading.Event()
+        errors = []
+
+        def write():
+            try:
+                for i in range(3000):
+                    database.add(dict(rows[i], rating=5.0))
+                    database.remove(i)
+            finally:
+                done.set()
+
+        def search():
+            try:
+                while not done.is_set():
+                    results = browsing.search_by_filters(cuisine_type="ital", min_rating=4.0)
+                    self.assertTrue(all("Italian" == r["cuisine"] and r["rating"] >= 4.0 for r in results))
+                    results, cursor = browsing.page(browsing.make_cursor(min_rating=3.0), 100)
+                    self.assertEqual(len(results), 100)
+                    self.assertTrue(all(r["cuisine"] == "Thai" for r in browsing.iter_filters(cuisine_type="thai")))
+                    browsing.search_by_name("restaurant 1")
+                    browsing.search_by_rating(5.0)
+                    browsing.top_k_by_rating(10, cuisine_type="mex")
+                    browsing.search_nearby(60.15, 24.9, 2.0)
+                    database.get_restaurants()
+            except Exception as error:
+                errors.append(error)
+
+        readers = [threading.Thread(target=search) for _ in range(5)]
+        writer = threading.Thread(target=write)
+        for thread in readers + [writer]:
+            thread.start()
+        for thread in [writer] + readers:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_large_buckets_and_version(self):
+        """
+        Test that buckets growing past the block size keep working, and that every change bumps the version.
+        """
+        version = self.database.version
+        restaurant_ids = self.database.bulk_upsert([dict(self.thai, rating=float(i % 5)) for i in range(3000)])
+        for restaurant_id in restaurant_ids[::3]:
+            self.database.remove(restaurant_id)
+        self.assertEqual(self.database.version, version + 4000)
+        self.assert_indexes_match_rebuild()
+
+
+class TestFeedLoader(unittest.TestCase):
+    """
+    Unit tests for streaming CSV and JSONL restaurant feeds into the database.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = RestaurantDatabase([])
+        self.browsing = RestaurantBrowsing(self.database)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_load_csv(self):
+        """
+        Test that CSV rows are parsed, typed and indexed, and that invalid rows are reported.
+        """
+        path = self.write("feed.csv",
+                          "name,cuisine,location,phonenumber,rating,price_range,delivery,latitude,longitude\n"
+                          "Pasta Place,Italian,Downtown,123,4.4,$$,yes,60.17,24.94\n"
+                          "\"Curry, Inc\",Indian,Uptown,456,3.5,$,false,,\n"
+                          "Bad Rating,Thai,Uptown,789,7.0,$,true,,\n"
+                          "No Cuisine,,Uptown,789,4.0,$,true,,\n")
+        for use_mmap in [False, True]:
+            database = RestaurantDatabase([])
+            report = database.load_feed(path, use_mmap=use_mmap)
+            self.assertEqual((report["rows"], report["rejected"]), (2, 2))
+            self.assertEqual([line for line, _ in report["errors"]], [4, 5])
+            restaurants = database.get_restaurants()
+            self.assertEqual(restaurants[0], {"name": "Pasta Place", "cuisine": "Italian", "location": "Downtown",
+                                              "phonenumber": "123", "rating": 4.4, "price_range": "$$",
+                                              "delivery": True, "latitude": 60.17, "longitude": 24.94})
+            self.assertEqual(restaurants[1]["name"], "Curry, Inc")
+            self.assertNotIn("latitude", restaurants[1])
+            self.assertEqual(len(RestaurantBrowsing(database).search_by_rating(4.0)), 1)
+
+    def test_load_jsonl(self):
+        """
+        Test that JSONL feeds load into an existing database next to its rows and share interned strings.
+        """
+        rows = [{"name": f"Sushi {i}", "cuisine": "Japanese", "location": "Midtown", "rating": 4.0 + i / 10,
+                 "delivery": True} for i in range(5)]
+        path = self.write("feed.jsonl", "\n".join(json.dumps(row) for row in rows) + "\nnot json\n[1, 2]\n")
+        database = RestaurantDatabase()
+        report = database.load_feed(path, trace_memory=True)
+        self.assertEqual((report["rows"], report["rejected"]), (5, 2))
+        self.assertGreater(report["peak_memory_bytes"], 0)
+        self.assertGreater(report["rows_per_sec"], 0)
+        self.assertEqual(len(database), 10)
+        loaded = database.get_restaurants()[5:]
+        self.assertIs(loaded[0]["cuisine"], loaded[4]["cuisine"])
+        browsing = RestaurantBrowsing(database)
+        self.assertEqual([r["name"] for r in browsing.top_k_by_rating(3)], ["Sushi House", "Italian Bistro", "Sushi 4"])
+        self.assertEqual(len(browsing.search_by_cuisine("japanese")), 6)
+
+    def test_invalid_utf8(self):
+        """
+        Test that a bad byte rejects only its JSONL row, and that a CSV feed failing partway stays consistent.
+        """
+        row = {"name": "Taco Stand", "cuisine": "Mexican", "location": "Uptown", "rating": 4.0}
+        jsonl_path = os.path.join(self.directory.name, "feed.jsonl")
+        csv_path = os.path.join(self.directory.name, "feed.csv")
+        with open(jsonl_path, "wb") as f:
+            f.write(json.dumps(row).encode() + b"\n" + b'{"name": "Caf\xe9"}\n' + json.dumps(row).encode() + b"\n")
+        with open(csv_path, "wb") as f:
+            # More rows than one read buffer, so that some are loaded before the bad byte is reached
+            f.write(b"name,cuisine,location,rating\n" + b"Taco Stand,Mexican,Uptown,4.0\n" * 1000 +
+                    b"Caf\xe9,Bakery,Downtown,3.0\n")
+
+        for use_mmap in [False, True]:
+            database = RestaurantDatabase([])
+            report = database.load_feed(jsonl_path, use_mmap=use_mmap)
+            self.assertEqual((report["rows"], report["rejected"]), (2, 1))
+            self.assertEqual(report["errors"][0][0], 2)
+
+            database = RestaurantDatabase([])
+            version = database.version
+            with self.assertRaises(UnicodeDecodeError):
+                database.load_feed(csv_path, use_mmap=use_mmap)
+            self.assertEqual(database.version, version + 1)
+            self.assertGreater(len(database), 0)
+            self.assertEqual(len(RestaurantBrowsing(database).search_by_rating(1.0)), len(database))
+            database.update(0, rating=3.0)
+            self.assertEqual(len(RestaurantBrowsing(database).search_by_rating(3.5)), len(database) - 1)
+
+    def test_unknown_format(self):
+        """
+        Test that files with an unknown extension are refused.
+        """
+        with self.assertRaises(ValueError):
+            self.database.load_feed(self.write("feed.xml", "<feed/>"))
+
+
+class TestTrigramIndex(unittest.TestCase):
+    """
+    Unit tests for substring searches answered through the trigram index.
+    """
+
+    def setUp(self):
+        self.database = RestaurantDatabase(RestaurantStubbDatabase().get_restaurants())
+        self.browsing = RestaurantBrowsing(self.database)
+
+    def test_matching_buckets_keeps_substring_semantics(self):
+        """
+        Test that trigram lookups find the same keys as checking every key, for short and long needles.
+        """
+        for field in RestaurantDatabase.INDEXED_FIELDS:
+            keys = list(self.database.indexes[field])
+            for needle in ["", "a", "it", "ita", "itali", "italian bistro", "pitsa", "zzz", "n b"]:
+                expected = [self.database.indexes[field][key] for key in keys if needle in key]
+                self.assertEqual(sorted(self.database.matching_buckets(field, needle)), sorted(expected))
+
+    def test_search_by_name(self):
+        """
+        Test searching for restaurants by part of their name, with and without indexes.
+        """
+        results = self.browsing.search_by_name("PITSA")
+        self.assertEqual([r['name'] for r in results], ["Pekan pitsa", "Pirjon pitsa", "Pirjon pitsa", "Kallen pitsa"])
+        stub_browsing = RestaurantBrowsing(RestaurantStubbDatabase())
+        for name in ["pi", "irjon", "bistro", "sushi"]:
+            self.assertEqual(self.browsing.search_by_name(name), stub_browsing.search_by_name(name))
+
+
+class TestQueryPlanner(unittest.TestCase):
+    """
+    Unit tests for the selectivity-aware planner behind search_by_filters.
+    """
+
+    def setUp(self):
+        self.database = RestaurantDatabase()
+        self.browsing = RestaurantBrowsing(self.database)
+
+    def test_planner_starts_from_most_selective_index(self):
+        """
+        Test that the filter with the fewest estimated rows drives the plan.
+        """
+        plan = self.browsing.planner.plan(cuisine_type="ital", location="town", min_rating=4.7)
+        self.assertEqual(plan.driver, "rating")
+        self.assertEqual(plan.estimates, {"cuisine": 2, "location": 5, "rating": 1})
+        self.assertEqual(plan.residual, ["cuisine", "location"])
+        plan = self.browsing.planner.plan(cuisine_type="japan", min_rating=3.0)
+        self.assertEqual(plan.driver, "cuisine")
+
+    def test_planned_search_matches_scan(self):
+        """
+        Test that planned searches return exactly what the unindexed scan returns.
+        """
+        stub = RestaurantStubbDatabase()
+        stub.restaurants = self.database.get_restaurants()
+        scan_browsing = RestaurantBrowsing(stub)
+        for cuisine in [None, "ital", "a", "FOOD", "xyz"]:
+            for location in [None, "town", "Uptown", "nowhere"]:
+                for rating in [None, 0, 4.0, 4.6]:
+                    self.assertEqual(self.browsing.search_by_filters(cuisine, location, rating),
+                                     scan_browsing.search_by_filters(cuisine, location, rating))
+
+    def test_explain(self):
+        """
+        Test that explain describes the chosen plan through RestaurantSearch.
+        """
+        search = RestaurantSearch(self.browsing)
+        self.assertEqual(search.explain(cuisine="italian", rating=4.0),
+                         "index on cuisine (~2 rows), then filter rating; estimates: cuisine=2, rating=4")
+        self.assertEqual(search.explain(), "full scan (no filters)")
+        self.assertEqual(RestaurantBrowsing(RestaurantStubbDatabase()).explain_filters(cuisine_type="x"),
+                         "full scan (database has no indexes)")
+
+class TestCursorPagination(unittest.TestCase):
+    """
+    Unit tests for lazy iteration and cursor-based paging of search results.
+    """
+
+    def setUp(self):
+        rows = [{"name": f"Restaurant {i}", "cuisine": ["Italian", "Thai", "Mexican"][i % 3],
+                 "location": ["Downtown", "Uptown"][i % 2], "phonenumber": "123", "rating": (i % 5) + 1.0}
+                for i in range(50)]
+        self.browsing = RestaurantBrowsing(RestaurantDatabase(rows))
+        self.stub_browsing = RestaurantBrowsing(RestaurantStubbDatabase())
+        self.stub_browsing.database.restaurants = rows
+
+    def collect_pages(self, browsing, limit, **filters):
+        cursor = browsing.make_cursor(**filters)
+        pages = []
+        while cursor is not None:
+            results, cursor = browsing.page(cursor, limit)
+            pages.append(results)
+        return pages
+
+    def test_pages_cover_results_in_order(self):
+        """
+        Test that concatenated pages equal search_by_filters, with and without indexes.
+        """
+        for browsing in [self.browsing, self.stub_browsing]:
+            for filters in [{}, {"cuisine_type": "ital"}, {"min_rating": 4.0}, {"cuisine_type": "thai", "location": "up"}]:
+                pages = self.collect_pages(browsing, 7, **filters)
+                self.assertTrue(all(len(page) == 7 for page in pages[:-1]))
+                self.assertEqual([r for page in pages for r in page], browsing.search_by_filters(**filters))
+
+    def test_rating_driven_pages_scan_or_sort(self):
+        """
+        Test that rating-driven plans page the same whether their matches are sorted or scanned for.
+        """
+        expected = self.browsing.search_by_filters(min_rating=4.0)
+        for sort_limit in [0, 1000]:
+            with mock.patch.object(self.browsing.planner, "RATING_SORT_LIMIT", sort_limit):
+                pages = self.collect_pages(self.browsing, 7, min_rating=4.0)
+                self.assertEqual([r for page in pages for r in page], expected)
+
+    def test_page_rejects_invalid_cursor(self):
+        """
+        Test that cursors whose filters have the wrong types are refused before they reach the planner.
+        """
+        for state in ['[1,null,null,-1]', '[null,["x"],null,-1]', '[null,null,"abc",-1]', '[null,null,true,-1]',
+                      '[null,null,1e999,-1]', '[null,null,null,"5"]', '[null,null,null,true]', '[null,null,null]', '{}']:
+            cursor = base64.urlsafe_b64encode(state.encode()).decode()
+            for browsing in [self.browsing, self.stub_browsing]:
+                with self.assertRaises(ValueError):
+                    browsing.page(cursor)
+
+    def test_page_rejects_invalid_limit(self):
+        """
+        Test that a page limit below 1 is refused.
+        """
+        cursor = self.browsing.make_cursor()
+        for limit in [0, -1]:
+            with self.assertRaises(ValueError):
+                self.browsing.page(cursor, limit)
+
+    def test_iter_filters_is_lazy(self):
+        """
+        Test that iter_filters yields results one by one in database order.
+        """
+        iterator = self.browsing.iter_filters(cuisine_type="Thai")
+        self.assertEqual(next(iterator)['name'], "Restaurant 1")
+        self.assertEqual(next(iterator)['name'], "Restaurant 4")
+
+    def test_exact_final_page_has_no_next_cursor(self):
+        """
+        Test that the last page returns no continuation token, even when it is full.
+        """
+        results, cursor = self.browsing.page(self.browsing.make_cursor(), 50)
+        self.assertEqual(len(results), 50)
+        self.assertIsNone(cursor)
+
+    def test_invalid_cursor(self):
+        """
+        Test that a malformed cursor raises ValueError.
+        """
+        with self.assertRaises(ValueError):
+            self.browsing.page("not a cursor", 10)
+
+    def test_search_pages_are_cached(self):
+        """
+        Test that RestaurantSearch serves repeated first pages from its cache.
+        """
+        search = RestaurantSearch(self.browsing)
+        first = search.page(search.make_cursor(cuisine="Italian"), 5)
+        second = search.page(search.make_cursor(cuisine="italian"), 5)
+        self.assertEqual(first, second)
+        self.assertEqual(search.cache_info()["hits"], 1)
+
+
+class TestGeospatialSearch(unittest.TestCase):
+    """
+    Unit tests for radius and nearest-neighbour searches over the grid index.
+    """
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.rows = [{"name": f"Restaurant {i}", "cuisine": rng.choice(["Italian", "Thai"]), "location": "Helsinki",
+                      "phonenumber": "123", "rating": rng.choice([3.0, 4.0, 5.0]), "delivery": rng.random() < 0.5,
+                      "latitude": 60.0 + rng.uniform(0, 0.5), "longitude": 24.5 + rng.uniform(0, 1.0)}
+                     for i in range(400)]
+        self.rows.append({"name": "Nowhere", "cuisine": "Thai", "location": "Unknown", "phonenumber": "123", "rating": 5.0})
+        self.browsing = RestaurantBrowsing(RestaurantDatabase(self.rows))
+        self.stub_browsing = RestaurantBrowsing(RestaurantStubbDatabase())
+        self.stub_browsing.database.restaurants = self.rows
+
+    def test_haversine(self):
+        """
+        Test the distance formula against a known distance (Helsinki to Tampere, about 160 km).
+        """
+        self.assertAlmostEqual(haversine_km(60.1699, 24.9384, 61.4978, 23.7610), 160.0, delta=2.0)
+
+    def test_radius_search_matches_brute_force(self):
+        """
+        Test that indexed radius searches with filters equal a scan over all restaurants.
+        """
+        for radius in [0.5, 3.0, 10.0, 100.0]:
+            for filters in [{}, {"cuisine_type": "thai", "min_rating": 4.0}, {"delivery_only": True}]:
+                self.assertEqual(self.browsing.search_nearby(60.2, 25.0, radius, **filters),
+                                 self.stub_browsing.search_nearby(60.2, 25.0, radius, **filters))
+
+    def test_radius_results_are_sorted_by_distance(self):
+        """
+        Test that radius results are nearest first and all within the radius.
+        """
+        results = self.browsing.search_nearby(60.2, 25.0, 5.0)
+        distances = [haversine_km(60.2, 25.0, r['latitude'], r['longitude']) for r in results]
+        self.assertEqual(distances, sorted(distances))
+        self.assertTrue(all(distance <= 5.0 for distance in distances))
+
+    def test_nearest_matches_brute_force(self):
+        """
+        Test that k-nearest searches, also far outside the data, equal a scan.
+        """
+        for latitude, longitude in [(60.2, 25.0), (60.0, 24.5), (65.0, 30.0)]:
+            for k in [1, 5, 50]:
+                for filters in [{}, {"cuisine_type": "ital", "delivery_only": True}]:
+                    self.assertEqual(self.browsing.nearest(latitude, longitude, k, **filters),
+                                     self.stub_browsing.nearest(latitude, longitude, k, **filters))
+        self.assertEqual(len(self.browsing.nearest(60.2, 25.0, 1000)), 400)
+
+    def test_empty_grid(self):
+        """
+        Test that an empty grid answers queries with no results.
+        """
+        grid = GridIndex()
+        self.assertEqual(grid.within(60.0, 25.0, 10.0), [])
+        self.assertEqual(grid.nearest(60.0, 25.0, 3), [])
+
+
+class TestRestaurantSearchCache(unittest.TestCase):
+    """
+    Unit tests for the versioned LRU cache in RestaurantSearch.
+    """
+
+    def setUp(self):
+        self.database = RestaurantDatabase()
+        self.search = RestaurantSearch(RestaurantBrowsing(self.database), cache_size=2)
+
+    def test_repeated_search_is_a_hit(self):
+        """
+        Test that searches with the same normalized filters are served from the cache.
+        """
+        first = self.search.search_restaurants(cuisine="Italian", rating=4)
+        second = self.search.search_restaurants(cuisine="italian", rating=4.0)
+        self.assertEqual(first, second)
+        self.assertEqual(self.search.cache_info(), {"hits": 1, "misses": 1, "evictions": 0, "size": 1, "maxsize": 2})
+
+    def test_stale_entries_are_not_served(self):
+        """
+        Test that a database change invalidates cached results.
+        """
+        self.assertEqual(len(self.search.search_restaurants(cuisine="Thai")), 0)
+        self.database.add({"name": "Thai Corner", "cuisine": "Thai", "location": "Midtown",
+                           "phonenumber": "+535 000 0000", "rating": 4.1, "price_range": "$", "delivery": True})
+        self.assertEqual(len(self.search.search_restaurants(cuisine="Thai")), 1)
+        self.assertEqual(self.search.cache_info()["hits"], 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """
+        Test that the cache stays bounded and evicts the least recently used search.
+        """
+        self.search.search_restaurants(cuisine="Italian")
+        self.search.search_restaurants(cuisine="Mexican")
+        self.search.search_restaurants(cuisine="Italian")
+        self.search.search_restaurants(cuisine="Japanese")  # Evicts Mexican
+        self.search.search_restaurants(cuisine="Italian")
+        info = self.search.cache_info()
+        self.assertEqual((info["hits"], info["evictions"], info["size"]), (2, 1, 2))
+
+    def test_cached_results_can_be_modified_by_caller(self):
+        """
+        Test that callers get their own list and cannot corrupt the cache.
+        """
+        self.search.search_restaurants(cuisine="Italian").clear()
+        self.assertEqual(len(self.search.search_restaurants(cuisine="Italian")), 2)
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestColumnarRestaurantDatabase(unittest.TestCase):
+    """
+    Unit tests for the NumPy-backed columnar restaurant store.
+    """
+
+    def setUp(self):
+        self.rows = RestaurantDatabase().get_restaurants()
+        self.database = ColumnarRestaurantDatabase(self.rows)
+        self.browsing = RestaurantBrowsing(self.database)
+
+    def test_round_trip(self):
+        """
+        Test that rows come back unchanged, including ratings such as 4.2.
+        """
+        self.assertEqual(self.database.get_restaurants(), self.rows)
+        self.assertEqual(self.database.categories["cuisine"], ["Italian", "Japanese", "Fast Food", "Mexican"])
+
+    def test_rating_just_below_minimum_is_excluded(self):
+        """
+        Test that a rating just below the minimum is not rounded up to it, e.g. 4.4999999 < 4.5.
+        """
+        rows = [dict(self.rows[0], name="Below", rating=4.4999999), dict(self.rows[0], name="At", rating=4.5)]
+        database = ColumnarRestaurantDatabase(rows)
+        self.assertEqual([r["name"] for r in database.filter_restaurants(min_rating=4.5)], ["At"])
+        self.assertEqual([r["name"] for r in database.find_min_rating(4.5)], ["At"])
+        self.assertEqual(RestaurantBrowsing(database).search_by_filters(min_rating=4.5),
+                         RestaurantBrowsing(RestaurantDatabase(rows)).search_by_filters(min_rating=4.5))
+        self.assertEqual(database.get_restaurants()[0]["rating"], 4.4999999)
+
+    def test_vectorized_filters_match_row_store(self):
+        """
+        Test that searches give the same results as the list-of-dicts database.
+        """
+        row_browsing = RestaurantBrowsing(RestaurantDatabase(self.rows))
+        for cuisine in [None, "ital", "FOOD", "xyz"]:
+            for location in [None, "town", "Uptown"]:
+                for rating in [None, 4.0, 4.2]:
+                    self.assertEqual(self.browsing.search_by_filters(cuisine, location, rating),
+                                     row_browsing.search_by_filters(cuisine, location, rating))
+        self.assertEqual(self.browsing.search_by_cuisine("italian"), row_browsing.search_by_cuisine("italian"))
+        self.assertEqual(self.browsing.search_by_rating(4.2), row_browsing.search_by_rating(4.2))
+
 if __name__ == '__main__':
     unittest.main()
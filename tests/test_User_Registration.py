@@ -3,7 +3,11 @@ from unittest import mock
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from User_Registration import UserRegistration
+from User_Registration import UserRegistration, BloomFilter
+from Password_Hashing import PasswordHasher
+from User_Storage import SQLiteUserStore
+import shutil
+import tempfile
 
 import re
 
@@ -109,5 +113,184 @@ class TestUserRegistration(unittest.TestCase):
         self.assertFalse(result['success'])  # Ensures registration fails due to the email already being registered.
         self.assertEqual(result['error'], "Email already registered")  # Checks the specific error message.
 
+
+class TestRegisterMany(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up a real UserRegistration with cheap password hashing.
+        """
+        self.registration = UserRegistration(hasher=PasswordHasher(scrypt_n=2 ** 8, max_workers=0))
+        self.registration.users = {"old@example.com": {"password": "Password123", "confirmed": True}}
+
+    def test_per_row_results(self):
+        """
+        Test case for a bulk import with invalid rows and duplicates in the store, in the same chunk and in an earlier chunk.
+        """
+        records = [
+            {"email": "a@example.com", "password": "Password123"},
+            {"email": "not-an-email", "password": "Password123"},
+            {"email": "b@example.com", "password": "Password123", "confirm_password": "Password124"},
+            {"email": "c@example.com", "password": "weak"},
+            {"email": "old@example.com", "password": "Password123"},
+            {"email": "a@example.com", "password": "Password123"},
+            {"email": "d@example.com", "password": "Password123"},
+            {"email": "a@example.com", "password": "Password123"},
+        ]
+        results = self.registration.register_many(iter(records), chunk_size=3)
+        self.assertEqual([result.get("error") for result in results], [
+            None, "Invalid email format", "Passwords do not match", "Password is not strong enough",
+            "Email already registered", "Email already registered", None, "Email already registered",
+        ])
+        self.assertEqual(sorted(self.registration.users), ["a@example.com", "d@example.com", "old@example.com"])
+        self.assertTrue(self.registration.login("d@example.com", "Password123")["success"])
+        self.assertFalse(self.registration.users["a@example.com"]["confirmed"])
+
+    def test_malformed_rows(self):
+        """
+        Test case checking that rows without a string email and password are rejected one by one.
+        """
+        records = [
+            {"email": "a@example.com", "password": "Password123"},
+            {"email": "b@example.com"},
+            {"password": "Password123"},
+            {"email": None, "password": "Password123"},
+            {"email": "c@example.com", "password": 12345678},
+            ["d@example.com", "Password123"],
+            {"email": "e@example.com", "password": "Password123"},
+        ]
+        results = self.registration.register_many(records, chunk_size=3)
+        self.assertEqual([result.get("error") for result in results],
+                         [None] + ["Email and password are required"] * 5 + [None])
+        self.assertEqual(sorted(self.registration.users), ["a@example.com", "e@example.com", "old@example.com"])
+
+    def test_commits_chunks_to_store(self):
+        """
+        Test case checking that each chunk is added to a store with add_many in one go.
+        """
+        store = mock.MagicMock()
+        store.__contains__.return_value = False
+        store.add_many.return_value = []
+        self.registration.users = store
+        records = ({"email": f"user{i}@example.com", "password": "Password123"} for i in range(5))
+        self.assertTrue(all(result["success"] for result in self.registration.register_many(records, chunk_size=2)))
+        self.assertEqual([len(list(call.args[0])) for call in store.add_many.call_args_list], [2, 2, 1])
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_no_false_negatives_and_few_false_positives(self):
+        """
+        Test case checking that every added item is found and that the false positive rate stays near its target.
+        """
+        bloom = BloomFilter(10000, false_positive_rate=0.01)
+        for i in range(10000):
+            bloom.add(f"user{i}@example.com")
+        self.assertTrue(all(f"user{i}@example.com" in bloom for i in range(10000)))
+        false_positives = sum(f"other{i}@example.com" in bloom for i in range(10000))
+        self.assertLess(false_positives, 200)
+        info = bloom.info()
+        self.assertEqual(info["items"], 10000)
+        self.assertLess(info["memory_bytes"], 10000 * 2)  # About 1.2 bytes per item at 1%
+        self.assertAlmostEqual(info["expected_false_positive_rate"], 0.01, delta=0.002)
+
+
+class TestDuplicateCheck(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up a registration whose store counts the lookups made in it.
+        """
+        self.registration = UserRegistration(hasher=PasswordHasher(scrypt_n=2 ** 8, max_workers=0))
+        self.lookups = []
+        registration = self
+
+        class CountingStore(dict):
+            def __contains__(self, email):
+                registration.lookups.append(email)
+                return super().__contains__(email)
+
+        self.registration.users = CountingStore({"old@example.com": {"password": "Password123", "confirmed": True}})
+
+    def test_new_emails_skip_the_store(self):
+        """
+        Test case checking that only probable duplicates are looked up in the store.
+        """
+        self.assertTrue(self.registration.register("new@example.com", "Password123", "Password123")["success"])
+        self.assertEqual(self.registration.register("old@example.com", "Password123", "Password123")["error"],
+                         "Email already registered")
+        self.assertEqual(self.registration.register("new@example.com", "Password123", "Password123")["error"],
+                         "Email already registered")
+        self.assertEqual(self.lookups, ["old@example.com", "new@example.com"])
+        info = self.registration.filter_info()
+        self.assertEqual((info["store_lookups"], info["lookups_avoided"], info["false_positives"]), (2, 2, 0))
+        self.assertEqual(info["observed_false_positive_rate"], 0.0)
+
+    def test_filter_is_rebuilt(self):
+        """
+        Test case checking that the filter follows replaced users and grows when it fills up.
+        """
+        self.registration.users = {"other@example.com": {"password": "Password123"}}
+        self.assertTrue(self.registration.is_registered("other@example.com"))
+        self.assertFalse(self.registration.is_registered("old@example.com"))
+        capacity = self.registration.email_filter.capacity
+        records = ({"email": f"user{i}@example.com", "password": "Password123"} for i in range(capacity + 1))
+        self.registration.register_many(records)
+        self.assertGreater(self.registration.email_filter.capacity, capacity)
+        self.assertTrue(all(self.registration.is_registered(f"user{i}@example.com") for i in range(capacity + 1)))
+
+class TestSharedStore(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up two registrations on one users database, like the HTTP server and the desktop app.
+        """
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, "users.db")
+        self.stores = [SQLiteUserStore(path), SQLiteUserStore(path)]
+        hasher = PasswordHasher(scrypt_n=2 ** 8, max_workers=0)
+        self.first, self.second = UserRegistration(hasher=hasher), UserRegistration(hasher=hasher)
+        self.first.users, self.second.users = self.stores
+
+    def tearDown(self):
+        for store in self.stores:
+            store.close()
+        shutil.rmtree(self.directory)
+
+    def test_other_instance_cannot_take_over_account(self):
+        """
+        Test case for an email registered by another instance: it must be refused, not overwrite the account.
+        """
+        self.assertTrue(self.first.register("victim@example.com", "Password123", "Password123")["success"])
+        self.assertEqual(self.second.register("victim@example.com", "Attacker123", "Attacker123")["error"],
+                         "Email already registered")
+        self.assertEqual(self.second.register_many([{"email": "victim@example.com", "password": "Attacker123"}])[0]["error"],
+                         "Email already registered")
+        self.assertTrue(self.first.login("victim@example.com", "Password123")["success"])
+
+    def test_final_insert_is_authoritative(self):
+        """
+        Test case for a race where another instance registers the email after this one checked it.
+        """
+        self.assertTrue(self.first.register("victim@example.com", "Password123", "Password123")["success"])
+        with mock.patch.object(self.second, "is_registered", return_value=False):
+            self.assertEqual(self.second.register("victim@example.com", "Attacker123", "Attacker123")["error"],
+                             "Email already registered")
+            self.assertEqual(self.second.register_many([{"email": "victim@example.com", "password": "Attacker123"}])[0]["error"],
+                             "Email already registered")
+        self.assertTrue(self.second.login("victim@example.com", "Password123")["success"])
+
+    def test_stale_filter_miss_is_refused_by_insert(self):
+        """
+        Test case for the filter in front of a shared store: new emails skip the store, and an email the other
+        instance registered is still refused when the user is committed.
+        """
+        self.assertTrue(self.first.register("victim@example.com", "Password123", "Password123")["success"])
+        self.assertFalse(self.second.is_registered("victim@example.com"))  # Not in the second instance's filter
+        self.assertEqual(self.second.filter_info()["lookups_avoided"], 1)
+        self.assertEqual(self.second.register("victim@example.com", "Attacker123", "Attacker123")["error"],
+                         "Email already registered")
+        self.assertTrue(self.second.register("new@example.com", "Password123", "Password123")["success"])
+        self.assertTrue(self.first.login("new@example.com", "Password123")["success"])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,423 @@
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from User_Storage import JournaledUserStore, SQLiteUserStore, UsersFileWriter, UserRecord, UserExistsError, fcntl
+from User_Registration import UserRegistration
+
+class TestUserRecord(unittest.TestCase):
+    def test_looks_like_the_user_dict(self):
+        record = UserRecord("hash")
+        self.assertEqual(record["password"], "hash")
+        self.assertFalse(record["confirmed"])
+        self.assertIsNone(record.get("name"))
+        self.assertEqual(record, {"password": "hash", "confirmed": False})
+        self.assertEqual({**record, "confirmed": True}, {"password": "hash", "confirmed": True})
+        self.assertEqual(json.loads(json.dumps(dict(record))), {"password": "hash", "confirmed": False})
+
+    def test_extra_fields_and_replace(self):
+        record = UserRecord.from_mapping({"password": "hash", "name": "Bob"})
+        self.assertEqual(dict(record), {"password": "hash", "confirmed": False, "name": "Bob"})
+        confirmed = record.replace(confirmed=True)
+        self.assertTrue(confirmed["confirmed"])
+        self.assertFalse(record["confirmed"])
+        self.assertIs(UserRecord.from_mapping(confirmed), confirmed)
+        self.assertEqual(pickle.loads(pickle.dumps(confirmed)), confirmed)
+
+    def test_compact_and_immutable(self):
+        record = UserRecord("hash")
+        self.assertFalse(hasattr(record, "__dict__"))
+        self.assertLess(sys.getsizeof(record), sys.getsizeof({"password": "hash", "confirmed": False}) / 2)
+        with self.assertRaises(AttributeError):
+            record.confirmed = True
+
+
+class TestJournaledUserStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "users.json")
+        self.stores = []
+
+    def tearDown(self):
+        for store in self.stores:
+            store.close()
+        shutil.rmtree(self.directory)
+
+    def open_store(self, **options):
+        store = JournaledUserStore(self.path, **options)
+        self.stores.append(store)
+        return store
+
+    def journal_lines(self):
+        with open(self.path + ".journal") as f:
+            return f.readlines()
+
+    def test_users_are_records(self):
+        with open(self.path, "w") as f:
+            json.dump({"old@example.com": {"password": "Password1", "confirmed": False}}, f)
+        store = self.open_store()
+        store["new@example.com"] = {"password": "Password2", "confirmed": False}
+        store.update_user("new@example.com", confirmed=True)
+        self.assertIsInstance(store["old@example.com"], UserRecord)
+        self.assertIsInstance(store["new@example.com"], UserRecord)
+        store.compact()
+        with open(self.path) as f:
+            self.assertEqual(json.load(f)["new@example.com"], {"password": "Password2", "confirmed": True})
+
+    def test_changes_survive_reload(self):
+        store = self.open_store()
+        store["a@example.com"] = {"password": "Password1", "confirmed": False}
+        store["b@example.com"] = {"password": "Password2", "confirmed": False}
+        store.update_user("a@example.com", confirmed=True)
+        del store["b@example.com"]
+        self.assertEqual(len(self.journal_lines()), 4)
+        self.assertFalse(os.path.exists(self.path))  # No snapshot is written per change
+
+        reloaded = self.open_store()
+        self.assertEqual(dict(reloaded), {"a@example.com": {"password": "Password1", "confirmed": True}})
+        self.assertEqual(reloaded.journal_records, 4)
+
+    def test_reads_existing_users_json(self):
+        with open(self.path, "w") as f:
+            json.dump({"old@example.com": {"password": "Password1", "confirmed": False}}, f, indent=4)
+        store = self.open_store()
+        self.assertIn("old@example.com", store)
+        store["new@example.com"] = {"password": "Password2", "confirmed": False}
+        self.assertEqual(sorted(self.open_store()), ["new@example.com", "old@example.com"])
+
+    def test_torn_record_is_dropped_and_cut_off(self):
+        store = self.open_store()
+        store["a@example.com"] = {"password": "Password1"}
+        store.close()
+        with open(self.path + ".journal", "a") as f:
+            f.write('{"op":"set","email":"torn@exa')  # Crash in the middle of a write
+
+        store = self.open_store()
+        self.assertEqual(list(store), ["a@example.com"])
+        store["b@example.com"] = {"password": "Password2"}
+        self.assertEqual(sorted(self.open_store()), ["a@example.com", "b@example.com"])
+
+    def test_compaction_writes_snapshot_and_empties_journal(self):
+        store = self.open_store()
+        for i in range(10):
+            store[f"user{i}@example.com"] = {"password": f"Password{i}"}
+        store.compact()
+        with open(self.path) as f:
+            self.assertEqual(len(json.load(f)), 10)
+        self.assertFalse(os.path.exists(self.path + ".journal"))
+        self.assertEqual(store.journal_records, 0)
+        store["late@example.com"] = {"password": "Password"}
+        self.assertEqual(len(self.journal_lines()), 1)
+        self.assertEqual(len(self.open_store()), 11)
+
+    def test_background_compaction(self):
+        store = self.open_store(compact_after=50)
+        for i in range(120):
+            store[f"user{i}@example.com"] = {"password": f"Password{i}"}
+        deadline = time.monotonic() + 5
+        while not os.path.exists(self.path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        store.close()
+        self.assertLess(store.journal_records, 120)
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(len(self.open_store()), 120)
+
+    @unittest.skipIf(fcntl is None, "advisory file locks are not available")
+    def test_compaction_takes_write_lock(self):
+        store = self.open_store()
+        store["a@example.com"] = {"password": "Password1"}
+        with open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)  # As a UsersFileWriter in another process would
+            compaction = threading.Thread(target=store.compact)
+            compaction.start()
+            compaction.join(0.2)
+            self.assertTrue(compaction.is_alive())
+            self.assertFalse(os.path.exists(self.path))
+        compaction.join()
+        with open(self.path) as f:
+            self.assertEqual(list(json.load(f)), ["a@example.com"])
+
+    def test_unfinished_compaction_is_recovered(self):
+        store = self.open_store()
+        store["a@example.com"] = {"password": "Password1"}
+        store.close()
+        os.replace(self.path + ".journal", self.path + ".journal.old")  # Crash before the snapshot
+        store = self.open_store()
+        store["b@example.com"] = {"password": "Password2"}
+        self.assertEqual(sorted(self.open_store()), ["a@example.com", "b@example.com"])
+        store.compact()
+        self.assertFalse(os.path.exists(self.path + ".journal.old"))
+        self.assertEqual(sorted(self.open_store()), ["a@example.com", "b@example.com"])
+
+    def test_add_never_replaces(self):
+        store = self.open_store()
+        store.add_user("a@example.com", {"password": "Password1"})
+        with self.assertRaises(UserExistsError):
+            store.add_user("a@example.com", {"password": "Password2"})
+        self.assertEqual(store.add_many([("a@example.com", {"password": "Password3"}), ("b@example.com", {"password": "Password4"}),
+                                         ("b@example.com", {"password": "Password5"})]), ["a@example.com", "b@example.com"])
+        reloaded = self.open_store()
+        self.assertEqual((reloaded["a@example.com"]["password"], reloaded["b@example.com"]["password"]), ("Password1", "Password4"))
+
+    def test_set_many(self):
+        for policy in ["always", "group", "interval"]:
+            path = os.path.join(self.directory, f"{policy}.json")
+            with JournaledUserStore(path, fsync=policy) as store:
+                store.set_many((f"user{i}@example.com", {"password": f"Password{i}"}) for i in range(100))
+            with JournaledUserStore(path) as store:
+                self.assertEqual(len(store), 100)
+                self.assertEqual(store.journal_records, 100)
+
+    def test_buffered_records_are_not_counted_as_written(self):
+        store = self.open_store(fsync="group")
+        store["a@example.com"] = {"password": "Password1"}
+        written = []
+
+        def users():
+            yield "b@example.com", {"password": "Password2"}
+            written.append(store._written)  # b is still in the buffer, so a concurrent sync must not cover it
+            yield "c@example.com", {"password": "Password3"}
+
+        store.set_many(users())
+        self.assertEqual(written, [1])
+        self.assertEqual(store._written, 3)
+        self.assertEqual(len(self.journal_lines()), 3)
+
+    def test_fsync_policies(self):
+        for policy in ["always", "group", "interval"]:
+            path = os.path.join(self.directory, f"{policy}.json")
+            with JournaledUserStore(path, fsync=policy, fsync_interval_s=0.01) as store:
+                store["a@example.com"] = {"password": "Password1"}
+            self.assertIn("a@example.com", JournaledUserStore(path))
+        with self.assertRaises(ValueError):
+            JournaledUserStore(self.path, fsync="never")
+
+    def test_group_commit_with_concurrent_writers(self):
+        store = self.open_store(fsync="group")
+
+        def register(start):
+            for i in range(start, start + 100):
+                store[f"user{i}@example.com"] = {"password": f"Password{i}"}
+
+        threads = [threading.Thread(target=register, args=(n * 100,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.journal_lines()), 800)
+        self.assertEqual(len(self.open_store()), 800)
+
+    def test_registration_is_journaled(self):
+        registration = UserRegistration()
+        registration.users = self.open_store()
+        registration.register("user@example.com", "Password123", "Password123")
+        self.assertEqual(registration.register("user@example.com", "Password123", "Password123")["error"],
+                         "Email already registered")
+        self.assertTrue(registration.hasher.verify("Password123", self.open_store()["user@example.com"]["password"]))
+
+class TestUsersFileWriter(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "users.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def test_burst_is_coalesced(self):
+        users = {}
+        lock = threading.Lock()
+        with UsersFileWriter(self.path, coalesce_window_s=0.01, max_writes_per_s=100) as writer:
+            def register(start):
+                for i in range(start, start + 25):
+                    with lock:
+                        users[f"user{i}@example.com"] = {"password": f"Password{i}", "confirmed": False}
+                    writer.save(users)  # Returns once the users are on disk
+
+            threads = [threading.Thread(target=register, args=(n * 25,)) for n in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(len(self.read()), 200)
+            self.assertLess(writer.writes, 200)
+        self.assertEqual(sorted(os.listdir(self.directory)), ["users.json", "users.json.lock"])  # No temporary files left
+
+    def test_writes_per_second_are_capped(self):
+        with UsersFileWriter(self.path, coalesce_window_s=0, max_writes_per_s=5) as writer:
+            deadline = time.monotonic() + 1
+            i = 0
+            while time.monotonic() < deadline:
+                writer.save({f"user{i}@example.com": {"password": "Password1"}}, wait=False)
+                i += 1
+                time.sleep(0.001)
+            writer.flush()
+            self.assertLessEqual(writer.writes, 7)
+            self.assertIn(f"user{i - 1}@example.com", self.read())
+
+    def test_instances_keep_each_others_users(self):
+        with UsersFileWriter(self.path) as first, UsersFileWriter(self.path) as second:
+            first.save({"a@example.com": {"password": "Password1"}})
+            second.save({"b@example.com": {"password": "Password2"}})
+            first.save({"a@example.com": {"password": "Password3"}})
+        self.assertEqual(self.read(), {"a@example.com": {"password": "Password3"}, "b@example.com": {"password": "Password2"}})
+
+    def test_deleted_users_stay_deleted(self):
+        with UsersFileWriter(self.path, coalesce_window_s=0) as writer, UsersFileWriter(self.path) as other:
+            writer.save({"a@example.com": {"password": "Password1"}, "b@example.com": {"password": "Password2"}})
+            other.save({"c@example.com": {"password": "Password3"}})
+            writer.save({"a@example.com": {"password": "Password1"}})
+        self.assertEqual(sorted(self.read()), ["a@example.com", "c@example.com"])
+
+    def test_user_deleted_before_first_save(self):
+        import Food_Delivery_Service
+        with open(self.path, "w") as f:
+            json.dump({"a@example.com": {"password": "Password1"}, "b@example.com": {"password": "Password2"}}, f)
+        with open(self.path) as f:
+            users = json.load(f)
+        del users["a@example.com"]
+        with mock.patch.object(Food_Delivery_Service, "USERS_FILE", self.path), \
+                mock.patch.object(Food_Delivery_Service, "_users_writers", {}):
+            Food_Delivery_Service.save_users(users)
+        self.assertEqual(list(self.read()), ["b@example.com"])
+
+    def test_worker_survives_any_error(self):
+        with UsersFileWriter(self.path, coalesce_window_s=0) as writer:
+            with self.assertRaises(TypeError):
+                writer.save({"a@example.com": {"password": object()}})
+            writer.save({"b@example.com": {"password": "Password2"}})  # Would hang if the thread had died
+        self.assertEqual(list(self.read()), ["b@example.com"])
+
+    def test_users_are_copied_by_save(self):
+        users = {"a@example.com": {"password": "Password1"}}
+        with UsersFileWriter(self.path) as writer:
+            writer.save(users, wait=False)
+            users["b@example.com"] = {"password": "Password2"}  # After save() returned
+        self.assertEqual(list(self.read()), ["a@example.com"])
+
+    def test_failed_write_is_reported(self):
+        writer = UsersFileWriter(os.path.join(self.directory, "missing", "users.json"), coalesce_window_s=0)
+        with self.assertRaises(OSError):
+            writer.save({"a@example.com": {"password": "Password1"}})
+        writer.close()
+        with self.assertRaises(ValueError):
+            writer.save({})
+
+    def test_save_users(self):
+        import Food_Delivery_Service
+        with mock.patch.object(Food_Delivery_Service, "USERS_FILE", self.path):
+            Food_Delivery_Service.save_users({"a@example.com": {"password": "Password1", "confirmed": False}})
+        self.assertEqual(list(self.read()), ["a@example.com"])
+
+
+class TestSQLiteUserStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "users.db")
+        self.json_path = os.path.join(self.directory, "users.json")
+        self.stores = []
+
+    def tearDown(self):
+        for store in self.stores:
+            store.close()
+        shutil.rmtree(self.directory)
+
+    def open_store(self, **options):
+        store = SQLiteUserStore(self.path, **options)
+        self.stores.append(store)
+        return store
+
+    def test_mapping_interface(self):
+        store = self.open_store()
+        store["a@example.com"] = {"password": "Password1", "confirmed": False}
+        store["b@example.com"] = {"password": "Password2", "confirmed": True, "name": "Bob"}
+        self.assertEqual(store["b@example.com"], {"password": "Password2", "confirmed": True, "name": "Bob"})
+        self.assertIn("a@example.com", store)
+        self.assertIsNone(store.get("c@example.com"))
+        self.assertEqual(len(store), 2)
+        store.update_user("a@example.com", confirmed=True)
+        del store["b@example.com"]
+        with self.assertRaises(KeyError):
+            del store["b@example.com"]
+        with self.assertRaises(KeyError):
+            store.update_user("b@example.com", confirmed=True)
+        self.assertEqual(dict(self.open_store()), {"a@example.com": {"password": "Password1", "confirmed": True}})
+
+    def test_add_never_replaces(self):
+        first, second = self.open_store(), self.open_store()  # Like two processes on one database
+        first.add_user("a@example.com", {"password": "Password1"})
+        with self.assertRaises(UserExistsError):
+            second.add_user("a@example.com", {"password": "Password2"})
+        self.assertEqual(second.add_many([("a@example.com", {"password": "Password3"}), ("b@example.com", {"password": "Password4"})]),
+                         ["a@example.com"])
+        self.assertEqual((first["a@example.com"]["password"], first["b@example.com"]["password"]), ("Password1", "Password4"))
+
+    def test_set_many(self):
+        store = self.open_store()
+        store.set_many((f"user{i}@example.com", {"password": f"Password{i}", "confirmed": False}) for i in range(100))
+        self.assertEqual(len(self.open_store()), 100)
+        with self.assertRaises(KeyError):
+            store.set_many([("a@example.com", {"password": "Password1"}), ("b@example.com", {})])
+        self.assertNotIn("a@example.com", store)  # Rolled back as a whole
+
+    def test_iterates_in_batches(self):
+        store = self.open_store()
+        emails = [f"user{i:04}@example.com" for i in range(2500)]
+        for email in emails:
+            store[email] = {"password": "Password1"}
+        self.assertEqual(list(store), emails)
+
+    def test_wal_mode(self):
+        store = self.open_store()
+        self.assertEqual(store._db.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        with self.assertRaises(ValueError):
+            SQLiteUserStore(self.path, synchronous="SOMETIMES")
+
+    def test_migrates_json_and_journal_once(self):
+        with open(self.json_path, "w") as f:
+            json.dump({"old@example.com": {"password": "Password1", "confirmed": True}}, f, indent=4)
+        with JournaledUserStore(self.json_path) as journaled:
+            journaled["new@example.com"] = {"password": "Password2", "confirmed": False}
+
+        store = self.open_store(migrate_from=self.json_path)
+        self.assertEqual(sorted(store), ["new@example.com", "old@example.com"])
+        self.assertTrue(store["old@example.com"]["confirmed"])
+        del store["old@example.com"]
+        self.assertEqual(list(self.open_store(migrate_from=self.json_path)), ["new@example.com"])
+
+    def test_registration_uses_store(self):
+        registration = UserRegistration()
+        registration.users = self.open_store()
+        self.assertTrue(registration.register("user@example.com", "Password123", "Password123")["success"])
+        self.assertEqual(registration.register("user@example.com", "Password123", "Password123")["error"],
+                         "Email already registered")
+        self.assertTrue(registration.hasher.verify("Password123", self.open_store()["user@example.com"]["password"]))
+
+    def test_concurrent_writers(self):
+        store = self.open_store(synchronous="NORMAL")
+
+        def register(start):
+            for i in range(start, start + 100):
+                store[f"user{i}@example.com"] = {"password": f"Password{i}"}
+
+        threads = [threading.Thread(target=register, args=(n * 100,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.open_store()), 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,13 +1,17 @@
 import unittest
 from unittest import mock
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 from tkinter import ttk
 import sys
 import os
+import subprocess
+import threading
+import time
+import tempfile
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from main import Application, StartupFrame, RegisterFrame, LoginFrame, MainAppFrame, AddItemPopup, CartViewPopup, CheckoutPopup
+from main import load_catalog, load_registration, Application, StartupFrame, RegisterFrame, LoginFrame, MainAppFrame, AddItemPopup, CartViewPopup, CheckoutPopup, CheckoutWorker, ResultsModel, SearchWorker, VirtualResultsView
 from Order_Placement import OrderPlacement, Cart, UserProfile, RestaurantMenu, CartItem, PaymentMethod
 from Payment_Processing import PaymentProcessing
 from Restaurant_Browsing import RestaurantBrowsing, RestaurantDatabase, RestaurantSearch
@@ -41,6 +45,21 @@ class TestMain(unittest.TestCase):
         self.assertListEqual(list(actual_columns), list(expected_columns))
     
 
+    def test_navigation_reuses_frames(self):
+        """Test that screens are built once and reset when they are shown again."""
+        login_frame = self.app.frames[LoginFrame]
+        login_frame.email_entry.insert(0, "someone@example.com")
+        self.app.show_startup_frame()
+        self.app.show_login_frame()
+        self.assertIs(self.app.current_frame, login_frame)
+        self.assertEqual(login_frame.email_entry.get(), "")
+
+        self.main_frame.cart.add_item("Pizza", 12.99, 1)
+        self.app.login_user("other@example.com")
+        self.assertIs(self.app.current_frame, self.main_frame)
+        self.assertEqual(self.main_frame.user_email, "other@example.com")
+        self.assertEqual(self.main_frame.cart.items, [])
+
     def test_remove_item_existing(self):
         """Test that removing an existing item from the cart works correctly."""
         # Add an item to the cart
@@ -62,60 +81,428 @@ class TestMain(unittest.TestCase):
         self.assertEqual(len(self.cart.items), 0)
 
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 from tkinter import ttk
 from main import MainAppFrame, Application
 
+class TestCartViewPopup(unittest.TestCase):
+    def setUp(self):
+        self.app = Application()
+        self.app.login_user("testuser@example.com")
+        self.cart = Cart()
+        for i in range(300):
+            self.cart.add_item(f"Item {i}", 10.0, 1)
+        self.popup = CartViewPopup(self.app.current_frame, self.cart)
+
+    def tearDown(self):
+        self.app.destroy()
+
+    def test_one_row_per_item(self):
+        self.assertEqual(len(self.popup.rows), 300)
+        self.assertEqual(self.popup.rows["Item 7"][1].cget("text"), "Item 7 x1 = $10.00")
+
+    def test_quantity_change_updates_row_in_place(self):
+        row = self.popup.rows["Item 3"]
+        self.cart.update_item_quantity("Item 3", 4)
+        self.popup.refresh()
+        self.assertIs(self.popup.rows["Item 3"], row)
+        self.assertEqual(row[1].cget("text"), "Item 3 x4 = $40.00")
+
+    def test_remove_item_drops_only_its_row(self):
+        other_row = self.popup.rows["Item 1"]
+        self.popup.remove_item("Item 0")
+        self.assertNotIn("Item 0", self.popup.rows)
+        self.assertNotIn("Item 0", [item.name for item in self.cart.items])
+        self.assertIs(self.popup.rows["Item 1"], other_row)
+        self.assertTrue(self.popup.winfo_exists())  # The popup stays open
+
+    def test_empty_cart(self):
+        self.cart.items = []
+        self.popup.refresh()
+        self.assertEqual(self.popup.rows, {})
+        self.assertTrue(self.popup.empty_label.winfo_ismapped() or self.popup.empty_label.winfo_manager() == "pack")
+
+
 class TestSortByRating(unittest.TestCase):
     def setUp(self):
         self.app = Application()
         self.app.login_user("testuser@example.com")
         self.main_frame = self.app.current_frame
         self.main_frame.sort_ascending = True  # Asetetaan oletusjärjestys nousevaksi
-        self.results_tree = self.main_frame.results_tree
-        self.results_tree.get_children = MagicMock()
-        self.results_tree.item = MagicMock()
-        self.results_tree.move = MagicMock()
+        self.results_view = self.main_frame.results_view
+        # Simuloidaan hakutuloksia
+        self.results_view.set_rows([
+            {"name": "Pizza Place", "cuisine": "Pizza", "location": "NYC", "phonenumber": "123-456", "rating": 3.5},
+            {"name": "Burger Joint", "cuisine": "Burger", "location": "LA", "phonenumber": "987-654", "rating": 4.5},
+            {"name": "Salad Bar", "cuisine": "Salad", "location": "SF", "phonenumber": "555-111", "rating": 2.0},
+        ])
 
     def test_sort_by_rating_ascending(self):
-    # Simuloidaan Treeviewin tietoja
-        self.results_tree.get_children.return_value = ["id1", "id2", "id3"]
-        self.results_tree.item.side_effect = lambda x, option: {
-            "id1": ("Pizza", "NYC", "123-456", "3.5"),
-            "id2": ("Burger", "LA", "987-654", "4.5"),
-            "id3": ("Salad", "SF", "555-111", "2.0"),
-        }[x]
-        
         # Kutsutaan testattavaa metodia
         self.main_frame.sort_by_rating()
 
-        print("Sort ascending:", self.main_frame.sort_ascending)
-        print("Move calls:", self.results_tree.move.mock_calls)
-        
         # Tarkistetaan, että arvot järjestetään oikein nousevasti
-        self.results_tree.move.assert_any_call("id2", "", 0)
-        self.results_tree.move.assert_any_call("id1", "", 1)
-        self.results_tree.move.assert_any_call("id3", "", 2)
+        self.assertEqual([r["cuisine"] for r in self.results_view.rows], ["Burger", "Pizza", "Salad"])
         self.assertFalse(self.main_frame.sort_ascending)  # Tarkistetaan, että suunta vaihtui
 
     
     def test_sort_by_rating_descending(self):
         self.main_frame.sort_ascending = False  # Vaihdetaan järjestys laskevaksi
-        self.results_tree.get_children.return_value = ["id1", "id2", "id3"]
-        self.results_tree.item.side_effect = lambda x, option: {
-            "id1": ("Pizza", "NYC", "123-456", "3.5"),
-            "id2": ("Burger", "LA", "987-654", "4.5"),
-            "id3": ("Salad", "SF", "555-111", "2.0"),
-        }[x]
         
         # Kutsutaan testattavaa metodia
         self.main_frame.sort_by_rating()
         
         # Tarkistetaan, että arvot järjestetään oikein laskevasti
-        self.results_tree.move.assert_any_call("id3", "", 0)
-        self.results_tree.move.assert_any_call("id1", "", 1)
-        self.results_tree.move.assert_any_call("id2", "", 2)
+        self.assertEqual([r["cuisine"] for r in self.results_view.rows], ["Salad", "Pizza", "Burger"])
         self.assertTrue(self.main_frame.sort_ascending)  # Tarkistetaan, että suunta vaihtui takaisin
 
+
+class FakeTree:
+    """Stand-in for ttk.Treeview that records its items, so the view can be tested without a display."""
+
+    def __init__(self):
+        self.values = {}
+        self.inserted = 0
+        self.top = 0.0
+
+    def configure(self, **options):
+        pass
+
+    def bind(self, sequence, callback):
+        pass
+
+    def insert(self, parent, index, values):
+        self.inserted += 1
+        iid = f"I{self.inserted}"
+        self.values[iid] = values
+        return iid
+
+    def item(self, iid, values):
+        self.values[iid] = values
+
+    def delete(self, *iids):
+        for iid in iids:
+            del self.values[iid]
+
+    def yview_moveto(self, fraction):
+        self.top = fraction
+
+
+class TestVirtualResultsView(unittest.TestCase):
+    def setUp(self):
+        self.rows = [{"cuisine": f"Cuisine {i}", "rating": i % 5} for i in range(10000)]
+        self.tree = FakeTree()
+        self.scrollbar = MagicMock()
+        self.view = VirtualResultsView(self.tree, self.scrollbar, ("cuisine", "rating"), visible_rows=10, buffer_rows=20)
+
+    def test_only_pool_rows_are_created(self):
+        self.view.set_rows(self.rows)
+        self.assertEqual(len(self.tree.values), 30)
+        self.view.scroll_to(5000)
+        self.assertEqual(len(self.tree.values), 30)
+        self.assertEqual(self.tree.inserted, 30)  # Items are recycled, not recreated
+        self.assertEqual(self.view.visible()[0]["cuisine"], "Cuisine 5000")
+        self.assertIn(("Cuisine 5000", 0), self.tree.values.values())
+        self.scrollbar.set.assert_called_with(0.5, 0.501)
+
+    def test_small_scroll_reuses_pool(self):
+        self.view.set_rows(self.rows)
+        self.view.yview("scroll", 5, "units")
+        self.assertEqual(self.view.first, 0)
+        self.assertEqual(self.tree.top, 5 / 30)
+        self.view.yview("scroll", 2, "pages")
+        self.assertEqual(self.view.offset, 25)
+        self.assertEqual(self.view.first, 15)
+
+    def test_scroll_is_clamped(self):
+        self.view.set_rows(self.rows)
+        self.view.yview("moveto", "1.0")
+        self.assertEqual(self.view.offset, 9990)
+        self.view.scroll_to(-5)
+        self.assertEqual(self.view.offset, 0)
+
+    def test_short_result_set(self):
+        self.view.set_rows(self.rows[:3])
+        self.assertEqual(len(self.tree.values), 3)
+        self.view.set_rows([])
+        self.assertEqual(self.tree.values, {})
+        self.scrollbar.set.assert_called_with(0.0, 1.0)
+
+    def test_cursor_pages_are_fetched_lazily(self):
+        search = RestaurantSearch(RestaurantBrowsing(RestaurantDatabase(
+            [{"name": f"R{i}", "cuisine": "Pizza", "location": "Helsinki", "rating": 4.0} for i in range(500)])))
+        view = VirtualResultsView(self.tree, self.scrollbar, ("name",), fetch_page=search.page,
+                                  visible_rows=10, buffer_rows=20, page_size=50)
+        view.set_cursor(search.make_cursor())
+        self.assertEqual(len(view.rows), 50)
+        view.scroll_to(60)
+        self.assertEqual(len(view.rows), 100)
+        self.assertEqual(view.visible()[0]["name"], "R60")
+        view.sort([("name", False)])
+        self.assertEqual(len(view.rows), 500)
+        self.assertIsNone(view.cursor)
+
+    def test_sort_loads_rest_in_background(self):
+        search = RestaurantSearch(RestaurantBrowsing(RestaurantDatabase(
+            [{"name": f"R{i:03}", "cuisine": "Pizza", "location": "Helsinki", "rating": 4.0} for i in range(500)])))
+        scheduler = FakeScheduler()
+        worker = SearchWorker(scheduler.after, scheduler.after_cancel)
+        self.addCleanup(worker.shutdown)
+        fetching_threads = set()
+
+        def fetch_page(cursor, limit):
+            fetching_threads.add(threading.current_thread().name)
+            return search.page(cursor, limit)
+
+        view = VirtualResultsView(self.tree, self.scrollbar, ("name",), fetch_page=fetch_page,
+                                  visible_rows=10, buffer_rows=20, page_size=50,
+                                  load_in_background=lambda load, done, error: worker.submit(load, done, on_error=error))
+        view.set_cursor(search.make_cursor())
+        self.scrollbar.set.assert_called_with(0.0, 10 / 100)  # The thumb leaves room for rows not fetched yet
+        fetching_threads.clear()
+        view.sort([("name", True)])
+        # Only the fetched page is sorted until the rest arrives; the main thread fetches nothing
+        self.assertEqual(len(view.rows), 50)
+        self.assertEqual(view.visible()[0]["name"], "R049")
+        self.assertTrue(view.loading)
+        worker.future.result(timeout=5)
+        scheduler.run_pending()
+        self.assertFalse(view.loading)
+        self.assertEqual(len(view.rows), 500)
+        self.assertEqual(view.visible()[0]["name"], "R499")
+        self.assertTrue(all(name.startswith("search") for name in fetching_threads))
+        self.scrollbar.set.assert_called_with(0.0, 10 / 500)
+
+    def test_background_rows_of_replaced_results_are_dropped(self):
+        loads = []
+        view = VirtualResultsView(self.tree, self.scrollbar, ("cuisine",), fetch_page=lambda cursor, limit: ([], None),
+                                  load_in_background=lambda load, done, error: loads.append(done))
+        view.set_page(self.rows[:100], "cursor")
+        view.sort([("cuisine", False)])
+        view.set_rows(self.rows[:3])
+        loads[0](self.rows[100:200])
+        self.assertEqual(len(view.rows), 3)
+
+class TestResultsModel(unittest.TestCase):
+    def setUp(self):
+        self.model = ResultsModel([
+            {"cuisine": "Pizza", "location": "NYC", "rating": "3.5"},
+            {"cuisine": "burger", "location": "LA", "rating": 4.5},
+            {"cuisine": "Salad", "location": "SF", "rating": 2.0},
+            {"cuisine": "Pizza", "location": "LA", "rating": 4.5},
+        ])
+
+    def locations(self):
+        return [r["location"] for r in self.model]
+
+    def test_unsorted_keeps_input_order(self):
+        self.assertEqual(self.locations(), ["NYC", "LA", "SF", "LA"])
+        self.assertEqual(self.model[1:3], [self.model.rows[1], self.model.rows[2]])
+        self.assertEqual(self.model[-1]["cuisine"], "Pizza")
+
+    def test_sort_by_rating_parses_values_once(self):
+        self.model.sort([("rating", False)])
+        self.assertEqual([r["rating"] for r in self.model], [2.0, "3.5", 4.5, 4.5])
+        self.assertEqual(self.model.sort_keys("rating"), [3.5, 4.5, 2.0, 4.5])
+        self.assertIs(self.model.sort_keys("rating"), self.model.sort_keys("rating"))
+
+    def test_text_columns_sort_case_insensitively(self):
+        self.model.sort([("cuisine", False)])
+        self.assertEqual([r["cuisine"] for r in self.model], ["burger", "Pizza", "Pizza", "Salad"])
+
+    def test_multi_column_sort(self):
+        self.model.sort([("rating", True), ("location", False)])
+        self.assertEqual([(r["rating"], r["location"]) for r in self.model],
+                         [(4.5, "LA"), (4.5, "LA"), ("3.5", "NYC"), (2.0, "SF")])
+        self.model.sort([("cuisine", False), ("location", True)])
+        self.assertEqual(self.locations(), ["LA", "NYC", "LA", "SF"])
+
+    def test_reverse_does_not_resort(self):
+        self.model.sort([("rating", False)])
+        order = self.model.order
+        self.model.sort([("rating", True)])
+        self.assertIs(self.model.order, order)
+        self.assertTrue(self.model.reversed)
+        self.assertEqual([float(r["rating"]) for r in self.model], [4.5, 4.5, 3.5, 2.0])
+
+    def test_toggle_sort_keeps_previous_column_as_tie_breaker(self):
+        self.model.toggle_sort("location")
+        self.model.toggle_sort("cuisine")
+        self.assertEqual(self.model.sort_columns, [("cuisine", False), ("location", False)])
+        self.assertEqual(self.locations(), ["LA", "LA", "NYC", "SF"])
+        self.model.toggle_sort("cuisine")
+        self.assertEqual(self.model.sort_columns, [("cuisine", True), ("location", True)])
+        self.assertEqual(self.locations(), ["SF", "NYC", "LA", "LA"])
+
+    def test_extend_keeps_sort(self):
+        self.model.sort([("rating", True)])
+        self.model.extend([{"cuisine": "Thai", "location": "Oslo", "rating": 5.0}])
+        self.assertEqual(self.locations()[0], "Oslo")
+        self.assertEqual(len(self.model.sort_keys("rating")), 5)
+
+class FakeScheduler:
+    """Stand-in for widget.after/after_cancel that runs callbacks only when asked to."""
+
+    def __init__(self):
+        self.pending = {}
+        self.scheduled = 0
+
+    def after(self, delay_ms, callback):
+        self.scheduled += 1
+        self.pending[self.scheduled] = callback
+        return self.scheduled
+
+    def after_cancel(self, after_id):
+        self.pending.pop(after_id, None)
+
+    def run_pending(self):
+        callbacks, self.pending = list(self.pending.values()), {}
+        for callback in callbacks:
+            callback()
+
+
+class TestSearchWorker(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = FakeScheduler()
+        self.worker = SearchWorker(self.scheduler.after, self.scheduler.after_cancel)
+        self.delivered = []
+
+    def tearDown(self):
+        self.worker.shutdown()
+
+    def finish(self):
+        """Wait for the running search and deliver its result like the Tk event loop would."""
+        self.worker.future.result(timeout=5)
+        self.scheduler.run_pending()
+
+    def test_result_is_delivered_on_poll(self):
+        self.worker.submit(lambda: threading.current_thread().name, self.delivered.append)
+        self.assertEqual(self.delivered, [])  # Nothing is delivered outside the main-thread poll
+        self.finish()
+        self.assertEqual(len(self.delivered), 1)
+        self.assertTrue(self.delivered[0].startswith("search"))
+
+    def test_debounce_runs_only_last_search(self):
+        calls = []
+        for text in ["p", "pi", "piz"]:
+            self.worker.submit(lambda text=text: calls.append(text) or text, self.delivered.append, delay_ms=300)
+        self.assertEqual(len(self.scheduler.pending), 1)
+        self.scheduler.run_pending()
+        self.finish()
+        self.assertEqual(calls, ["piz"])
+        self.assertEqual(self.delivered, ["piz"])
+
+    def test_stale_result_never_overwrites_newer(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def slow_search():
+            started.set()
+            release.wait(5)
+            return "old"
+
+        self.worker.submit(slow_search, self.delivered.append)
+        started.wait(5)
+        self.worker.submit(lambda: "new", self.delivered.append)
+        release.set()
+        self.finish()
+        self.assertEqual(self.delivered, ["new"])
+
+    def test_cancel_drops_result(self):
+        self.worker.submit(lambda: "result", self.delivered.append)
+        self.worker.cancel()
+        self.worker.executor.shutdown(wait=True)
+        self.scheduler.run_pending()
+        self.assertEqual(self.delivered, [])
+
+    def test_errors_are_delivered_to_on_error(self):
+        errors = []
+        self.worker.submit(lambda: 1 / 0, self.delivered.append, on_error=errors.append)
+        self.finish()
+        self.assertEqual(self.delivered, [])
+        self.assertIsInstance(errors[0], ZeroDivisionError)
+
+class TestCheckoutWorker(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = FakeScheduler()
+        self.worker = CheckoutWorker(self.scheduler.after, self.scheduler.after_cancel, timeout_s=0.05)
+        self.cart = Cart()
+        self.cart.add_item("Pizza", 10.0, 1)
+        self.order = OrderPlacement(self.cart, UserProfile(delivery_address="123 Main St"),
+                                    RestaurantMenu(available_items=["Pizza"]))
+        self.results = []
+        self.progress = []
+        self.release = threading.Event()
+        self.payment = MagicMock()
+        self.payment.process_payment.side_effect = lambda amount: self.release.wait(5)
+
+    def tearDown(self):
+        self.release.set()
+        self.worker.shutdown()
+
+    def pump(self, until):
+        """Run scheduled polls like the Tk event loop would, until until() holds."""
+        deadline = time.monotonic() + 5
+        while not until() and time.monotonic() < deadline:
+            self.scheduler.run_pending()
+            time.sleep(0.005)
+
+    def test_result_is_delivered_on_poll(self):
+        self.release.set()
+        self.assertTrue(self.worker.start(self.order, self.payment, self.results.append))
+        self.pump(lambda: self.results)
+        self.assertEqual(self.results[0]["order_id"], "ORD123456")
+        self.assertFalse(self.worker.active)
+
+    def test_only_one_confirmation_in_flight(self):
+        self.worker.timeout_s = 5
+        self.worker.start(self.order, self.payment, self.results.append, self.progress.append)
+        self.assertFalse(self.worker.start(self.order, self.payment, self.results.append))
+        self.pump(lambda: self.progress)
+        self.release.set()
+        self.pump(lambda: self.results)
+        self.assertEqual(self.payment.process_payment.call_count, 1)
+        self.assertTrue(self.results[0]["success"])
+
+    def test_timeout_then_late_confirmation(self):
+        self.worker.start(self.order, self.payment, self.results.append)
+        self.pump(lambda: self.results)
+        self.assertEqual(self.results, [{"success": False, "message": "Payment timed out", "timed_out": True}])
+        self.assertTrue(self.worker.cancel_event.is_set())
+        self.assertFalse(self.worker.start(self.order, self.payment, self.results.append))  # Still in flight
+        self.release.set()
+        self.pump(lambda: len(self.results) == 2)
+        self.assertTrue(self.results[1]["success"])  # The payment went through after all
+
+    def test_cancel_before_payment_starts(self):
+        order = MagicMock()
+        order.confirm_order.side_effect = lambda payment, cancel_event: (
+            self.release.wait(5), {"success": not cancel_event.is_set(), "message": "Order cancelled"})[1]
+        self.worker.timeout_s = 5
+        self.worker.start(order, self.payment, self.results.append)
+        self.worker.cancel()
+        self.release.set()
+        self.pump(lambda: self.results)
+        self.assertEqual(self.results, [{"success": False, "message": "Order cancelled"}])
+
+
+class TestStartup(unittest.TestCase):
+    def test_import_defers_heavy_modules(self):
+        """Importing main must not import the catalog or payment modules before they are needed."""
+        code = "import sys, main; print('Restaurant_Browsing' in sys.modules, 'Payment_Processing' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code], cwd=os.path.join(os.path.dirname(__file__), '..'),
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.split(), ["False", "False"])
+
+    def test_background_loaders(self):
+        database, browsing, search = load_catalog()
+        self.assertIs(browsing.database, database)
+        self.assertEqual(len(search.search_restaurants()), len(database.get_restaurants()))
+        with tempfile.TemporaryDirectory() as directory, \
+                patch("Food_Delivery_Service.USERS_DB", os.path.join(directory, "users.db")):
+            registration = load_registration()
+            self.assertIsInstance(registration, UserRegistration)
+            registration.users.close()
+
 if __name__ == "__main__":
     unittest.main()
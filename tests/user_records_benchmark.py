@@ -0,0 +1,52 @@
+import base64
+import os
+import sys
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+# Add the directory containing User_Storage.py to the system path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from User_Storage import UserRecord
+
+# What PasswordHasher stores: "scrypt$n$r$p$" + base64 salt + "$" + base64 key
+HASH_PREFIX = "scrypt$16384$8$1$"
+
+def fake_hash(i):
+    """A string as long as a real password hash, but quick to make."""
+    salt = base64.b64encode(i.to_bytes(16, "little")).decode("ascii")
+    key = base64.b64encode(i.to_bytes(32, "little")).decode("ascii")
+    return f"{HASH_PREFIX}{salt}${key}"
+
+def measure(representation, num_users):
+    """Runs in a fresh process: bytes traced for the strings, and for the users mapping on top of them."""
+    tracemalloc.start()
+    emails = [f"user{i}@example.com" for i in range(num_users)]
+    hashes = [fake_hash(i) for i in range(num_users)]
+    strings = tracemalloc.get_traced_memory()[0]
+
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    if representation == "dict":
+        users = {email: {"password": password, "confirmed": False} for email, password in zip(emails, hashes)}
+    else:
+        users = {email: UserRecord(password) for email, password in zip(emails, hashes)}
+    mapping = tracemalloc.get_traced_memory()[0] - before
+    assert len(users) == num_users
+    return strings, mapping
+
+def benchmark_records(num_users):
+    results = {}
+    for representation in ["dict", "UserRecord"]:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            results[representation] = executor.submit(measure, representation, num_users).result()
+    for representation, (strings, mapping) in results.items():
+        print(f"{num_users:>9} users | {representation:<10} | users mapping {mapping / num_users:6.1f} B/user | "
+              f"with emails and hashes {(strings + mapping) / num_users:6.1f} B/user | "
+              f"total {(strings + mapping) / 2 ** 20:8.1f} MiB")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000_000, 5_000_000]
+    for size in sizes:
+        benchmark_records(size)
@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+# Add the directory containing User_Storage.py to the system path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from User_Storage import JournaledUserStore, SQLiteUserStore, UsersFileWriter
+from User_Registration import UserRegistration
+
+def generate_users(num_users):
+    """Users in the format UserRegistration stores them."""
+    return {f"user{i}@example.com": {"password": f"Password{i}", "confirmed": False} for i in range(num_users)}
+
+def benchmark_rewrite(path, users, signups):
+    """The old way: rewrite the whole users.json after every registration."""
+    start_time = time.perf_counter()
+    for i in range(signups):
+        users[f"new{i}@example.com"] = {"password": "Password123", "confirmed": False}
+        with open(path, "w") as f:
+            json.dump(users, f, indent=4)
+    return (time.perf_counter() - start_time) * 1000 / signups
+
+def benchmark_journal(path, signups, fsync):
+    """Append one journal record per registration."""
+    store = JournaledUserStore(path, fsync=fsync)
+    start_time = time.perf_counter()
+    for i in range(signups):
+        store[f"new{i}@example.com"] = {"password": "Password123", "confirmed": False}
+    elapsed = time.perf_counter() - start_time
+    store.close()
+    return elapsed * 1000 / signups
+
+def benchmark_user_storage(num_users, signups=20):
+    with tempfile.TemporaryDirectory() as directory:
+        users = generate_users(num_users)
+        rewrite_ms = benchmark_rewrite(os.path.join(directory, "rewrite.json"), dict(users), signups)
+        results = []
+        for fsync in ["always", "group", "interval"]:
+            path = os.path.join(directory, f"{fsync}.json")
+            with open(path, "w") as f:
+                json.dump(users, f)
+            results.append(f"journal ({fsync}) {benchmark_journal(path, signups * 10, fsync):8.3f} ms")
+        print(f"{num_users:>9} users | per signup: rewrite {rewrite_ms:9.2f} ms | " + " | ".join(results))
+
+def write_users_json(path, num_users):
+    """Write a users.json with num_users users without building them all in memory first."""
+    with open(path, "w") as f:
+        f.write("{")
+        for i in range(num_users):
+            f.write(f'{"," if i else ""}"user{i}@example.com":{{"password":"Password{i}","confirmed":false}}')
+        f.write("}")
+
+def write_users_db(path, num_users):
+    """Create a users database with num_users users, in one transaction."""
+    SQLiteUserStore(path).close()  # Creates the schema
+    db = sqlite3.connect(path, isolation_level=None)
+    db.execute("PRAGMA synchronous=OFF")
+    db.execute("BEGIN")
+    db.executemany("INSERT INTO users VALUES (?, ?, 0, NULL)",
+                   ((f"user{i}@example.com", f"Password{i}") for i in range(num_users)))
+    db.execute("COMMIT")
+    db.close()
+
+def measure_backend(backend, path, num_users, operations):
+    """Runs in a fresh process, so that its peak RSS is the store's alone."""
+    start_time = time.perf_counter()
+    users = JournaledUserStore(path) if backend == "journal" else SQLiteUserStore(path)
+    open_s = time.perf_counter() - start_time
+
+    registration = UserRegistration()
+    registration.users = users
+    start_time = time.perf_counter()
+    for i in range(operations):
+        registration.register(f"new{i}@example.com", "Password123", "Password123")
+    register_ms = (time.perf_counter() - start_time) * 1000 / operations
+
+    emails = [f"user{random.randrange(num_users)}@example.com" for _ in range(operations)]
+    start_time = time.perf_counter()
+    for email in emails:
+        user = users.get(email)
+        assert user is not None and user["password"].startswith("Password")  # What login checks
+    login_ms = (time.perf_counter() - start_time) * 1000 / operations
+
+    users.close()
+    rss_mib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux reports KiB
+    return open_s, register_ms, login_ms, rss_mib
+
+def benchmark_backends(num_users, operations=1000):
+    """Open time, register and login latency and peak RSS of each backend with num_users users."""
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {"journal": os.path.join(directory, "users.json"), "sqlite": os.path.join(directory, "users.db")}
+        write_users_json(paths["journal"], num_users)
+        write_users_db(paths["sqlite"], num_users)
+        for backend, path in paths.items():
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                open_s, register_ms, login_ms, rss_mib = executor.submit(
+                    measure_backend, backend, path, num_users, operations).result()
+            print(f"{num_users:>10} users | {backend:<7} | open {open_s:8.3f} s | register {register_ms:7.3f} ms | "
+                  f"login {login_ms:7.3f} ms | peak RSS {rss_mib:8.1f} MiB")
+
+def run_burst(save, users, num_threads, seconds):
+    """num_threads threads register users and save them as fast as they can for seconds."""
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+    counts = [0] * num_threads
+
+    def register(n):
+        while time.monotonic() < deadline:
+            with lock:
+                users[f"burst{n}-{counts[n]}@example.com"] = {"password": "Password123", "confirmed": False}
+            save(users)
+            counts[n] += 1
+
+    threads = [threading.Thread(target=register, args=(n,)) for n in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts)
+
+def benchmark_burst(num_users, num_threads=16, seconds=3.0):
+    """Registrations and disk writes per second under a burst, with a rewrite per save and coalesced."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "users.json")
+        lock = threading.Lock()  # Without it the in-place rewrites would corrupt the file outright
+        writes = [0]
+
+        def rewrite(users):
+            with lock:
+                with open(path, "w") as f:
+                    json.dump(dict(users), f, indent=4)
+                writes[0] += 1
+
+        registered = run_burst(rewrite, generate_users(num_users), num_threads, seconds)
+        print(f"{num_users:>9} users | rewrite per save | {registered / seconds:8.1f} registrations/s | "
+              f"{writes[0] / seconds:6.1f} writes/s")
+        with UsersFileWriter(path) as writer:
+            registered = run_burst(writer.save, generate_users(num_users), num_threads, seconds)
+        print(f"{num_users:>9} users | UsersFileWriter  | {registered / seconds:8.1f} registrations/s | "
+              f"{writer.writes / seconds:6.1f} writes/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the user stores.")
+    parser.add_argument("sizes", nargs="*", type=int, help="numbers of registered users")
+    parser.add_argument("--backends", action="store_true",
+                        help="compare the journal and SQLite stores (try sizes up to 10000000)")
+    parser.add_argument("--burst", action="store_true",
+                        help="compare a rewrite per save with UsersFileWriter under concurrent registrations")
+    args = parser.parse_args()
+    if args.burst:
+        for size in args.sizes or [1_000, 100_000]:
+            benchmark_burst(size)
+    elif args.backends:
+        for size in args.sizes or [100_000, 1_000_000, 10_000_000]:
+            benchmark_backends(size)
+    else:
+        for size in args.sizes or [1_000, 100_000, 1_000_000]:
+            benchmark_user_storage(size)